@@ -4,10 +4,17 @@ from fastapi.responses import JSONResponse
 from sqlalchemy import text
 from contextlib import asynccontextmanager
 import logging
+import os
 from database.sql_connection_test import SQLiteConnection
-from database.utility import run_query, run_updated_query
+from database.utility import run_query, run_coin_aggregates
+from database.duckdb_backend import get_duckdb_connection, close_duckdb_connections
+from database.result_builder import COINS_TABLE_SCHEMA
+from database.cache import QueryCache
+from database.instrumentation import QueryProfiler
+from database.session import QuerySession
+from database.async_utility import run_query_async, run_updated_query_async, run_in_executor, shutdown_executor
 from typing import List, Dict, Optional
-from src.analytics.data_reporting import coin_proportion, coin_summary_info
+from src.analytics.data_reporting import coin_proportion_from_aggregates, coin_summary_from_aggregates
 from src.analytics.analytical_functions import daily_price_change, daily_price_range, moving_average, find_peaks_and_valleys, correlation_analysis
 from src.visualizations.plot_reporting import plot_piechart, plot_switch, plot_summary_table, plot_boxplots
 from src.visualizations.plot_analytics import plot_line, plot_candlestick, plot_rsi, plot_bar # Importing the custom plot function
@@ -22,6 +29,13 @@ from datetime import datetime, timedelta
 
 
 db_conn = SQLiteConnection(database="./test_db.db")
+query_cache = QueryCache(database=db_conn.database)
+# Set QUERY_LOG_PATH to also append every query record to a JSON-lines file
+query_profiler = QueryProfiler(slow_query_ms=float(os.getenv("SLOW_QUERY_MS", 100)), log_path=os.getenv("QUERY_LOG_PATH"))
+# Set ANALYTICS_BACKEND=duckdb to run aggregation-heavy reports on DuckDB. DUCKDB_MODE is "attach"
+# (needs the sqlite extension installed beforehand), "copy" or "auto", see DuckDBConnection.
+analytics_backend = os.getenv("ANALYTICS_BACKEND", "sqlite")
+duckdb_mode = os.getenv("DUCKDB_MODE", "attach")
 
 def get_db_session():
     db = db_conn.get_session()
@@ -30,14 +44,25 @@ def get_db_session():
     finally:
         db.close()
 
+def get_query_session():
+    # One pooled connection serves every query of the request
+    with QuerySession(connection=db_conn) as session:
+        yield session
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     response = db_conn.test_connection()
     if response["connection_status"] == "incomplete":
         raise Exception(response["message"])
+    if analytics_backend == "duckdb":
+        # Load the extension, or build the copy, before the first request needs it
+        get_duckdb_connection(db_conn.database, mode=duckdb_mode).open()
     yield
     # Shutdown
+    shutdown_executor()
+    query_cache.close()
+    close_duckdb_connections()
     if db_conn._engine:
         db_conn._engine.dispose()
         logging.info("Database connection closed.")
@@ -60,10 +85,10 @@ async def root(): # Need to establish connection to database on connection to si
     return {"connection_status": 200}
 
 @app.get('/get_coin_names')
-async def get_coin_names():
+async def get_coin_names(session: QuerySession = Depends(get_query_session)):
     try:
         query = "SELECT DISTINCT Name FROM CoinsTable"
-        df = run_query(query=query, connection=db_conn)
+        df = await run_query_async(query=query, connection=session, cache=query_cache, profiler=query_profiler)
         json_response = df.to_json(orient="records")
         return {"transaction_state":200, "data":json_response}
     except Exception as e:
@@ -71,12 +96,12 @@ async def get_coin_names():
 
 
 @app.get('/query_coin')
-async def query_coin(coin_names: List[str] = Query(...)) -> Dict:
+async def query_coin(coin_names: List[str] = Query(...), session: QuerySession = Depends(get_query_session)) -> Dict:
     try:
         params = {f"coin_{i}": coin_name for i, coin_name in enumerate(coin_names)}
         placeholders = ', '.join([f':coin_{i}' for i in range(len(params))])
         query = f"SELECT * FROM CoinsTable WHERE NAME IN ({placeholders})"
-        df = run_query(query=query, connection=db_conn, params=params)
+        df = await run_query_async(query=query, connection=session, params=params, cache=query_cache, profiler=query_profiler)
         json_response = df.to_json(orient="records")
         return {"transaction_state":200, "data":json_response}
     except Exception as e:
@@ -88,12 +113,12 @@ async def query_coin(coin_names: List[str] = Query(...)) -> Dict:
 
 @app.get('/daily_price_change')
 async def get_daily_price_change(coin_names: List[str] = Query(...), start_date: str = Query("1970-01-01"),
-                                 end_date: str = Query("2025-01-01")) -> Response:
+                                 end_date: str = Query("2025-01-01"), session: QuerySession = Depends(get_query_session)) -> Response:
     try:
         # params = {f"coin_{i}": coin_name for i, coin_name in enumerate(coin_names)}
         # placeholders = ', '.join([f':coin_{i}' for i in range(len(params))])
         # query = f"SELECT * FROM CoinsTable WHERE NAME IN ({placeholders})"
-        df = run_updated_query(coin_names=coin_names, start_date=start_date, end_date=end_date, connection=db_conn)
+        df = await run_updated_query_async(coin_names=coin_names, start_date=start_date, end_date=end_date, connection=session, cache=query_cache, profiler=query_profiler)
         # df = run_query(query=query, connection=db_conn, params=params)
         df = daily_price_change(df)
         fig = plot_line(df=df, x_column_name='Date', y_column_name='DailyPriceChangeClosing')
@@ -106,12 +131,12 @@ async def get_daily_price_change(coin_names: List[str] = Query(...), start_date:
 
 
 @app.get('/daily_price_range')
-async def get_daily_price_range(coin_names: List[str] = Query(...)) -> Dict:
+async def get_daily_price_range(coin_names: List[str] = Query(...), session: QuerySession = Depends(get_query_session)) -> Dict:
     try:
         params = {f"coin_{i}": coin_name for i, coin_name in enumerate(coin_names)}
         placeholders = ', '.join([f':coin_{i}' for i in range(len(params))])
         query = f"SELECT * FROM CoinsTable WHERE NAME IN ({placeholders})"
-        df = run_query(query=query, connection=db_conn, params=params)
+        df = await run_query_async(query=query, connection=session, params=params, schema=COINS_TABLE_SCHEMA, cache=query_cache, profiler=query_profiler)
         df = daily_price_range(df)
         fig = plot_line(df=df, x_column_name='Date', y_column_name='DailyPriceRange')
 
@@ -121,12 +146,12 @@ async def get_daily_price_range(coin_names: List[str] = Query(...)) -> Dict:
         raise HTTPException(status_code=400, detail=str(e))
     
 @app.get('/moving_averages')
-async def get_moving_averages(coin_names: List[str] = Query(...), window: int = Query(5)) -> Dict:
+async def get_moving_averages(coin_names: List[str] = Query(...), window: int = Query(5), session: QuerySession = Depends(get_query_session)) -> Dict:
     try:
         params = {f"coin_{i}": coin_name for i, coin_name in enumerate(coin_names)}
         placeholders = ', '.join([f':coin_{i}' for i in range(len(params))])
         query = f"SELECT * FROM CoinsTable WHERE NAME IN ({placeholders})"
-        df = run_query(query=query, connection=db_conn, params=params)
+        df = await run_query_async(query=query, connection=session, params=params, schema=COINS_TABLE_SCHEMA, cache=query_cache, profiler=query_profiler)
         df = moving_average(df, window=window)
         fig = plot_line(df=df, x_column_name='Date', y_column_name=f'MovingAverage_{window}')
         fig_json = fig.to_json()
@@ -136,10 +161,10 @@ async def get_moving_averages(coin_names: List[str] = Query(...), window: int =
     
 #need visualisation tool
 @app.get('/correlation_analysis')
-async def get_correlation_analysis(coin_names: List[str] = Query(...), start_date: str = Query("1970-01-01"), end_date: str = Query("2025-01-01")) -> Dict:
+async def get_correlation_analysis(coin_names: List[str] = Query(...), start_date: str = Query("1970-01-01"), end_date: str = Query("2025-01-01"), session: QuerySession = Depends(get_query_session)) -> Dict:
     #TODO Fix correlation anaylsis endpoint
     try:
-        df = run_updated_query(coin_names=coin_names, start_date=start_date, end_date=end_date, connection=db_conn)
+        df = await run_updated_query_async(coin_names=coin_names, start_date=start_date, end_date=end_date, connection=session, cache=query_cache, profiler=query_profiler)
         correlation_matrix = correlation_analysis(df)
         fig = px.imshow(correlation_matrix, text_auto=True)
         fig_json = fig.to_json()
@@ -149,9 +174,9 @@ async def get_correlation_analysis(coin_names: List[str] = Query(...), start_dat
 
 
 @app.get('/coin_reporting') # We will include pie chart with every response
-async def coin_report(coin_name: str = Query("Bitcoin")) -> Response:
+async def coin_report(coin_name: str = Query("Bitcoin"), session: QuerySession = Depends(get_query_session)) -> Response:
     query = f"SELECT * FROM CoinsTable WHERE NAME = '{coin_name}'"
-    df = run_query(query=query, connection=db_conn)
+    df = await run_query_async(query=query, connection=session, schema=COINS_TABLE_SCHEMA, cache=query_cache, profiler=query_profiler)
     fig_other, fig_market, fig_volume = plot_boxplots(df=df, coin_name=coin_name)
     fig_other_json = fig_other.to_json()
     fig_market_json = fig_market.to_json()
@@ -164,11 +189,12 @@ async def coin_report(coin_name: str = Query("Bitcoin")) -> Response:
 
 
 @app.get('/coin_proportion')
-async def coin_proportions() -> Response:
-    query = f"SELECT * FROM CoinsTable"
-    df = run_query(query=query, connection=db_conn)
-    coin_proportions = coin_proportion(df=df)
-    summary_df = coin_summary_info(df=df)
+async def coin_proportions(session: QuerySession = Depends(get_query_session)) -> Response:
+    # The per-coin aggregation runs inside the database, only one row per coin comes back
+    coin_aggregates = await run_in_executor(run_coin_aggregates, connection=session, backend=analytics_backend,
+                                            duckdb_mode=duckdb_mode, cache=query_cache, profiler=query_profiler)
+    coin_proportions = coin_proportion_from_aggregates(aggregates=coin_aggregates)
+    summary_df = coin_summary_from_aggregates(aggregates=coin_aggregates)
     fig_summary = plot_summary_table(summary_df=summary_df)
     fig_pie = plot_piechart(coin_counts=coin_proportions)
     fig_pie_json = fig_pie.to_json()
@@ -177,7 +203,7 @@ async def coin_proportions() -> Response:
     return Response(content=json.dumps({"transaction":200, "data":{"pie_graph": fig_pie_json, "summary_graph":fig_summary_json}}), media_type="application/json")
 
 @app.post("/register/")
-async def register_user(user: UserCreate, db=Depends(get_db_session)):
+def register_user(user: UserCreate, db=Depends(get_db_session)):
     try:
         # Start a transaction
         with db.begin():
@@ -209,7 +235,7 @@ async def register_user(user: UserCreate, db=Depends(get_db_session)):
         raise HTTPException(status_code=400, detail=str(e))
     
 @app.post("/login/")
-async def login_user(user: UserLogin, db=Depends(get_db_session)):
+def login_user(user: UserLogin, db=Depends(get_db_session)):
     try:
         query = text("SELECT * FROM users WHERE username = :username")
         result = db.execute(query, {"username": user.username}).fetchone()
@@ -222,7 +248,7 @@ async def login_user(user: UserLogin, db=Depends(get_db_session)):
         raise HTTPException(status_code=400, detail=str(e))
     
 @app.post("/update_username/")
-async def update_username(user_info: UsernameUpdate, db=Depends(get_db_session)):
+def update_username(user_info: UsernameUpdate, db=Depends(get_db_session)):
     try:
         update_query = text("""
             UPDATE users
@@ -237,7 +263,7 @@ async def update_username(user_info: UsernameUpdate, db=Depends(get_db_session))
         raise HTTPException(status_code=400, detail=str(e))
     
 @app.post("/update_useremail/")
-async def update_useremail(user_info: EmailUpdate, db=Depends(get_db_session)):
+def update_useremail(user_info: EmailUpdate, db=Depends(get_db_session)):
     try:
         update_query = text("""
             UPDATE users
@@ -252,7 +278,7 @@ async def update_useremail(user_info: EmailUpdate, db=Depends(get_db_session)):
         raise HTTPException(status_code=400, detail=str(e))
     
 @app.post("/update_password/")
-async def update_password(user_info: PasswordUpdate, db=Depends(get_db_session)):
+def update_password(user_info: PasswordUpdate, db=Depends(get_db_session)):
     try:
         # Authenticate user with the current password
         query = text("SELECT password FROM users WHERE username = :username")
@@ -292,6 +318,20 @@ async def get_available_analyses() -> Dict:
     except Exception as e:
         return {"transaction_state": 500, "error": str(e)}
 
+@app.get('/query_cache_stats')
+async def get_query_cache_stats() -> Dict:
+    return {"transaction_state": 200, "data": query_cache.stats()}
+
+@app.get('/query_stats')
+async def get_query_stats(slow_only: bool = False) -> Dict:
+    return {
+        "transaction_state": 200,
+        "data": {
+            "summary": query_profiler.summary().to_dict(orient="records"),
+            "records": query_profiler.records(slow_only=slow_only),
+        },
+    }
+
 @app.get("/get_crypto_news")
 def get_crypto_news():
     url = "https://crypto.news/"
@@ -336,10 +376,14 @@ async def run_regression_model(
         start_date: Optional[str] = Body("1970-01-01"),
         end_date: Optional[str] = Body("2025-01-01"),
         coin_names: Optional[List[str]] = Body(None),
+        session: QuerySession = Depends(get_query_session),
 ) -> Response:
     model_path = "./.models/ridge_model_test.pkl"
     query = "SELECT * FROM CoinsTable"
-    df = run_query(query=query, connection=db_conn)
+    # The model needs every row at once, so the result is read whole rather than streamed
+    df = await run_query_async(query=query, connection=session, profiler=query_profiler)
+    if df.empty:
+        raise HTTPException(status_code=404, detail="CoinsTable has no rows to run the model on")
     fig = load_regression_model(file_path=model_path, df=df, coin_names=coin_names, start_date=start_date, end_date=end_date)
 
     return Response(content=json.dumps({"transaction":200, "data":{"graph": fig.to_json(),}}), media_type="application/json")
@@ -382,10 +426,10 @@ def get_top_5_crypto():
         return {"error": "Unable to fetch data"}
     
 @app.get('/volume_bar_graph')
-async def volume_bar_graph(coin_names: List[str] = Query(...), start_date: str = Query("1970-01-01"), end_date: str = Query("2025-01-01")) -> Response:
+async def volume_bar_graph(coin_names: List[str] = Query(...), start_date: str = Query("1970-01-01"), end_date: str = Query("2025-01-01"), session: QuerySession = Depends(get_query_session)) -> Response:
     try:
         
-        df = run_updated_query(coin_names=coin_names, start_date=start_date, end_date=end_date, connection=db_conn)
+        df = await run_updated_query_async(coin_names=coin_names, start_date=start_date, end_date=end_date, connection=session, cache=query_cache, profiler=query_profiler)
 #        df = plot_analytics.plot_bar(df)
         fig = plot_bar(df=df, x_column_name='Date', y_column_name='Volume')  # Updated line
 
@@ -397,9 +441,9 @@ async def volume_bar_graph(coin_names: List[str] = Query(...), start_date: str =
 
 
 @app.get('/candlestick_chart')
-async def candlestick_chart(coin_names: List[str] = Query(...), start_date: str = Query("1970-01-01"), end_date: str = Query("2025-01-01")) -> Response:
+async def candlestick_chart(coin_names: List[str] = Query(...), start_date: str = Query("1970-01-01"), end_date: str = Query("2025-01-01"), session: QuerySession = Depends(get_query_session)) -> Response:
     try:
-        df = run_updated_query(coin_names=coin_names, start_date=start_date, end_date=end_date, connection=db_conn)
+        df = await run_updated_query_async(coin_names=coin_names, start_date=start_date, end_date=end_date, connection=session, cache=query_cache, profiler=query_profiler)
         fig = plot_candlestick(df=df)  # Updated line
 
         fig_json = fig.to_json()
@@ -409,9 +453,9 @@ async def candlestick_chart(coin_names: List[str] = Query(...), start_date: str
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get('/rsi_graph')
-async def rsi_graph(coin_names: List[str] = Query(...), start_date: str = Query("1970-01-01"), end_date: str = Query("2025-01-01")) -> Response:
+async def rsi_graph(coin_names: List[str] = Query(...), start_date: str = Query("1970-01-01"), end_date: str = Query("2025-01-01"), session: QuerySession = Depends(get_query_session)) -> Response:
     try:
-        df = run_updated_query(coin_names=coin_names, start_date=start_date, end_date=end_date, connection=db_conn)
+        df = await run_updated_query_async(coin_names=coin_names, start_date=start_date, end_date=end_date, connection=session, cache=query_cache, profiler=query_profiler)
         #df['RSI'] = df.groupby('Name')[y_column_name].transform(lambda x: computeRSI(x, RSI_TIME_WINDOW))
         fig = plot_rsi(df=df, x_column_name='Date', y_column_name='RSI')  # Updated line
 
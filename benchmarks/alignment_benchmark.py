@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from src.analytics.alignment import align_coins
+from .utility import make_coins_frame, time_call
+
+
+def align_per_coin(df: pd.DataFrame) -> dict:
+    """The previous approach: every coin filtered, sorted and re-indexed on its own with asfreq."""
+    df = df.assign(Date=pd.to_datetime(df["Date"]))
+    aligned = {}
+    for coin in df["Name"].unique():
+        coin_df = df[df["Name"] == coin].sort_values("Date").set_index("Date")
+        aligned[coin] = coin_df[["High", "Low", "Open", "Close", "Volume", "Marketcap"]].asfreq("D").ffill()
+    return aligned
+
+
+def main():
+    """
+    Compares aligning every coin on the daily calendar with one vectorised scatter against
+    re-indexing each coin separately, and times the correlation built on each. Coins start on
+    different days and 5% of the rows are dropped, so the calendar has gaps to fill.
+
+    Usage:
+        python -m benchmarks.alignment_benchmark
+    """
+    rng = np.random.default_rng(0)
+    df = make_coins_frame(n_coins=500, n_days=2500)
+    first_day = df["Name"].map(dict(zip(df["Name"].unique(), rng.integers(1, 1000, df["Name"].nunique()))))
+    df = df[(df["SNo"] >= first_day) & (rng.random(len(df)) > 0.05)]
+    df = df.iloc[rng.permutation(len(df))]
+    print(f"{len(df):,} rows, {df['Name'].nunique()} coins")
+
+    print(f"\n{'alignment':<34}{'seconds':>9}")
+    seconds, _ = time_call(lambda: align_per_coin(df), repeat=1)
+    print(f"{'per coin, asfreq + ffill':<34}{seconds:>9.2f}")
+    for policy in ("nan", "ffill", "interpolate"):
+        seconds, panel = time_call(lambda: align_coins(df, gap_policy=policy), repeat=3)
+        print(f"{f'panel, {policy}':<34}{seconds:>9.2f}")
+    seconds, panel = time_call(lambda: align_coins(df, gap_policy="ffill", dtype=np.float32), repeat=3)
+    print(f"{'panel, ffill, float32':<34}{seconds:>9.2f}")
+    size = sum(values.nbytes for values in panel.values.values()) / 1024 ** 2
+    print(f"float32 panel {panel.shape[0]} x {panel.shape[1]}, {size:.1f} MB for {len(panel.values)} columns")
+
+    print(f"\n{'Close correlation':<34}{'seconds':>9}")
+    pivot = df.assign(Date=pd.to_datetime(df["Date"])).drop_duplicates(["Name", "Date"])
+    seconds, _ = time_call(lambda: pivot.pivot(index="Date", columns="Name", values="Close").corr(), repeat=1)
+    print(f"{'pivot':<34}{seconds:>9.2f}")
+    seconds, _ = time_call(lambda: align_coins(df, columns=["Close"]).to_frame("Close").corr(), repeat=1)
+    print(f"{'panel':<34}{seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+from database.sql_connection_test import SQLiteConnection
+from database.duckdb_backend import duckdb_available, get_duckdb_connection, close_duckdb_connections, run_duckdb_query
+from database.utility import run_analytics_query, build_coin_aggregates_query
+from .utility import make_coins_frame, build_sqlite_db, time_call
+
+QUERIES = {
+    "coin aggregates": build_coin_aggregates_query(),
+    "monthly close": """
+        SELECT Name, substr(Date, 1, 7) AS Month, AVG(Close) AS AvgClose, MAX(High) AS MaxHigh, MIN(Low) AS MinLow
+        FROM CoinsTable GROUP BY Name, Month ORDER BY Name, Month
+    """,
+    "daily market": """
+        SELECT Date, SUM(Marketcap) AS Marketcap, SUM(Volume) AS Volume, COUNT(*) AS Coins
+        FROM CoinsTable GROUP BY Date ORDER BY Date
+    """,
+}
+
+
+def main():
+    """
+    Compares SQLite and the embedded DuckDB backend on full-history aggregation queries.
+    The DuckDB setup time (attaching or copying the SQLite file) is reported separately.
+
+    Usage:
+        python -m benchmarks.analytics_backend_benchmark
+    """
+    if not duckdb_available():
+        print("duckdb is not installed: pip install duckdb")
+        return
+
+    print(f"{'rows':>10}  {'query':<17}{'sqlite (ms)':>12}{'duckdb (ms)':>12}{'speedup':>9}")
+    for n_coins in [50, 200, 500]:
+        df = make_coins_frame(n_coins=n_coins, n_days=2000)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_name = os.path.join(tmp_dir, "bench.db")
+            build_sqlite_db(df, db_name=db_name)
+            connection = SQLiteConnection(database=db_name)
+
+            duckdb_connection = get_duckdb_connection(db_name, mode="auto")
+            setup_s, _ = time_call(lambda: run_duckdb_query(query="SELECT 1", connection=duckdb_connection), repeat=1)
+            print(f"{len(df):>10,}  DuckDB {duckdb_connection.active_mode} setup: {setup_s * 1000:.0f} ms")
+
+            for name, query in QUERIES.items():
+                sqlite_s, sqlite_df = time_call(lambda: run_analytics_query(query=query, connection=connection, backend="sqlite"), repeat=3)
+                duckdb_s, duckdb_df = time_call(lambda: run_analytics_query(query=query, connection=connection, backend="duckdb", duckdb_mode="auto"), repeat=3)
+                assert len(sqlite_df) == len(duckdb_df)
+                print(f"{len(df):>10,}  {name:<17}{sqlite_s * 1000:>12.1f}{duckdb_s * 1000:>12.1f}{sqlite_s / duckdb_s:>8.1f}x")
+
+            close_duckdb_connections()
+            connection.get_engine().dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import time
+from sqlalchemy import create_engine
+from database.bulk_loader import BulkLoader
+from .utility import make_coins_frame
+
+
+def main():
+    """
+    Reports bulk load throughput in rows per second against a local SQLite stand-in for SQL Server,
+    compared with a single `to_sql` call.
+
+    Usage:
+        python -m benchmarks.bulk_loader_benchmark
+    """
+    df = make_coins_frame(n_coins=100, n_days=3000)
+    print(f"{'method':<36}{'rows':>9}{'seconds':>9}{'rows/s':>11}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'baseline.db')}")
+        start = time.perf_counter()
+        df.to_sql("CoinsTable", engine, index=False, chunksize=50_000)
+        elapsed = time.perf_counter() - start
+        print(f"{'to_sql':<36}{len(df):>9}{elapsed:>9.2f}{len(df) / elapsed:>11.0f}")
+        engine.dispose()
+
+        for batch_size, n_partitions, max_workers in [(10_000, 1, 1), (50_000, 1, 1), (50_000, 4, 1), (50_000, 4, 4)]:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, f'bulk_{batch_size}_{n_partitions}_{max_workers}.db')}")
+            loader = BulkLoader(engine=engine, table_name="CoinsTable", batch_size=batch_size, n_partitions=n_partitions, max_workers=max_workers)
+            report = loader.load(df=df)
+            # A second load of the same rows exercises the merge path on existing keys
+            upsert = loader.load(df=df)
+            name = f"bulk b={batch_size} p={n_partitions} w={max_workers}"
+            print(f"{name:<36}{report['rows']:>9}{report['total_seconds']:>9.2f}{report['rows_per_second']:>11.0f}")
+            print(f"{name + ' (upsert)':<36}{upsert['rows']:>9}{upsert['total_seconds']:>9.2f}{upsert['rows_per_second']:>11.0f}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from database.sql_connection_test import SQLiteConnection
+from database.schema import migrate_to_clustered
+from database.utility import run_query, run_updated_query
+from .utility import make_coins_frame, build_sqlite_db, time_call
+
+
+def main():
+    """
+    Compares the heap and clustered layouts of CoinsTable on file size and per-coin range reads.
+    Rows are written in date order across all coins, as daily incremental loads would write them,
+    so in the heap layout each coin's history is spread over the whole file.
+
+    Usage:
+        python -m benchmarks.clustered_layout_benchmark
+    """
+    df = make_coins_frame(n_coins=200, n_days=2000).sort_values(["Date", "Name"], kind="stable")
+    coin_names = [f"Coin {i}" for i in range(0, 200, 40)]
+    queries = {
+        "5 coins, 1 year": lambda connection: run_updated_query(coin_names=coin_names, start_date="2016-01-01", end_date="2016-12-31", connection=connection),
+        "1 coin, history": lambda connection: run_query(query="SELECT * FROM CoinsTable WHERE Name = 'Coin 7'", connection=connection),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        heap_db = os.path.join(tmp_dir, "heap.db")
+        clustered_db = os.path.join(tmp_dir, "clustered.db")
+        build_sqlite_db(df, db_name=heap_db)
+        shutil.copy(heap_db, clustered_db)
+        conn = sqlite3.connect(clustered_db)
+        try:
+            migrate_to_clustered(conn=conn)
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+        print(f"{'layout':<11}{'size (MB)':>10}" + "".join(f"{name + ' (ms)':>22}" for name in queries))
+        for layout, db_name in [("heap", heap_db), ("clustered", clustered_db)]:
+            # A small page cache keeps the reads honest about how many pages a query touches
+            connection = SQLiteConnection(database=db_name, cache_size=-2000, mmap_size=0)
+            timings = [time_call(lambda: query(connection))[0] for query in queries.values()]
+            size_mb = os.path.getsize(db_name) / 1024 ** 2
+            print(f"{layout:<11}{size_mb:>10.1f}" + "".join(f"{seconds * 1000:>22.1f}" for seconds in timings))
+            connection.get_engine().dispose()
+
+
+if __name__ == "__main__":
+    main()
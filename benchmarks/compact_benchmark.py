@@ -0,0 +1,36 @@
+import pandas as pd
+from src.analytics.analytical_functions import daily_price_change, moving_average
+from src.cleaning.compact import compact_frame, memory_per_column
+from .utility import make_coins_frame, time_call
+
+
+def main():
+    """
+    Compares the memory per column and the analytics run time of the cleaned frame before and
+    after compaction, with and without float32 prices.
+
+    Usage:
+        python -m benchmarks.compact_benchmark
+    """
+    df = make_coins_frame(n_coins=500, n_days=2000)
+    df["Date"] = pd.to_datetime(df["Date"])
+    frames = {
+        "original": df.assign(Date=df["Date"].dt.strftime("%Y-%m-%d %H:%M:%S")),
+        "compact": compact_frame(df=df),
+        "compact, float32": compact_frame(df=df, downcast_floats=True),
+    }
+
+    memory = pd.DataFrame({name: memory_per_column(frame) / 1024 ** 2 for name, frame in frames.items()})
+    memory.loc["Total"] = memory.sum()
+    print(f"{len(df):,} rows, memory in MB")
+    print(memory.round(1).to_string())
+
+    print(f"\n{'analytics on':<18}{'seconds':>9}")
+    # The original frame's dates are parsed first, as every analytics caller does
+    for name, frame in {**frames, "original": df}.items():
+        seconds, _ = time_call(lambda: moving_average(daily_price_change(frame.copy())), repeat=3)
+        print(f"{name:<18}{seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from database.sql_connection_test import SQLiteConnection
+from database.utility import run_updated_query
+from src.cleaning.load import push_to_sqlite
+from .utility import make_coins_frame, build_sqlite_db
+
+
+def read_while_loading(connection: SQLiteConnection, db_name: str, n_readers: int, load_df) -> dict:
+    """
+    Runs `n_readers` threads issuing chart queries until a concurrent `push_to_sqlite` load finishes.
+    """
+    loading = threading.Event()
+    loading.set()
+    latencies, errors = [], []
+
+    def reader(worker: int):
+        coin_names = [f"Coin {(worker + i) % 50}" for i in range(5)]
+        while loading.is_set():
+            start = time.perf_counter()
+            try:
+                run_updated_query(coin_names=coin_names, start_date="2016-01-01", end_date="2016-12-31", connection=connection)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(type(e).__name__)
+
+    with ThreadPoolExecutor(max_workers=n_readers) as pool:
+        futures = [pool.submit(reader, worker) for worker in range(n_readers)]
+        start = time.perf_counter()
+        push_to_sqlite(df=load_df, table_name="CoinsTableLoad", db_name=db_name)
+        elapsed = time.perf_counter() - start
+        loading.clear()
+        for future in futures:
+            future.result()
+
+    return {
+        "load_s": elapsed,
+        "queries": len(latencies),
+        "errors": len(errors),
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "max_ms": max(latencies) * 1000 if latencies else float("nan"),
+    }
+
+
+def main():
+    """
+    Measures reader throughput and latency while `push_to_sqlite` loads data, with SQLite
+    defaults versus the performance profile of `SQLiteConnection`.
+
+    Usage:
+        python -m benchmarks.concurrent_reads_benchmark
+    """
+    profiles = {
+        "defaults": dict(journal_mode=None, synchronous=None, cache_size=None, mmap_size=None, temp_store=None),
+        "performance": dict(),
+    }
+    base_df = make_coins_frame(n_coins=50, n_days=2000)
+    load_df = make_coins_frame(n_coins=100, n_days=2000, seed=1)
+
+    print(f"{'profile':<13}{'readers':>8}{'load (s)':>10}{'queries':>9}{'errors':>8}{'p50 (ms)':>10}{'max (ms)':>10}")
+    for name, settings in profiles.items():
+        for n_readers in [1, 4, 8]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                db_name = os.path.join(tmp_dir, "bench.db")
+                build_sqlite_db(base_df, db_name=db_name)
+                connection = SQLiteConnection(database=db_name, **settings)
+                connection.test_connection()
+                stats = read_while_loading(connection=connection, db_name=db_name, n_readers=n_readers, load_df=load_df)
+                connection.get_engine().dispose()
+            print(f"{name:<13}{n_readers:>8}{stats['load_s']:>10.2f}{stats['queries']:>9}{stats['errors']:>8}{stats['p50_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
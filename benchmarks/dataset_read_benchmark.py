@@ -0,0 +1,53 @@
+import importlib.util
+import os
+import tempfile
+import pandas as pd
+from src.cleaning.load import write_to_csv, write_to_dataset
+from src.cleaning.read import read_coins_csv, read_coins_dataset
+from .utility import make_coins_frame, time_call
+
+
+def main():
+    """
+    Compares re-reading the cleaned data from `.data/coins.csv` with the coin-partitioned Parquet
+    and Feather datasets, for a full read and for the selections forecasting jobs make.
+
+    Usage:
+        python -m benchmarks.dataset_read_benchmark
+    """
+    if importlib.util.find_spec("pyarrow") is None:
+        print("pyarrow is not installed, only the CSV can be read.")
+        return
+
+    df = make_coins_frame(n_coins=500, n_days=2000)
+    df["Date"] = pd.to_datetime(df["Date"])
+    selections = {
+        "all rows": {},
+        "5 coins": {"coin_names": [f"Coin {i}" for i in range(5)]},
+        "5 coins, 1 year, Close": {"coin_names": [f"Coin {i}" for i in range(5)], "columns": ["Date", "Close"],
+                                   "start_date": "2017-01-01", "end_date": "2017-12-31"},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "coins.csv")
+        write_to_csv(df=df, file_name=csv_path)
+        readers = {"csv": lambda **selection: read_coins_csv(csv_path=csv_path, **selection)}
+        for file_format in ("parquet", "feather"):
+            dataset_dir = write_to_dataset(df=df, dataset_dir=os.path.join(tmp_dir, file_format), file_format=file_format)
+            readers[file_format] = lambda dataset_dir=dataset_dir, **selection: read_coins_dataset(dataset_dir=dataset_dir, **selection)
+
+        sizes = {"csv": os.path.getsize(csv_path)}
+        for file_format in ("parquet", "feather"):
+            sizes[file_format] = sum(os.path.getsize(os.path.join(root, name))
+                                     for root, _, names in os.walk(os.path.join(tmp_dir, file_format)) for name in names)
+
+        print(f"{len(df):,} rows")
+        print(f"{'selection':<24}{'format':<9}{'seconds':>9}{'rows':>10}{'disk MB':>9}")
+        for name, selection in selections.items():
+            for file_format, read in readers.items():
+                seconds, result = time_call(lambda: read(**selection), repeat=3)
+                print(f"{name:<24}{file_format:<9}{seconds:>9.3f}{len(result):>10}{sizes[file_format] / 1024 ** 2:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import pandas as pd
+from src.cleaning.dedup import KeyIndex, deduplicate
+from .utility import make_coins_frame, time_call
+
+
+def main():
+    """
+    Loads a history of daily batches into a persistent key index, then measures checking a new
+    batch (half new keys, half repeats) against it, next to re-deduplicating the whole history in memory.
+
+    Usage:
+        python -m benchmarks.dedup_benchmark
+    """
+    history = make_coins_frame(n_coins=1000, n_days=5000)
+    batch = pd.concat([history.iloc[:50_000], make_coins_frame(n_coins=1000, n_days=50, seed=1)
+                      .assign(Date=lambda df: df["Date"].str.replace("2015", "2030"))], ignore_index=True)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = KeyIndex(path=os.path.join(tmp_dir, "index.npz"))
+        seconds, _ = time_call(lambda: deduplicate(df=history, index=index), repeat=1)
+        index.save()
+        print(f"history: {len(history):,} rows indexed in {seconds:.2f} s, "
+              f"index file {os.path.getsize(index.path) / 1024 ** 2:.0f} MB")
+
+        def check_batch():
+            stored = KeyIndex(path=index.path)
+            return deduplicate(df=batch, index=stored)
+
+        seconds, (new, conflicts, counts) = time_call(check_batch, repeat=3)
+        print(f"batch of {len(batch):,} rows against the index: {seconds:.2f} s, {counts}")
+        seconds, _ = time_call(lambda: pd.concat([history, batch]).drop_duplicates(["Name", "Date"]), repeat=1)
+        print(f"full-history drop_duplicates: {seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
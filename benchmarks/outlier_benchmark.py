@@ -0,0 +1,44 @@
+from src.cleaning.utility import count_outliers, detect_outliers, OUTLIER_COLUMNS
+from src.cleaning.clean import remove_outliers
+from .utility import make_coins_frame, time_call
+
+
+def loop_count_outliers(df):
+    """
+    The per-coin, per-column loop `count_outliers` used before the vectorised engine.
+    """
+    outliers = {}
+    for coin_name, temp_df in df.groupby("Name"):
+        for col in OUTLIER_COLUMNS:
+            Q1 = temp_df[col].quantile(0.25)
+            Q3 = temp_df[col].quantile(0.75)
+            IQR = Q3 - Q1
+            outliers[f"{coin_name}_{col}"] = ((temp_df[col] < Q1 - 1.5 * IQR) | (temp_df[col] > Q3 + 1.5 * IQR)).sum()
+    return outliers
+
+
+def main():
+    """
+    Compares the per-coin loop with the single-pass outlier engine, for counting alone and for
+    the count + remove work `run_data_cleaning` does before cleaning.
+
+    Usage:
+        python -m benchmarks.outlier_benchmark
+    """
+    print(f"{'coins':>6}{'rows':>11}{'loop count (s)':>16}{'engine count (s)':>18}{'count+remove, 1 pass (s)':>26}")
+    for n_coins in [50, 200, 1000]:
+        df = make_coins_frame(n_coins=n_coins, n_days=1000)
+        loop_s, expected = time_call(lambda: loop_count_outliers(df), repeat=1)
+        engine_s, outliers = time_call(lambda: count_outliers(df=df), repeat=3)
+        assert outliers == expected
+
+        def count_and_remove():
+            _, inside = detect_outliers(df=df)
+            return remove_outliers(df=df, mask=inside)
+
+        single_s, _ = time_call(count_and_remove, repeat=3)
+        print(f"{n_coins:>6}{len(df):>11,}{loop_s:>16.2f}{engine_s:>18.2f}{single_s:>26.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+import tempfile
+from database.sql_connection_test import SQLiteConnection
+from database.utility import run_query
+from database.result_builder import COINS_TABLE_SCHEMA
+from .utility import make_coins_frame, build_sqlite_db, time_call
+
+
+def main():
+    """
+    Compares inferred and schema-typed result building for `run_query` at several result sizes.
+
+    Usage:
+        python -m benchmarks.result_builder_benchmark
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_name = os.path.join(tmp_dir, "bench.db")
+        build_sqlite_db(make_coins_frame(n_coins=50, n_days=4000), db_name=db_name)
+        connection = SQLiteConnection(database=db_name)
+
+        print(f"{'rows':>8}{'inferred (ms)':>16}{'typed (ms)':>13}{'inferred (MB)':>16}{'typed (MB)':>13}")
+        for limit in [1_000, 10_000, 100_000, 200_000]:
+            query = f"SELECT Name, Symbol, Date, High, Low, Open, Close, Volume, Marketcap FROM CoinsTable LIMIT {limit}"
+            inferred_time, inferred_df = time_call(lambda: run_query(query=query, connection=connection), repeat=3)
+            typed_time, typed_df = time_call(lambda: run_query(query=query, connection=connection, schema=COINS_TABLE_SCHEMA), repeat=3)
+            inferred_mb = inferred_df.memory_usage(deep=True).sum() / 1024 ** 2
+            typed_mb = typed_df.memory_usage(deep=True).sum() / 1024 ** 2
+            print(f"{limit:>8}{inferred_time * 1000:>16.1f}{typed_time * 1000:>13.1f}{inferred_mb:>16.1f}{typed_mb:>13.1f}")
+
+        connection.get_engine().dispose()
+
+
+if __name__ == "__main__":
+    main()
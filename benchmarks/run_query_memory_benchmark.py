@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from database.sql_connection_test import SQLiteConnection
+from database.utility import run_query
+from src.analytics.data_reporting import coin_proportion, coin_summary_info, aggregate_coin_chunks, coin_proportion_from_aggregates, coin_summary_from_aggregates
+from .utility import make_coins_frame, build_sqlite_db
+
+
+def measure(func) -> tuple:
+    """
+    Runs `func` once and returns its wall time in seconds and peak traced memory in MB.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 ** 2
+
+
+def main():
+    """
+    Compares peak memory of the full-table endpoints with and without streamed query results.
+
+    Usage:
+        python -m benchmarks.run_query_memory_benchmark
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_name = os.path.join(tmp_dir, "bench.db")
+        build_sqlite_db(make_coins_frame(n_coins=50, n_days=4000), db_name=db_name)
+        connection = SQLiteConnection(database=db_name)
+
+        def proportion_full():
+            df = run_query(query="SELECT * FROM CoinsTable", connection=connection)
+            coin_proportion(df=df)
+            coin_summary_info(df=df)
+
+        def proportion_streamed():
+            chunks = run_query(query="SELECT Name, Date, Volume, Marketcap FROM CoinsTable", connection=connection, chunksize=50_000)
+            aggregates = aggregate_coin_chunks(chunks=chunks)
+            coin_proportion_from_aggregates(aggregates=aggregates)
+            coin_summary_from_aggregates(aggregates=aggregates)
+
+        def full_table_fetchall():
+            run_query(query="SELECT * FROM CoinsTable", connection=connection)
+
+        def full_table_chunked():
+            pd.concat(run_query(query="SELECT * FROM CoinsTable", connection=connection, chunksize=50_000), ignore_index=True)
+
+        cases = {
+            "/coin_proportion fetchall": proportion_full,
+            "/coin_proportion streamed": proportion_streamed,
+            "full table fetchall": full_table_fetchall,
+            "full table chunked": full_table_chunked,
+        }
+        print(f"{'case':<28}{'time (s)':>10}{'peak (MB)':>12}")
+        for name, func in cases.items():
+            elapsed, peak = measure(func)
+            print(f"{name:<28}{elapsed:>10.2f}{peak:>12.1f}")
+
+        connection.get_engine().dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import pandas as pd
+from typing import List
+from database.sql_connection_test import SQLiteConnection
+from database.utility import run_query, run_updated_query
+from .utility import make_coins_frame, build_sqlite_db, time_call
+
+
+def run_updated_query_per_coin(coin_names: List[str], start_date: str, end_date: str, connection: SQLiteConnection) -> pd.DataFrame:
+    """
+    The previous implementation of `run_updated_query`: one or two queries per coin and a concat per iteration.
+    """
+    df = pd.DataFrame()
+    for coin in coin_names:
+        params = {"coin_name": coin, "start_date": start_date, "end_date": end_date}
+        query = """
+        SELECT * FROM CoinsTable
+        WHERE Name = :coin_name
+        AND strftime('%Y-%m-%d', Date) BETWEEN :start_date AND :end_date
+        """
+        df_temp = run_query(query=query, connection=connection, params=params)
+        if df_temp.empty:
+            query = "SELECT * FROM CoinsTable WHERE Name = :coin_name"
+            df_temp = run_query(query=query, connection=connection, params={"coin_name": coin})
+        df = pd.concat([df, df_temp], ignore_index=True)
+    return df
+
+
+def main():
+    """
+    Compares per-coin and batched `run_updated_query` latency as the number of requested coins grows.
+
+    Usage:
+        python -m benchmarks.run_updated_query_benchmark
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_name = os.path.join(tmp_dir, "bench.db")
+        build_sqlite_db(make_coins_frame(n_coins=50, n_days=1000), db_name=db_name)
+        connection = SQLiteConnection(database=db_name)
+
+        # A window that misses every coin forces the full-history fallback
+        windows = {"in range": ("2016-01-01", "2016-06-30"), "fallback": ("1990-01-01", "1990-12-31")}
+
+        print(f"{'window':<10}{'coins':>6}{'per coin (ms)':>16}{'batched (ms)':>15}{'speedup':>10}")
+        for window, (start_date, end_date) in windows.items():
+            for n_coins in [1, 5, 10, 20, 50]:
+                coin_names = [f"Coin {i}" for i in range(n_coins)]
+                legacy_time, legacy_df = time_call(lambda: run_updated_query_per_coin(coin_names, start_date, end_date, connection))
+                batched_time, batched_df = time_call(lambda: run_updated_query(coin_names, start_date, end_date, connection))
+                assert len(legacy_df) == len(batched_df)
+                print(f"{window:<10}{n_coins:>6}{legacy_time * 1000:>16.1f}{batched_time * 1000:>15.1f}{legacy_time / batched_time:>9.1f}x")
+
+        connection.get_engine().dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from database.sql_connection_test import SQLiteConnection
+from database.sharding import ShardedSQLiteConnection, run_sharded_updated_query
+from database.utility import run_updated_query
+from src.cleaning.load import push_to_sqlite, push_to_sharded_sqlite
+from .utility import make_coins_frame, time_call
+
+
+def report(name, load_s, query, coin_sets):
+    """
+    Times one query and a burst of concurrent queries, then prints a row of the results table.
+    """
+    single_s, _ = time_call(lambda: query(coin_sets[0]))
+
+    def concurrent():
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(query, coin_sets))
+
+    concurrent_s, _ = time_call(concurrent, repeat=3)
+    print(f"{name:<11}{load_s:>9.2f}{single_s * 1000:>14.1f}{concurrent_s * 1000:>28.1f}")
+
+
+def main():
+    """
+    Compares one SQLite file with sharded storage on load time and on the throughput of
+    concurrent multi-coin chart queries.
+
+    Usage:
+        python -m benchmarks.sharding_benchmark
+    """
+    df = make_coins_frame(n_coins=200, n_days=2000)
+    coin_sets = [[f"Coin {(worker * 7 + i) % 200}" for i in range(8)] for worker in range(32)]
+
+    print(f"{'storage':<11}{'load (s)':>9}{'1 query (ms)':>14}{'32 queries, 8 threads (ms)':>28}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        single_db = os.path.join(tmp_dir, "single.db")
+        load_s, _ = time_call(lambda: push_to_sqlite(df=df, table_name="CoinsTable", db_name=single_db), repeat=1)
+        connection = SQLiteConnection(database=single_db)
+        query = lambda coin_names: run_updated_query(coin_names=coin_names, start_date="2016-01-01", end_date="2016-12-31", connection=connection)
+        report("1 file", load_s, query, coin_sets)
+        connection.get_engine().dispose()
+
+        for n_shards in [4, 8]:
+            shard_dir = os.path.join(tmp_dir, f"shards_{n_shards}")
+            load_s, _ = time_call(lambda: push_to_sharded_sqlite(df=df, shard_dir=shard_dir, n_shards=n_shards), repeat=1)
+            sharded = ShardedSQLiteConnection(directory=shard_dir)
+            query = lambda coin_names: run_sharded_updated_query(coin_names=coin_names, start_date="2016-01-01", end_date="2016-12-31", connection=sharded)
+            report(f"{n_shards} shards", load_s, query, coin_sets)
+            sharded.close()
+
+
+if __name__ == "__main__":
+    main()
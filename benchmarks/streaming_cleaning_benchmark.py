@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import tempfile
+import tracemalloc
+from src.cleaning.main import clean_data
+from src.cleaning.load import push_to_sqlite, SQLiteChunkWriter
+from src.cleaning.read import concatenate_csv_files, get_data_files
+from src.cleaning.streaming import stream_clean_csv_files
+from .csv_ingestion_benchmark import write_coin_files
+from .utility import time_call
+
+
+def measure(func) -> tuple:
+    """
+    Returns the wall time of one call and the peak traced memory of a separate call.
+    """
+    seconds, _ = time_call(func, repeat=1)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    """
+    Compares cleaning the whole dataset in memory with the two-pass streaming pipeline, both
+    loading the result into SQLite. Rows kept differ slightly because streamed fences are approximate.
+
+    Usage:
+        python -m benchmarks.streaming_cleaning_benchmark
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = os.path.join(tmp_dir, "data")
+        os.makedirs(data_dir)
+        write_coin_files(data_dir, n_coins=20, n_days=50_000)
+        files = get_data_files(data_dir)
+
+        def in_memory(db_name: str):
+            df, _ = clean_data(df=concatenate_csv_files(files=files))
+            push_to_sqlite(df=df, table_name="CoinsTable", db_name=db_name)
+
+        def streaming(db_name: str, chunksize: int):
+            writer = SQLiteChunkWriter(table_name="CoinsTable", db_name=db_name)
+            try:
+                stream_clean_csv_files(files=files, write=writer.write, chunksize=chunksize)
+            finally:
+                writer.close()
+
+        modes = {
+            "in memory": in_memory,
+            "streaming, 100k rows": lambda db_name: streaming(db_name, chunksize=100_000),
+            "streaming, 20k rows": lambda db_name: streaming(db_name, chunksize=20_000),
+        }
+        print(f"{len(files)} files, {20 * 50_000:,} rows")
+        print(f"{'mode':<22}{'seconds':>9}{'peak MB':>9}{'rows kept':>11}")
+        for i, (name, clean) in enumerate(modes.items()):
+            db_name = os.path.join(tmp_dir, f"coins_{i}.db")
+            seconds, peak = measure(lambda: clean(db_name))
+            with sqlite3.connect(db_name) as conn:
+                rows = conn.execute("SELECT COUNT(*) FROM CoinsTable").fetchone()[0]
+            print(f"{name:<22}{seconds:>9.2f}{peak / 1024 ** 2:>9.1f}{rows:>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import time
+import sqlite3
+import numpy as np
+import pandas as pd
+from typing import Callable, Tuple
+from database.schema import migrate_coins_table
+
+
+def make_coins_frame(n_coins: int = 50, n_days: int = 2000, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a synthetic frame with the same layout as the cleaned Kaggle crypto dataset.
+
+    Args:
+        n_coins (int, optional): Number of coins to generate. Defaults to 50.
+        n_days (int, optional): Number of daily rows per coin. Defaults to 2000.
+        seed (int, optional): Seed for the random generator. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: One row per coin and day, grouped by coin like the concatenated CSV files.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = n_coins * n_days
+    names = np.repeat([f"Coin {i}" for i in range(n_coins)], n_days)
+    symbols = np.repeat([f"C{i}" for i in range(n_coins)], n_days)
+    dates = np.tile(pd.date_range("2015-01-01", periods=n_days, freq="D").strftime("%Y-%m-%d 23:59:59"), n_coins)
+
+    close = np.abs(rng.normal(100, 10, n_rows).cumsum()) + 1
+    open_ = close * (1 + rng.normal(0, 0.01, n_rows))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, n_rows)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, n_rows)))
+
+    return pd.DataFrame({
+        "SNo": np.tile(np.arange(1, n_days + 1), n_coins),
+        "Name": names,
+        "Symbol": symbols,
+        "Date": dates,
+        "High": high,
+        "Low": low,
+        "Open": open_,
+        "Close": close,
+        "Volume": np.abs(rng.normal(1e9, 1e8, n_rows)),
+        "Marketcap": close * 1e7,
+    })
+
+
+def build_sqlite_db(df: pd.DataFrame, db_name: str, table_name: str = "CoinsTable") -> None:
+    """
+    Writes the frame to a SQLite file the same way `push_to_sqlite` does, including the schema migration.
+
+    Args:
+        df (pd.DataFrame): The data to write.
+        db_name (str): Path of the SQLite database file.
+        table_name (str, optional): Name of the table. Defaults to "CoinsTable".
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        df.to_sql(table_name, conn, if_exists="replace", index=False)
+        migrate_coins_table(conn=conn, table_name=table_name)
+    finally:
+        conn.close()
+
+
+def time_call(func: Callable, repeat: int = 5) -> Tuple[float, object]:
+    """
+    Runs `func` several times and returns the best wall time together with the last result.
+
+    Args:
+        func (Callable): A zero-argument callable to time.
+        repeat (int, optional): Number of runs. Defaults to 5.
+
+    Returns:
+        Tuple[float, object]: The fastest run in seconds and the value returned by the last run.
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
@@ -0,0 +1,96 @@
+import asyncio
+import functools
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from .sql_connection_test import SQLiteConnection
+from .utility import run_query, run_updated_query
+from .cache import QueryCache
+from .instrumentation import QueryProfiler
+
+DB_EXECUTOR_WORKERS = 8
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Returns the thread pool dedicated to database work, creating it on first use.
+    Keeping it separate from the event loop's default executor means slow analytics
+    queries cannot starve other blocking work.
+
+    Returns:
+        ThreadPoolExecutor: The database executor.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="database")
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """
+    Shuts down the database executor, waiting for running queries to finish.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def run_in_executor(func: Callable, *args, **kwargs) -> Any:
+    """
+    Runs a blocking callable on the database executor without blocking the event loop.
+
+    Args:
+        func (Callable): The blocking function to run.
+        *args: Positional arguments for `func`.
+        **kwargs: Keyword arguments for `func`.
+
+    Returns:
+        Any: The value returned by `func`.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def run_query_async(query: str, connection: SQLiteConnection, params: Optional[Dict[str, str]] = None,
+                          schema: Optional[Dict[str, str]] = None, cache: Optional[QueryCache] = None,
+                          profiler: Optional[QueryProfiler] = None) -> pd.DataFrame:
+    """
+    Awaitable version of `run_query`. The query runs on the database executor.
+
+    Args:
+        query (str): The SQL query to execute.
+        connection (SQLiteConnection): The database connection.
+        params (dict, optional): Parameters to bind to the SQL query.
+        schema (dict, optional): Column name to dtype mapping used to build typed columns.
+        cache (QueryCache, optional): The result cache to use.
+        profiler (QueryProfiler, optional): The profiler to record the statement in.
+
+    Returns:
+        pd.DataFrame: The result of the query as a DataFrame.
+    """
+    return await run_in_executor(run_query, query=query, connection=connection, params=params, schema=schema,
+                                 cache=cache, profiler=profiler)
+
+
+async def run_updated_query_async(coin_names: List[str], start_date: str, end_date: str,
+                                  connection: SQLiteConnection, cache: Optional[QueryCache] = None,
+                                  profiler: Optional[QueryProfiler] = None) -> pd.DataFrame:
+    """
+    Awaitable version of `run_updated_query`. The query runs on the database executor.
+
+    Args:
+        coin_names (List[str]): A list of coin names to retrieve data for.
+        start_date (str): The start date of the date range (inclusive).
+        end_date (str): The end date of the date range (inclusive).
+        connection (SQLiteConnection): The database connection to use.
+        cache (QueryCache, optional): The result cache to use.
+        profiler (QueryProfiler, optional): The profiler to record the query in.
+
+    Returns:
+        pd.DataFrame: A Pandas DataFrame containing the retrieved data.
+    """
+    return await run_in_executor(run_updated_query, coin_names=coin_names, start_date=start_date,
+                                 end_date=end_date, connection=connection, cache=cache, profiler=profiler)
@@ -0,0 +1,202 @@
+import logging
+import re
+import time
+import uuid
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple, Union
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+
+class BulkLoader:
+    """
+    This class loads a large DataFrame into a target table in batches. It works on any SQLAlchemy
+    engine, e.g. `sql_connection().get_engine()` for SQL Server or a SQLite engine in tests.
+
+    Rows are split into partitions by a hash of the first key column and each partition is written
+    to its own staging table, in parallel when `max_workers` > 1. Every batch is committed together
+    with a checkpoint row, so a failed load restarted with the same `load_id` skips the batches that
+    already landed. Once all partitions are staged they are merged into the target on the key
+    columns: a MERGE statement on SQL Server, delete-then-insert on other databases.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The engine to load through.
+        table_name (str): The target table.
+        key_columns (List[str]): The columns that identify a row in the target. Defaults to ["Name", "Date"].
+        batch_size (int): Rows written per batch. Defaults to 50000.
+        n_partitions (int): Number of staging partitions. Defaults to 4.
+        max_workers (int): Number of partitions staged in parallel. Defaults to 4.
+    """
+
+    def __init__(self, engine: Engine, table_name: str, key_columns: Optional[List[str]] = None,
+                 batch_size: int = 50_000, n_partitions: int = 4, max_workers: int = 4) -> None:
+        """
+        The constructor for the BulkLoader. It validates the load parameters.
+        """
+        if batch_size <= 0 or n_partitions <= 0 or max_workers <= 0:
+            raise ValueError("batch_size, n_partitions and max_workers must be positive")
+        self.engine = engine
+        self.table_name = table_name
+        self.key_columns = key_columns or ["Name", "Date"]
+        self.batch_size = batch_size
+        self.n_partitions = n_partitions
+        self.max_workers = max_workers
+        self.checkpoint_table = f"{table_name}_load_checkpoints"
+
+    def _quote(self, name: str) -> str:
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def staging_table(self, load_id: str, partition: int) -> str:
+        """
+        Returns the staging table name for one partition of a load.
+
+        Args:
+            load_id (str): The load identifier.
+            partition (int): The partition number.
+
+        Returns:
+            str: The staging table name.
+        """
+        return f"{self.table_name}_staging_{load_id}_{partition}"
+
+    def partition(self, df: pd.DataFrame) -> Dict[int, pd.DataFrame]:
+        """
+        Splits the frame into partitions by a stable hash of the first key column, so the same
+        input always produces the same partitions and batches when a load is resumed.
+
+        Args:
+            df (pd.DataFrame): The rows to load.
+
+        Returns:
+            Dict[int, pd.DataFrame]: The rows of each non-empty partition.
+        """
+        buckets = pd.util.hash_pandas_object(df[self.key_columns[0]], index=False).to_numpy() % self.n_partitions
+        return {int(partition): part for partition, part in df.groupby(buckets, sort=True)}
+
+    def _ensure_checkpoint_table(self) -> None:
+        if inspect(self.engine).has_table(self.checkpoint_table):
+            return
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE TABLE {self._quote(self.checkpoint_table)} ("
+                "load_id VARCHAR(64) NOT NULL, partition_id INTEGER NOT NULL, batch_id INTEGER NOT NULL, "
+                "row_count INTEGER NOT NULL, PRIMARY KEY (load_id, partition_id, batch_id))"
+            ))
+
+    def completed_batches(self, load_id: str) -> Set[Tuple[int, int]]:
+        """
+        Returns the (partition, batch) pairs already committed for a load.
+
+        Args:
+            load_id (str): The load identifier.
+
+        Returns:
+            Set[Tuple[int, int]]: The completed batches.
+        """
+        self._ensure_checkpoint_table()
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text(f"SELECT partition_id, batch_id FROM {self._quote(self.checkpoint_table)} WHERE load_id = :load_id"),
+                {"load_id": load_id},
+            ).fetchall()
+        return {(row[0], row[1]) for row in rows}
+
+    def _stage_partition(self, load_id: str, partition: int, df: pd.DataFrame, done: Set[Tuple[int, int]]) -> int:
+        staging = self.staging_table(load_id, partition)
+        staged = 0
+        for batch, start in enumerate(range(0, len(df), self.batch_size)):
+            if (partition, batch) in done:
+                continue
+            rows = df.iloc[start:start + self.batch_size]
+            # The batch and its checkpoint commit together, so a batch is never staged twice
+            with self.engine.begin() as conn:
+                rows.to_sql(staging, conn, if_exists="append", index=False)
+                conn.execute(
+                    text(f"INSERT INTO {self._quote(self.checkpoint_table)} (load_id, partition_id, batch_id, row_count) "
+                         "VALUES (:load_id, :partition_id, :batch_id, :row_count)"),
+                    {"load_id": load_id, "partition_id": partition, "batch_id": batch, "row_count": len(rows)},
+                )
+            staged += len(rows)
+        return staged
+
+    def _merge_statements(self, staging: str, columns: List[str]) -> List[str]:
+        target = self._quote(self.table_name)
+        source = self._quote(staging)
+        cols = ", ".join(self._quote(column) for column in columns)
+        on = " AND ".join(f"t.{self._quote(key)} = s.{self._quote(key)}" for key in self.key_columns)
+
+        if self.engine.dialect.name == "mssql":
+            updates = ", ".join(f"t.{self._quote(column)} = s.{self._quote(column)}" for column in columns if column not in self.key_columns)
+            values = ", ".join(f"s.{self._quote(column)}" for column in columns)
+            matched = f"WHEN MATCHED THEN UPDATE SET {updates} " if updates else ""
+            return [f"MERGE INTO {target} WITH (TABLOCK) AS t USING {source} AS s ON {on} "
+                    f"{matched}WHEN NOT MATCHED THEN INSERT ({cols}) VALUES ({values});"]
+
+        exists = " AND ".join(f"s.{self._quote(key)} = {target}.{self._quote(key)}" for key in self.key_columns)
+        keys = ", ".join(self._quote(key) for key in self.key_columns)
+        return [
+            # Without an index on the staged keys the correlated delete would scan staging per target row
+            f"CREATE INDEX {self._quote(f'idx_{staging}_keys')} ON {source} ({keys})",
+            f"DELETE FROM {target} WHERE EXISTS (SELECT 1 FROM {source} AS s WHERE {exists})",
+            f"INSERT INTO {target} ({cols}) SELECT {cols} FROM {source}",
+        ]
+
+    def _merge_partition(self, load_id: str, partition: int, columns: List[str]) -> None:
+        staging = self.staging_table(load_id, partition)
+        with self.engine.begin() as conn:
+            for statement in self._merge_statements(staging=staging, columns=columns):
+                conn.execute(text(statement))
+            conn.execute(text(f"DROP TABLE {self._quote(staging)}"))
+            conn.execute(
+                text(f"DELETE FROM {self._quote(self.checkpoint_table)} WHERE load_id = :load_id AND partition_id = :partition_id"),
+                {"load_id": load_id, "partition_id": partition},
+            )
+
+    def load(self, df: pd.DataFrame, load_id: Optional[str] = None) -> Dict[str, Union[str, float]]:
+        """
+        Stages and merges the frame into the target table.
+
+        Args:
+            df (pd.DataFrame): The rows to load. Must contain the key columns. A repeated key is loaded
+                once, with its last row.
+            load_id (str, optional): Identifier of the load. Pass the id of a failed load to resume it.
+
+        Returns:
+            Dict[str, Union[str, float]]: The load id, rows, staged rows, timings and throughput in rows per second.
+        """
+        missing = [key for key in self.key_columns if key not in df.columns]
+        if missing:
+            raise ValueError(f"Missing key columns in DataFrame: `{missing}`")
+        load_id = load_id or uuid.uuid4().hex[:12]
+        if not re.fullmatch(r"\w+", load_id):
+            raise ValueError(f"Invalid load_id `{load_id}`, only letters, digits and underscores are allowed")
+
+        start = time.perf_counter()
+        if not inspect(self.engine).has_table(self.table_name):
+            df.head(0).to_sql(self.table_name, self.engine, index=False)
+        # A key staged twice would be inserted twice by delete-then-insert and make MERGE fail
+        df = df.drop_duplicates(subset=self.key_columns, keep="last")
+        done = self.completed_batches(load_id)
+        partitions = self.partition(df)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._stage_partition, load_id, partition, part, done) for partition, part in partitions.items()]
+            staged = sum(future.result() for future in futures)
+        staged_at = time.perf_counter()
+
+        for partition in partitions:
+            self._merge_partition(load_id=load_id, partition=partition, columns=list(df.columns))
+        finished = time.perf_counter()
+
+        report = {
+            "load_id": load_id,
+            "rows": len(df),
+            "staged_rows": staged,
+            "stage_seconds": staged_at - start,
+            "merge_seconds": finished - staged_at,
+            "total_seconds": finished - start,
+            "rows_per_second": len(df) / (finished - start) if finished > start else float("inf"),
+        }
+        logging.info(f"Bulk loaded {len(df)} rows into '{self.table_name}' at {report['rows_per_second']:.0f} rows/s")
+        return report
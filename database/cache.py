@@ -0,0 +1,178 @@
+import re
+import sqlite3
+import threading
+import pandas as pd
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+
+# A quoted string literal or identifier (quotes inside are doubled), or a run of whitespace
+_SQL_QUOTED_OR_SPACE = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|\s+""")
+
+
+def normalise_sql(query: str) -> str:
+    """
+    Collapses whitespace and drops a trailing semicolon so equivalent query strings share a cache key.
+    Whitespace inside quoted literals and identifiers is kept, since it changes what the query means.
+
+    Args:
+        query (str): The SQL query.
+
+    Returns:
+        str: The normalised SQL.
+    """
+    collapsed = _SQL_QUOTED_OR_SPACE.sub(lambda match: match.group(1) or " ", query)
+    return collapsed.strip().rstrip(";").strip()
+
+
+class QueryCache:
+    """
+    This class is an LRU cache of query results bounded by their in-memory size. Entries are keyed
+    on the normalised SQL, its bound parameters and the result schema.
+
+    The cache watches the database through `PRAGMA data_version` on a dedicated read-only
+    connection. That value changes whenever another connection commits, so every entry is dropped
+    as soon as the underlying data changes, whichever process wrote it.
+
+    Args:
+        database (str): The SQLite database file the cached queries run against.
+        max_bytes (int): The maximum total size of cached DataFrames. Defaults to 256 MiB.
+    """
+
+    def __init__(self, database: str, max_bytes: int = 256 * 1024 ** 2) -> None:
+        """
+        The constructor for the QueryCache. The watcher connection is opened on first use.
+        """
+        self.database = database
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._bytes = 0
+        self._version: Optional[int] = None
+        self._watcher: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query: str, params: Optional[Dict] = None, schema: Optional[Dict[str, str]] = None) -> Hashable:
+        """
+        Builds the cache key for a query.
+
+        Args:
+            query (str): The SQL query.
+            params (dict, optional): The bound parameters.
+            schema (dict, optional): The schema the result is built with.
+
+        Returns:
+            Hashable: The cache key.
+        """
+        return (
+            normalise_sql(query),
+            tuple(sorted((params or {}).items())),
+            tuple(sorted((schema or {}).items())),
+        )
+
+    def data_version(self) -> int:
+        """
+        Returns the current data version of the database and drops every entry if it has changed.
+
+        Returns:
+            int: The data version seen by the watcher connection.
+        """
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = sqlite3.connect(f"file:{self.database}?mode=ro", uri=True, check_same_thread=False)
+            version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._bytes = 0
+                self._version = version
+            return version
+
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        """
+        Returns a copy of the cached result for `key`, or None on a miss.
+        Callers get a copy because the analytics functions modify frames in place.
+
+        Args:
+            key (Hashable): A key built by `make_key`.
+
+        Returns:
+            Optional[pd.DataFrame]: The cached result, or None.
+        """
+        self.data_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0].copy()
+
+    def put(self, key: Hashable, df: pd.DataFrame, version: int) -> None:
+        """
+        Stores a result read at data version `version`. Results read before the data changed
+        are discarded, and results larger than the whole cache are not stored.
+
+        Args:
+            key (Hashable): A key built by `make_key`.
+            df (pd.DataFrame): The query result.
+            version (int): The data version returned by `data_version` before the query ran.
+        """
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes or version != self.data_version():
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (df.copy(), size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Drops every entry. Counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the cache counters used to tune its size.
+
+        Returns:
+            Dict[str, float]: Hits, misses, hit rate, evictions, invalidations, entries and bytes.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def close(self) -> None:
+        """
+        Closes the watcher connection and drops every entry.
+        """
+        with self._lock:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+            self._entries.clear()
+            self._bytes = 0
+            self._version = None
@@ -0,0 +1,229 @@
+import importlib.util
+import logging
+import os
+import re
+import sqlite3
+import threading
+import pandas as pd
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .exceptions import DataBaseQueryException
+
+DUCKDB_MODES = ("auto", "attach", "copy")
+
+_connections: Dict[Tuple[str, str], "DuckDBConnection"] = {}
+_connections_lock = threading.Lock()
+
+
+def duckdb_available() -> bool:
+    """
+    Returns whether the optional `duckdb` package is installed.
+
+    Returns:
+        bool: True if DuckDB can be imported.
+    """
+    return importlib.util.find_spec("duckdb") is not None
+
+
+class DuckDBConnection:
+    """
+    This class manages an embedded DuckDB database that answers analytical queries over the
+    tables of a SQLite file. DuckDB executes aggregates with vectorised, multi-threaded operators
+    over columnar data, which suits full-history GROUP BY queries far better than SQLite's
+    row-at-a-time engine.
+
+    In "attach" mode the SQLite file is attached read-only through DuckDB's sqlite extension, so
+    queries always see the live data. In "copy" mode the listed tables are copied into DuckDB's own
+    columnar storage and the whole copy is reloaded whenever the SQLite file changes, which suits
+    rarely written data only. "auto" attaches when the extension can be loaded and falls back to a
+    copy otherwise. The extension is never downloaded: it must already be installed, e.g. with
+    `python -c "import duckdb; duckdb.install_extension('sqlite')"` at deployment time.
+
+    Tables keep their SQLite names, so the same SQL runs unchanged on either backend.
+
+    Args:
+        database (str): The SQLite database file.
+        mode (str): "auto", "attach" or "copy".
+        tables (List[str], optional): Tables to copy in "copy" mode. Defaults to ["CoinsTable"].
+        threads (int, optional): Number of DuckDB worker threads. Defaults to DuckDB's own choice.
+    """
+
+    def __init__(self, database: str, mode: str, tables: Optional[List[str]] = None,
+                 threads: Optional[int] = None) -> None:
+        """
+        The constructor for the DuckDBConnection. The DuckDB database is created by `open` or on first use.
+        """
+        if mode not in DUCKDB_MODES:
+            raise ValueError(f"Invalid mode `{mode}`, expected one of {DUCKDB_MODES}")
+        if threads is not None and threads <= 0:
+            raise ValueError(f"threads must be positive, got {threads}")
+        self.database = database
+        self.mode = mode
+        self.tables = tables or ["CoinsTable"]
+        self.threads = threads
+        self._duckdb = None
+        self._active_mode: Optional[str] = None
+        self._signature: Optional[Tuple] = None
+        self._lock = threading.Lock()
+
+    def _source_signature(self) -> Tuple:
+        # Commits in WAL mode only touch the -wal file until it is checkpointed
+        signature = []
+        for path in (self.database, f"{self.database}-wal"):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _open(self) -> None:
+        try:
+            import duckdb
+        except ImportError:
+            raise DataBaseQueryException("The duckdb backend requires the optional `duckdb` package: pip install duckdb")
+
+        self._duckdb = duckdb.connect()
+        # Never reach out to the extension repository while serving queries
+        self._duckdb.execute("SET autoinstall_known_extensions = false")
+        if self.threads is not None:
+            self._duckdb.execute(f"SET threads TO {self.threads}")
+
+        if self.mode in ("auto", "attach"):
+            try:
+                self._duckdb.execute("LOAD sqlite")
+                self._duckdb.execute(f"ATTACH '{self.database}' AS sqlite_source (TYPE SQLITE, READ_ONLY)")
+                self._duckdb.execute("USE sqlite_source")
+                self._active_mode = "attach"
+                return
+            except duckdb.Error as e:
+                if self.mode == "attach":
+                    raise DataBaseQueryException(f"Could not attach '{self.database}' to DuckDB: {e}")
+                logging.warning(f"DuckDB sqlite extension unavailable, using a columnar copy instead: {e}")
+        self._active_mode = "copy"
+
+    def open(self) -> None:
+        """
+        Opens the DuckDB database and attaches or copies the SQLite data now rather than on the
+        first query, e.g. at application startup, so a missing extension surfaces immediately.
+        """
+        with self._lock:
+            if self._duckdb is None:
+                self._open()
+            if self._active_mode == "copy" and self._signature != self._source_signature():
+                self._refresh()
+
+    def refresh(self) -> None:
+        """
+        Copies the tables from the SQLite file into DuckDB. Only used in "copy" mode.
+        """
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        signature = self._source_signature()
+        source = sqlite3.connect(f"file:{self.database}?mode=ro", uri=True)
+        try:
+            for table in self.tables:
+                df = pd.read_sql(f'SELECT * FROM "{table}"', source)
+                self._duckdb.register("sqlite_rows", df)
+                try:
+                    self._duckdb.execute(f'CREATE OR REPLACE TABLE "{table}" AS SELECT * FROM sqlite_rows')
+                finally:
+                    self._duckdb.unregister("sqlite_rows")
+        finally:
+            source.close()
+        self._signature = signature
+        logging.info(f"Copied {len(self.tables)} table(s) from '{self.database}' into DuckDB")
+
+    @contextmanager
+    def connect(self) -> Iterator[Any]:
+        """
+        This method returns a DuckDB cursor over the SQLite data, refreshing the columnar copy first if it is stale.
+        Each call gets its own cursor, so it is safe to use from several threads.
+
+        Yields:
+            duckdb.DuckDBPyConnection: The cursor.
+        """
+        with self._lock:
+            if self._duckdb is None:
+                self._open()
+            if self._active_mode == "copy" and self._signature != self._source_signature():
+                self._refresh()
+            cursor = self._duckdb.cursor()
+        try:
+            if self._active_mode == "attach":
+                cursor.execute("USE sqlite_source")
+            yield cursor
+        finally:
+            cursor.close()
+
+    @property
+    def active_mode(self) -> Optional[str]:
+        """
+        The mode in use once the connection is open: "attach" or "copy".
+        """
+        return self._active_mode
+
+    def close(self) -> None:
+        """
+        Closes the DuckDB database.
+        """
+        with self._lock:
+            if self._duckdb is not None:
+                self._duckdb.close()
+                self._duckdb = None
+                self._active_mode = None
+                self._signature = None
+
+
+def get_duckdb_connection(database: str, mode: str) -> DuckDBConnection:
+    """
+    Returns the shared DuckDBConnection for a SQLite file and mode, creating it on first use.
+
+    Args:
+        database (str): The SQLite database file.
+        mode (str): "auto", "attach" or "copy".
+
+    Returns:
+        DuckDBConnection: The shared connection.
+    """
+    with _connections_lock:
+        key = (os.path.abspath(database), mode)
+        if key not in _connections:
+            _connections[key] = DuckDBConnection(database=database, mode=mode)
+        return _connections[key]
+
+
+def close_duckdb_connections() -> None:
+    """
+    Closes every shared DuckDBConnection.
+    """
+    with _connections_lock:
+        for connection in _connections.values():
+            connection.close()
+        _connections.clear()
+
+
+def run_duckdb_query(query: str, connection: DuckDBConnection, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    """
+    Executes the given SQL query on DuckDB and returns the result as a Pandas DataFrame.
+    Parameters use the same `:name` placeholders as `run_query`.
+
+    Args:
+        query (str): The SQL query to execute.
+        connection (DuckDBConnection): The DuckDB connection.
+        params (dict, optional): Parameters to bind to the SQL query.
+
+    Returns:
+        pd.DataFrame: The result of the query as a DataFrame.
+    """
+    # DuckDB names its parameters `$name`; the lookbehind skips `::` casts and times such as '23:59:59'
+    query = re.sub(r"(?<![:\w]):([A-Za-z_]\w*)", r"$\1", query)
+    try:
+        with connection.connect() as cursor:
+            return cursor.execute(query, params or {}).df()
+    except DataBaseQueryException:
+        raise
+    except Exception as e:
+        raise DataBaseQueryException(f"Error running DuckDB query: {e}")
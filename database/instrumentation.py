@@ -0,0 +1,187 @@
+import json
+import logging
+import threading
+import time
+import pandas as pd
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterator, List, Optional
+from sqlalchemy import text
+from .sql_connection_test import SQLiteConnection
+from .cache import normalise_sql
+
+
+class QueryProfiler:
+    """
+    This class records how long each statement run through `run_query` takes, how many rows it
+    returned and how many bytes the resulting DataFrames hold. Statements slower than
+    `slow_query_ms` also get their `EXPLAIN QUERY PLAN` captured, so a slow chart can be traced
+    to a table scan without reproducing it by hand.
+
+    Records are kept in memory in a bounded registry and, when `log_path` is given, appended to a
+    JSON-lines file as they are made.
+
+    Args:
+        slow_query_ms (float): Statements taking at least this long have their plan captured. Defaults to 100.
+        log_path (str, optional): A JSON-lines file every record is appended to. Defaults to None.
+        max_records (int): The number of most recent records kept in memory. Defaults to 1000.
+    """
+
+    def __init__(self, slow_query_ms: float = 100.0, log_path: Optional[str] = None, max_records: int = 1000) -> None:
+        """
+        The constructor for the QueryProfiler.
+        """
+        if slow_query_ms < 0 or max_records <= 0:
+            raise ValueError("slow_query_ms must not be negative and max_records must be positive")
+        self.slow_query_ms = slow_query_ms
+        self.log_path = log_path
+        self._records: Deque[Dict[str, Any]] = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def explain(self, query: str, connection: SQLiteConnection, params: Optional[Dict] = None) -> List[str]:
+        """
+        Returns the `EXPLAIN QUERY PLAN` of a statement, one line per plan step.
+
+        Args:
+            query (str): The SQL query.
+            connection (SQLiteConnection): The database connection, or a `QuerySession`.
+            params (dict, optional): The bound parameters.
+
+        Returns:
+            List[str]: The plan steps, or an empty list if the plan could not be read.
+        """
+        try:
+            with connection.connect() as conn:
+                rows = conn.execute(text(f"EXPLAIN QUERY PLAN {query}"), params).fetchall()
+            return [row[-1] for row in rows]
+        except Exception as e:
+            logging.warning(f'Could not capture query plan: {e}')
+            return []
+
+    def record(self, query: str, params: Optional[Dict], seconds: float, rows: int, nbytes: int,
+               connection: Optional[SQLiteConnection] = None) -> Dict[str, Any]:
+        """
+        Stores one statement's measurements, capturing its plan if it was slow.
+
+        Args:
+            query (str): The SQL query.
+            params (dict, optional): The bound parameters.
+            seconds (float): Wall time from execution to the finished DataFrame.
+            rows (int): Rows returned.
+            nbytes (int): Bytes held by the returned DataFrame(s).
+            connection (SQLiteConnection, optional): Used to read the plan of slow statements.
+
+        Returns:
+            Dict[str, Any]: The stored record.
+        """
+        milliseconds = seconds * 1000
+        slow = milliseconds >= self.slow_query_ms
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "sql": normalise_sql(query),
+            "params": {key: str(value) for key, value in (params or {}).items()},
+            "milliseconds": round(milliseconds, 3),
+            "rows": rows,
+            "bytes": nbytes,
+            "slow": slow,
+            "plan": self.explain(query=query, connection=connection, params=params) if slow and connection is not None else [],
+        }
+        with self._lock:
+            self._records.append(entry)
+            if self.log_path is not None:
+                with open(self.log_path, "a") as log:
+                    log.write(json.dumps(entry) + "\n")
+        if slow:
+            logging.warning(f"Slow query ({milliseconds:.1f} ms, {rows} rows): {entry['sql']}")
+        return entry
+
+    def profile(self, query: str, connection: SQLiteConnection, params: Optional[Dict], run) -> pd.DataFrame:
+        """
+        Runs `run()` and records the DataFrame it returns.
+
+        Args:
+            query (str): The SQL query being run.
+            connection (SQLiteConnection): The database connection.
+            params (dict, optional): The bound parameters.
+            run (Callable[[], pd.DataFrame]): Executes the query.
+
+        Returns:
+            pd.DataFrame: The result of `run()`.
+        """
+        start = time.perf_counter()
+        df = run()
+        seconds = time.perf_counter() - start
+        self.record(query=query, params=params, seconds=seconds, rows=len(df),
+                    nbytes=int(df.memory_usage(deep=True).sum()), connection=connection)
+        return df
+
+    def profile_stream(self, query: str, connection: SQLiteConnection, params: Optional[Dict],
+                       chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        Passes chunks through and records the totals once the stream is exhausted or closed.
+        Time spent by the caller between chunks is not counted.
+
+        Args:
+            query (str): The SQL query being run.
+            connection (SQLiteConnection): The database connection.
+            params (dict, optional): The bound parameters.
+            chunks (Iterator[pd.DataFrame]): The streamed result.
+
+        Yields:
+            pd.DataFrame: The chunks of `chunks`, unchanged.
+        """
+        seconds, rows, nbytes = 0.0, 0, 0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    seconds += time.perf_counter() - start
+                    break
+                seconds += time.perf_counter() - start
+                rows += len(chunk)
+                nbytes += int(chunk.memory_usage(deep=True).sum())
+                yield chunk
+        finally:
+            self.record(query=query, params=params, seconds=seconds, rows=rows, nbytes=nbytes, connection=connection)
+
+    def records(self, slow_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Returns the records in the registry, oldest first.
+
+        Args:
+            slow_only (bool, optional): Only return statements over the threshold. Defaults to False.
+
+        Returns:
+            List[Dict[str, Any]]: The records.
+        """
+        with self._lock:
+            return [dict(entry) for entry in self._records if entry["slow"] or not slow_only]
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Aggregates the registry per normalised SQL statement.
+
+        Returns:
+            pd.DataFrame: Calls, total/mean/max milliseconds, mean rows, mean bytes and slow calls per statement,
+                slowest total first.
+        """
+        records = pd.DataFrame(self.records(), columns=["sql", "milliseconds", "rows", "bytes", "slow"])
+        summary = records.groupby("sql").agg(
+            calls=("milliseconds", "size"),
+            total_ms=("milliseconds", "sum"),
+            mean_ms=("milliseconds", "mean"),
+            max_ms=("milliseconds", "max"),
+            mean_rows=("rows", "mean"),
+            mean_bytes=("bytes", "mean"),
+            slow_calls=("slow", "sum"),
+        )
+        return summary.sort_values("total_ms", ascending=False).reset_index()
+
+    def clear(self) -> None:
+        """
+        Drops every record in the registry. The log file is left as is.
+        """
+        with self._lock:
+            self._records.clear()
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence
+
+# Declared column types of the table written by `push_to_sqlite`
+COINS_TABLE_SCHEMA: Dict[str, str] = {
+    "Name": "category",
+    "Symbol": "category",
+    "Date": "datetime64[ns]",
+    "High": "float64",
+    "Low": "float64",
+    "Open": "float64",
+    "Close": "float64",
+    "Volume": "float64",
+    "Marketcap": "float64",
+}
+
+
+def _parse_dates(values: List[Any], dtype: np.dtype) -> np.ndarray:
+    # NumPy parses ISO dates and NULLs directly; a batch with any other value goes through pandas,
+    # which turns the dates it cannot parse into NaT instead of failing the whole result
+    try:
+        return np.array(values, dtype=dtype)
+    except ValueError:
+        return pd.to_datetime(pd.Series(values, dtype=object), format="ISO8601", errors="coerce").to_numpy(dtype=dtype)
+
+
+class ColumnarResultBuilder:
+    """
+    This class builds a DataFrame from query result rows using a declared schema. Rows are
+    transposed batch by batch into preallocated NumPy arrays of the declared dtypes, and
+    "category" columns are stored as integer codes, so no object-dtype intermediate frame
+    or dtype inference is needed. Dates that cannot be parsed become NaT. Columns missing
+    from the schema fall back to inference.
+
+    Args:
+        columns (List[str]): The column names of the result, in cursor order.
+        schema (Dict[str, str]): Mapping of column name to dtype, or "category".
+        capacity (int): Initial number of rows to allocate. The arrays grow by doubling.
+    """
+
+    def __init__(self, columns: List[str], schema: Dict[str, str], capacity: int = 1024) -> None:
+        """
+        The constructor for the ColumnarResultBuilder. It allocates one array per column.
+        """
+        self.columns = list(columns)
+        self.kinds = [schema.get(column) for column in self.columns]
+        self._size = 0
+        self._capacity = max(capacity, 1)
+        self._categories: List[Optional[Dict[Any, int]]] = []
+        self._arrays: List[Any] = []
+
+        for kind in self.kinds:
+            if kind == "category":
+                self._categories.append({})
+                self._arrays.append(np.empty(self._capacity, dtype=np.int32))
+            elif kind is None:
+                self._categories.append(None)
+                self._arrays.append([])
+            else:
+                self._categories.append(None)
+                self._arrays.append(np.empty(self._capacity, dtype=kind))
+
+    def _reserve(self, size: int) -> None:
+        if size <= self._capacity:
+            return
+        while self._capacity < size:
+            self._capacity *= 2
+        for i, kind in enumerate(self.kinds):
+            if kind is not None:
+                grown = np.empty(self._capacity, dtype=self._arrays[i].dtype)
+                grown[:self._size] = self._arrays[i][:self._size]
+                self._arrays[i] = grown
+
+    def append(self, rows: Sequence[Sequence[Any]]) -> None:
+        """
+        Appends a batch of rows to the column arrays.
+
+        Args:
+            rows (Sequence[Sequence[Any]]): Rows as returned by the cursor, in `columns` order.
+        """
+        n_rows = len(rows)
+        if n_rows == 0:
+            return
+        start, stop = self._size, self._size + n_rows
+        self._reserve(stop)
+
+        # Each column is read straight out of the row tuples into its typed array, with no
+        # object-dtype copy of the whole batch
+        for i, kind in enumerate(self.kinds):
+            values = map(itemgetter(i), rows)
+            if kind == "category":
+                local_codes, uniques = pd.factorize(np.array(list(values), dtype=object))
+                lookup = self._categories[i]
+                # The trailing -1 maps factorize's missing-value code (-1) back to a missing code
+                global_codes = np.array([lookup.setdefault(value, len(lookup)) for value in uniques] + [-1], dtype=np.int32)
+                self._arrays[i][start:stop] = global_codes[local_codes]
+            elif kind is None:
+                self._arrays[i].extend(values)
+            elif self._arrays[i].dtype.kind == "M":
+                self._arrays[i][start:stop] = _parse_dates(list(values), dtype=self._arrays[i].dtype)
+            else:
+                try:
+                    self._arrays[i][start:stop] = np.fromiter(values, dtype=self._arrays[i].dtype, count=n_rows)
+                except TypeError:
+                    # A NULL in the batch; converting the whole column turns NULLs into NaN
+                    self._arrays[i][start:stop] = np.array([row[i] for row in rows], dtype=self._arrays[i].dtype)
+        self._size = stop
+
+    def build(self) -> pd.DataFrame:
+        """
+        Returns the rows appended so far as a DataFrame with the declared dtypes.
+
+        Returns:
+            pd.DataFrame: The typed result.
+        """
+        data = {}
+        for i, kind in enumerate(self.kinds):
+            if kind == "category":
+                codes = self._arrays[i][:self._size]
+                data[i] = pd.Categorical.from_codes(codes, categories=list(self._categories[i]))
+            elif kind is None:
+                data[i] = pd.Series(self._arrays[i], dtype=None if self._arrays[i] else object)
+            else:
+                data[i] = self._arrays[i][:self._size]
+        df = pd.DataFrame(data, index=pd.RangeIndex(self._size))
+        df.columns = self.columns
+        return df
@@ -0,0 +1,292 @@
+import argparse
+import logging
+import sqlite3
+from typing import Dict, List, Tuple
+
+COINS_TABLE = "CoinsTable"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+HEAP_LAYOUT = "heap"
+CLUSTERED_LAYOUT = "clustered"
+LAYOUTS = (HEAP_LAYOUT, CLUSTERED_LAYOUT)
+TEXT_COLUMNS = ("Name", "Symbol")
+INTEGER_COLUMNS = ("SNo",)
+
+
+def index_name(table_name: str) -> str:
+    """
+    Returns the name of the composite (Name, Date) index for a table.
+
+    Args:
+        table_name (str): The name of the coins table.
+
+    Returns:
+        str: The index name.
+    """
+    return f"idx_{table_name.lower()}_name_date"
+
+
+def normalise_dates(conn: sqlite3.Connection, table_name: str = COINS_TABLE) -> int:
+    """
+    Rewrites the Date column as ISO 8601 text ('YYYY-MM-DD HH:MM:SS') so that dates sort
+    and compare correctly as plain strings. Values SQLite cannot parse are left untouched.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the SQLite database.
+        table_name (str, optional): The table to migrate. Defaults to "CoinsTable".
+
+    Returns:
+        int: The number of rows that were rewritten.
+    """
+    cursor = conn.execute(
+        f"""
+        UPDATE "{table_name}"
+        SET Date = strftime('{DATE_FORMAT}', Date)
+        WHERE strftime('{DATE_FORMAT}', Date) IS NOT NULL
+        AND Date <> strftime('{DATE_FORMAT}', Date)
+        """
+    )
+    return cursor.rowcount
+
+
+def create_indexes(conn: sqlite3.Connection, table_name: str = COINS_TABLE) -> None:
+    """
+    Creates the composite (Name, Date) index used by the per-coin date range queries.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the SQLite database.
+        table_name (str, optional): The table to index. Defaults to "CoinsTable".
+    """
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "{index_name(table_name)}" ON "{table_name}" (Name, Date)')
+
+
+def clustered_table_name(table_name: str) -> str:
+    """
+    Returns the name of the WITHOUT ROWID table that stores a coins table in the clustered layout.
+
+    Args:
+        table_name (str): The name of the coins table.
+
+    Returns:
+        str: The clustered table name.
+    """
+    return f"{table_name}_clustered"
+
+
+def table_layout(conn: sqlite3.Connection, table_name: str = COINS_TABLE) -> str:
+    """
+    Returns the storage layout of a coins table.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the SQLite database.
+        table_name (str, optional): The name of the coins table. Defaults to "CoinsTable".
+
+    Returns:
+        str: "clustered" if the table is a view over its clustered table, "heap" otherwise.
+    """
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (table_name,)).fetchone()
+    return CLUSTERED_LAYOUT if row is not None and row[0] == "view" else HEAP_LAYOUT
+
+
+def clustered_column_types(conn: sqlite3.Connection, table_name: str) -> Dict[str, str]:
+    """
+    Returns the column types of the clustered layout for the columns of an existing table.
+    Dates become INTEGER seconds since the Unix epoch and numeric columns become REAL.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the SQLite database.
+        table_name (str): The existing (heap) coins table.
+
+    Returns:
+        Dict[str, str]: The column names, in table order, and their storage types.
+    """
+    types = {}
+    for _, column, _, _, _, _ in conn.execute(f'PRAGMA table_info("{table_name}")'):
+        if column == "Date" or column in INTEGER_COLUMNS:
+            types[column] = "INTEGER"
+        elif column in TEXT_COLUMNS:
+            types[column] = "TEXT"
+        else:
+            types[column] = "REAL"
+    return types
+
+
+def clustered_select(columns: Dict[str, str], source: str) -> str:
+    """
+    Builds the SELECT that converts heap rows of `source` to the clustered layout's storage types.
+
+    Args:
+        columns (Dict[str, str]): The column types returned by `clustered_column_types`.
+        source (str): The table to read from.
+
+    Returns:
+        str: The SQL query.
+    """
+    expressions = []
+    for column, kind in columns.items():
+        if column == "Date":
+            expressions.append("CAST(strftime('%s', Date) AS INTEGER)")
+        elif kind == "TEXT":
+            expressions.append(f'"{column}"')
+        else:
+            expressions.append(f'CAST("{column}" AS {kind})')
+    return f'SELECT {", ".join(expressions)} FROM "{source}" ORDER BY Name, Date'
+
+
+def clustered_view_select(table_name: str, columns: List[str]) -> str:
+    """
+    Builds the SELECT that reads a clustered table with the heap layout's ISO text dates.
+    The clustered table is aliased `c`, so callers can append predicates on its integer `c.Date`.
+
+    Args:
+        table_name (str): The name of the coins table.
+        columns (List[str]): The columns of the clustered table.
+
+    Returns:
+        str: The SQL query.
+    """
+    expressions = [f"strftime('{DATE_FORMAT}', c.Date, 'unixepoch') AS Date" if column == "Date" else f'c."{column}"' for column in columns]
+    return f'SELECT {", ".join(expressions)} FROM "{clustered_table_name(table_name)}" AS c'
+
+
+def create_clustered_view(conn: sqlite3.Connection, table_name: str, columns: List[str]) -> None:
+    """
+    Creates the view that presents a clustered table with the heap layout's ISO text dates, so
+    every existing query keeps working unchanged.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the SQLite database.
+        table_name (str): The name of the coins table, used for the view.
+        columns (List[str]): The columns of the clustered table.
+    """
+    conn.execute(f'CREATE VIEW "{table_name}" AS {clustered_view_select(table_name=table_name, columns=columns)}')
+
+
+def migrate_to_clustered(conn: sqlite3.Connection, table_name: str = COINS_TABLE) -> int:
+    """
+    Converts a heap coins table to the clustered layout. The rows move to a `WITHOUT ROWID` table
+    whose primary key is (Name, Date), so each coin's history is stored contiguously in key order
+    and a per-coin range read touches consecutive pages. Dates are stored as INTEGER epoch seconds
+    and numeric columns as REAL, which also makes the file smaller. `table_name` becomes a view
+    with the old column layout. Rows sharing a (Name, Date) key keep the last one.
+
+    The migration is idempotent: a table already in the clustered layout is left as is.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the SQLite database.
+        table_name (str, optional): The table to migrate. Defaults to "CoinsTable".
+
+    Returns:
+        int: The number of rows in the clustered table.
+    """
+    clustered = clustered_table_name(table_name)
+    if table_layout(conn=conn, table_name=table_name) == CLUSTERED_LAYOUT:
+        return conn.execute(f'SELECT COUNT(*) FROM "{clustered}"').fetchone()[0]
+
+    with conn:
+        normalise_dates(conn=conn, table_name=table_name)
+        columns = clustered_column_types(conn=conn, table_name=table_name)
+        definitions = [f'"{column}" {kind}' + (" NOT NULL" if column in ("Name", "Date") else "") for column, kind in columns.items()]
+        conn.execute(f'CREATE TABLE "{clustered}" ({", ".join(definitions)}, PRIMARY KEY (Name, Date)) WITHOUT ROWID')
+        conn.execute(f'INSERT OR REPLACE INTO "{clustered}" {clustered_select(columns=columns, source=table_name)}')
+        conn.execute(f'DROP TABLE "{table_name}"')
+        create_clustered_view(conn=conn, table_name=table_name, columns=list(columns))
+        rows = conn.execute(f'SELECT COUNT(*) FROM "{clustered}"').fetchone()[0]
+    logging.info(f"Migrated table '{table_name}' to the clustered layout, {rows} row(s).")
+    return rows
+
+
+def migrate_to_heap(conn: sqlite3.Connection, table_name: str = COINS_TABLE) -> int:
+    """
+    Converts a clustered coins table back to the heap layout with ISO text dates and the (Name, Date) index.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the SQLite database.
+        table_name (str, optional): The table to migrate. Defaults to "CoinsTable".
+
+    Returns:
+        int: The number of rows in the heap table.
+    """
+    if table_layout(conn=conn, table_name=table_name) == HEAP_LAYOUT:
+        return conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+
+    heap = f"{table_name}_heap"
+    with conn:
+        conn.execute(f'CREATE TABLE "{heap}" AS SELECT * FROM "{table_name}"')
+        conn.execute(f'DROP VIEW "{table_name}"')
+        conn.execute(f'DROP TABLE "{clustered_table_name(table_name)}"')
+        conn.execute(f'ALTER TABLE "{heap}" RENAME TO "{table_name}"')
+        create_indexes(conn=conn, table_name=table_name)
+        rows = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+    logging.info(f"Migrated table '{table_name}' to the heap layout, {rows} row(s).")
+    return rows
+
+
+def detect_layout(conn: sqlite3.Connection, table_name: str = COINS_TABLE) -> Tuple[str, List[str]]:
+    """
+    Returns the storage layout of a coins table, together with the columns of its clustered table.
+    Callers pass the connection their query runs on, so the layout is read from the same snapshot.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the SQLite database.
+        table_name (str, optional): The name of the coins table. Defaults to "CoinsTable".
+
+    Returns:
+        Tuple[str, List[str]]: The layout and, for the clustered layout, the clustered table's columns.
+    """
+    layout = table_layout(conn=conn, table_name=table_name)
+    if layout == HEAP_LAYOUT:
+        return layout, []
+    return layout, [row[1] for row in conn.execute(f'PRAGMA table_info("{clustered_table_name(table_name)}")')]
+
+
+def migrate_coins_table(conn: sqlite3.Connection, table_name: str = COINS_TABLE) -> None:
+    """
+    Brings a coins table up to the current schema: ISO text dates and a (Name, Date) index.
+    The migration is idempotent and is safe to run on every load. Tables in the clustered
+    layout already satisfy both and are left as is.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the SQLite database.
+        table_name (str, optional): The table to migrate. Defaults to "CoinsTable".
+    """
+    if table_layout(conn=conn, table_name=table_name) == CLUSTERED_LAYOUT:
+        return
+    with conn:
+        rewritten = normalise_dates(conn=conn, table_name=table_name)
+        create_indexes(conn=conn, table_name=table_name)
+    logging.info(f"Migrated table '{table_name}', normalised {rewritten} date value(s).")
+
+
+def main():
+    """
+    Migrates the coins table of an existing SQLite database in place.
+
+    Usage:
+        python -m database.schema ./test_db.db
+        python -m database.schema ./test_db.db --table CoinsTable
+        python -m database.schema ./test_db.db --layout clustered --vacuum
+    """
+    parser = argparse.ArgumentParser(description='Migrate the coins table of a SQLite database.')
+    parser.add_argument('db_name', type=str, help='Path of the SQLite database file.')
+    parser.add_argument('--table', type=str, default=COINS_TABLE, help='The table to migrate. Default is "CoinsTable".')
+    parser.add_argument('--layout', type=str, choices=LAYOUTS, default=None, help='Convert the table to this storage layout.')
+    parser.add_argument('--vacuum', action='store_true', help='Rebuild the file afterwards to release the freed pages.')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_name)
+    try:
+        if args.layout == CLUSTERED_LAYOUT:
+            migrate_to_clustered(conn=conn, table_name=args.table)
+        elif args.layout == HEAP_LAYOUT:
+            migrate_to_heap(conn=conn, table_name=args.table)
+        else:
+            migrate_coins_table(conn=conn, table_name=args.table)
+        if args.vacuum:
+            conn.execute("VACUUM")
+        print(f"Table '{args.table}' in database '{args.db_name}' migrated ({table_layout(conn=conn, table_name=args.table)} layout).")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from sqlalchemy.engine import Connection
+from .sql_connection_test import SQLiteConnection
+
+
+class QuerySession:
+    """
+    This class is a unit of work that borrows one pooled connection and runs every statement of a
+    request on it. It exposes the same `connect()` method as `SQLiteConnection`, so it can be passed
+    as the `connection` argument of `run_query`, `run_updated_query` and their async versions.
+
+    With `snapshot=True` all statements run inside a single read transaction, so they see one
+    consistent version of the data even if a load commits part way through the request.
+
+    Args:
+        connection (SQLiteConnection): The connection manager to borrow from.
+        snapshot (bool): Whether to run all statements in one read transaction. Defaults to False.
+    """
+
+    def __init__(self, connection: SQLiteConnection, snapshot: bool = False) -> None:
+        """
+        The constructor for the QuerySession. The connection is borrowed on first use.
+        """
+        self.database = connection.database
+        self._source = connection
+        self.snapshot = snapshot
+        self._conn: Optional[Connection] = None
+        self._lock = threading.RLock()
+        self.statements = 0
+
+    def __enter__(self) -> "QuerySession":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _borrow(self) -> Connection:
+        if self._conn is None:
+            self._conn = self._source.connect()
+            if self.snapshot:
+                # SQLite takes the read snapshot at the first read after BEGIN
+                self._conn.connection.dbapi_connection.execute("BEGIN")
+                self._conn.connection.dbapi_connection.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+        return self._conn
+
+    @contextmanager
+    def connect(self) -> Iterator[Connection]:
+        """
+        This method returns the borrowed connection without closing it afterwards.
+        Statements of one session run one at a time.
+
+        Yields:
+            sqlalchemy.engine.Connection: The borrowed connection.
+        """
+        with self._lock:
+            conn = self._borrow()
+            self.statements += 1
+            yield conn
+
+    def close(self) -> None:
+        """
+        This method ends the read transaction, if any, and returns the connection to the pool.
+        """
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                if self.snapshot:
+                    self._conn.connection.dbapi_connection.rollback()
+                self._conn.close()
+            except Exception as e:
+                logging.error(f'Error closing query session: {e}')
+                raise
+            finally:
+                self._conn = None
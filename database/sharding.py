@@ -0,0 +1,212 @@
+import json
+import os
+import zlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from .sql_connection_test import SQLiteConnection
+from .utility import run_query, run_updated_query
+
+MANIFEST_FILE = "shards.json"
+
+
+def shard_for(coin_name: str, n_shards: int) -> int:
+    """
+    Returns the shard a coin is stored in. CRC32 is used rather than `hash()`, which is salted
+    per process, so every process routes a coin to the same file.
+
+    Args:
+        coin_name (str): The coin name.
+        n_shards (int): The number of shards.
+
+    Returns:
+        int: The shard number.
+    """
+    return zlib.crc32(str(coin_name).encode("utf-8")) % n_shards
+
+
+class ShardedSQLiteConnection:
+    """
+    This class manages a set of SQLite files that together hold CoinsTable, with every coin stored
+    whole in exactly one shard. Each shard has its own database lock, so loads into different shards
+    run concurrently and reads of one shard are not blocked by a load into another. Because a coin
+    never spans shards, any per-coin query (including GROUP BY Name aggregates) can run on each
+    shard independently and the results simply be concatenated.
+
+    The shard count is recorded in a `shards.json` manifest in the directory, so every reader and
+    loader routes coins the same way.
+
+    Args:
+        directory (str): The directory holding the shard files.
+        n_shards (int, optional): The number of shards. Defaults to the manifest's value, or 4 for a new directory.
+        max_workers (int, optional): Shards queried or loaded in parallel. Defaults to the number of shards.
+        **connection_kwargs: Settings passed to each shard's `SQLiteConnection`, e.g. `pool_size`.
+    """
+
+    def __init__(self, directory: str, n_shards: Optional[int] = None, max_workers: Optional[int] = None,
+                 **connection_kwargs) -> None:
+        """
+        The constructor for the ShardedSQLiteConnection. It reads or writes the shard manifest.
+        """
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as manifest:
+                stored = json.load(manifest)["n_shards"]
+            if n_shards is not None and n_shards != stored:
+                raise ValueError(f"Directory '{directory}' holds {stored} shards, got n_shards={n_shards}")
+            n_shards = stored
+        else:
+            n_shards = n_shards or 4
+            if n_shards <= 0:
+                raise ValueError(f"n_shards must be positive, got {n_shards}")
+            with open(manifest_path, "w") as manifest:
+                json.dump({"n_shards": n_shards}, manifest)
+
+        self.directory = directory
+        self.n_shards = n_shards
+        self.max_workers = max_workers or n_shards
+        self.connections = [SQLiteConnection(database=self.shard_path(shard), **connection_kwargs) for shard in range(n_shards)]
+
+    def shard_path(self, shard: int) -> str:
+        """
+        Returns the file of one shard.
+
+        Args:
+            shard (int): The shard number.
+
+        Returns:
+            str: The path of the shard's SQLite file.
+        """
+        return os.path.join(self.directory, f"shard_{shard:02d}.db")
+
+    def existing_shards(self) -> List[int]:
+        """
+        Returns the shards that have a database file. A shard no load has written to yet has none.
+
+        Returns:
+            List[int]: The shard numbers.
+        """
+        return [shard for shard in range(self.n_shards) if os.path.exists(self.shard_path(shard))]
+
+    def group_by_shard(self, coin_names: List[str]) -> Dict[int, List[str]]:
+        """
+        Groups coin names by the shard that stores them, keeping their order within each shard.
+
+        Args:
+            coin_names (List[str]): The coin names.
+
+        Returns:
+            Dict[int, List[str]]: The coin names of each shard that holds any of them.
+        """
+        groups: Dict[int, List[str]] = {}
+        for coin_name in coin_names:
+            groups.setdefault(shard_for(coin_name, self.n_shards), []).append(coin_name)
+        return groups
+
+    def partition(self, df: pd.DataFrame) -> Dict[int, pd.DataFrame]:
+        """
+        Splits a frame by the shard of each row's coin. Every shard gets a frame, possibly empty.
+
+        Args:
+            df (pd.DataFrame): Rows with a Name column.
+
+        Returns:
+            Dict[int, pd.DataFrame]: The rows of each shard.
+        """
+        names = df["Name"].astype(str)
+        lookup = {name: shard_for(name, self.n_shards) for name in names.unique()}
+        shards = names.map(lookup).to_numpy() if len(df) else np.empty(0, dtype=int)
+        return {shard: df[shards == shard] for shard in range(self.n_shards)}
+
+    def map(self, func, shards: List[int]) -> List:
+        """
+        Runs `func(shard)` for each shard, in parallel, and returns the results in `shards` order.
+
+        Args:
+            func (Callable[[int], Any]): The work for one shard.
+            shards (List[int]): The shards to run it on.
+
+        Returns:
+            List: The results.
+        """
+        if len(shards) <= 1:
+            return [func(shard) for shard in shards]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(shards)), thread_name_prefix="shard") as pool:
+            return list(pool.map(func, shards))
+
+    def close(self) -> None:
+        """
+        Disposes the engine of every shard.
+        """
+        for connection in self.connections:
+            if connection._engine is not None:
+                connection._engine.dispose()
+
+
+def _concat_shards(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    frames = [frame for frame in frames if len(frame.columns)]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    # Each shard builds its own categories, so categorical columns come back as objects
+    for column, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    return df
+
+
+def run_sharded_query(query: str, connection: ShardedSQLiteConnection, params: Optional[Dict[str, str]] = None,
+                      schema: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Executes the given SQL query on every shard with a database file, in parallel, and concatenates the results.
+    The result is exact for queries that only combine rows of the same coin, such as filters
+    and GROUP BY Name aggregates; global aggregates need a second pass over the shard results.
+
+    Args:
+        query (str): The SQL query to execute.
+        connection (ShardedSQLiteConnection): The sharded database.
+        params (dict, optional): Parameters to bind to the SQL query.
+        schema (dict, optional): Column name to dtype mapping used to build typed columns.
+
+    Returns:
+        pd.DataFrame: The concatenated results, in shard order.
+    """
+    frames = connection.map(
+        lambda shard: run_query(query=query, connection=connection.connections[shard], params=params, schema=schema),
+        connection.existing_shards(),
+    )
+    return _concat_shards(frames)
+
+
+def run_sharded_updated_query(coin_names: List[str], start_date: str, end_date: str,
+                              connection: ShardedSQLiteConnection) -> pd.DataFrame:
+    """
+    Sharded version of `run_updated_query`. Each coin is routed to its shard, the shards that hold
+    any requested coin are queried in parallel and the results are merged in the requested coin order.
+
+    Args:
+        coin_names (List[str]): A list of coin names to retrieve data for.
+        start_date (str): The start date of the date range (inclusive).
+        end_date (str): The end date of the date range (inclusive).
+        connection (ShardedSQLiteConnection): The sharded database.
+
+    Returns:
+        pd.DataFrame: A Pandas DataFrame containing the retrieved data, ordered by the requested coins.
+    """
+    coin_names = list(dict.fromkeys(coin_names))
+    existing = connection.existing_shards()
+    # A shard without a file holds none of the coins
+    groups = {shard: names for shard, names in connection.group_by_shard(coin_names).items() if shard in existing}
+    frames = connection.map(
+        lambda shard: run_updated_query(coin_names=groups[shard], start_date=start_date, end_date=end_date,
+                                        connection=connection.connections[shard]),
+        list(groups),
+    )
+    df = _concat_shards(frames)
+    if df.empty:
+        return df
+
+    coin_order = pd.Categorical(df["Name"], categories=coin_names).codes
+    return df.iloc[np.argsort(coin_order, kind="stable")].reset_index(drop=True)
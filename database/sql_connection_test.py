@@ -1,20 +1,40 @@
 import os
 import logging
-from sqlalchemy import create_engine
+from typing import Dict, Optional, Union
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
+JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+TEMP_STORES = {"DEFAULT", "FILE", "MEMORY"}
+
 
 class SQLiteConnection:
     """
     This class manages the SQL connection to an SQLite database. It encapsulates the connection details, 
     such as the database file path. It provides methods to get an engine, a session, and a connection.
 
+    Every new connection is configured with a performance profile through PRAGMA statements. WAL
+    journaling lets readers run alongside a writer, and the page cache and memory map keep hot pages
+    warm. Pass None for any pragma to keep SQLite's default.
+
     Args:
         database (str): The name of the SQLite database file to connect to.
+        journal_mode (str): The journal mode, e.g. "WAL" or "DELETE". Defaults to "WAL".
+        synchronous (str): The synchronous level, "OFF", "NORMAL", "FULL" or "EXTRA". Defaults to "NORMAL".
+        cache_size (int): The page cache size, in pages or, when negative, in KiB. Defaults to -65536 (64 MiB).
+        mmap_size (int): The number of bytes of the file to memory map. Defaults to 268435456 (256 MiB).
+        temp_store (str): Where temporary tables and indices live, "DEFAULT", "FILE" or "MEMORY". Defaults to "MEMORY".
+        pool_size (int): The number of connections kept open in the pool. Defaults to 5.
+        max_overflow (int): The number of extra connections allowed above `pool_size`. Defaults to 10.
+        pool_timeout (float): Seconds to wait for a pooled connection. Defaults to 30.
         _engine (sqlalchemy.engine): The engine that is used to interact with the database.
     """
 
-    def __init__(self, database=None):
+    def __init__(self, database=None, journal_mode: Optional[str] = "WAL", synchronous: Optional[str] = "NORMAL",
+                 cache_size: Optional[int] = -65536, mmap_size: Optional[int] = 268435456,
+                 temp_store: Optional[str] = "MEMORY", pool_size: int = 5, max_overflow: int = 10,
+                 pool_timeout: float = 30):
         """
         The constructor for the SQLiteConnection. It initializes the connection parameters.
         """
@@ -24,6 +44,47 @@ class SQLiteConnection:
         else:
             raise ValueError(f"Database connection not established, connection = {database}")
 
+        self.journal_mode = self._validate_choice("journal_mode", journal_mode, JOURNAL_MODES)
+        self.synchronous = self._validate_choice("synchronous", synchronous, SYNCHRONOUS_LEVELS)
+        self.temp_store = self._validate_choice("temp_store", temp_store, TEMP_STORES)
+        self.cache_size = None if cache_size is None else int(cache_size)
+        self.mmap_size = None if mmap_size is None else int(mmap_size)
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+
+    @staticmethod
+    def _validate_choice(name: str, value: Optional[str], choices: set) -> Optional[str]:
+        if value is None:
+            return None
+        if value.upper() not in choices:
+            raise ValueError(f"Invalid {name} `{value}`, expected one of {sorted(choices)}")
+        return value.upper()
+
+    def pragmas(self) -> Dict[str, Union[str, int]]:
+        """
+        This method returns the PRAGMA settings applied to every new connection.
+
+        Returns:
+            Dict[str, Union[str, int]]: The pragma names and values, skipping those left as None.
+        """
+        pragmas = {
+            "journal_mode": self.journal_mode,
+            "synchronous": self.synchronous,
+            "cache_size": self.cache_size,
+            "mmap_size": self.mmap_size,
+            "temp_store": self.temp_store,
+        }
+        return {name: value for name, value in pragmas.items() if value is not None}
+
+    def _apply_pragmas(self, dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in self.pragmas().items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
     def get_engine(self):
         """
         This method returns a sqlalchemy engine that is used to interact with the SQLite database.
@@ -41,8 +102,12 @@ class SQLiteConnection:
         if not self._engine:
             try:
                 self._engine = create_engine(
-                    f"sqlite:///{self.database}"
+                    f"sqlite:///{self.database}",
+                    pool_size=self.pool_size,
+                    max_overflow=self.max_overflow,
+                    pool_timeout=self.pool_timeout,
                 )
+                event.listen(self._engine, "connect", self._apply_pragmas)
             except Exception as e:
                 logging.error(f'Error creating SQLite engine: {e}')
                 raise
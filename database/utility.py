@@ -1,72 +1,329 @@
+import sqlite3
+import numpy as np
 import pandas as pd
 from sqlalchemy import text
 from .sql_connection_test import SQLiteConnection
 from .exceptions import DataBaseQueryException
+from .result_builder import ColumnarResultBuilder, COINS_TABLE_SCHEMA
+from .cache import QueryCache
+from .schema import detect_layout, clustered_view_select, COINS_TABLE, CLUSTERED_LAYOUT
+from .instrumentation import QueryProfiler
+from .duckdb_backend import get_duckdb_connection, run_duckdb_query
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Iterator, Union
 
-def run_query(query: str, connection: SQLiteConnection, params: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+DEFAULT_CHUNKSIZE = 50_000
+ANALYTICS_BACKENDS = ("sqlite", "duckdb")
+
+
+def run_query(query: str, connection: SQLiteConnection, params: Optional[Dict[str, str]] = None,
+              chunksize: Optional[int] = None, schema: Optional[Dict[str, str]] = None,
+              cache: Optional[QueryCache] = None,
+              profiler: Optional[QueryProfiler] = None) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
     """
     Executes the given SQL query on the provided database connection
     and returns the result as a Pandas DataFrame.
+
+    When `chunksize` is given the result is streamed instead: an iterator is returned that yields
+    DataFrames of at most `chunksize` rows, so callers that only aggregate never hold the full result.
+
+    When `schema` is given (e.g. `COINS_TABLE_SCHEMA`) the rows are read straight into typed column
+    arrays by `ColumnarResultBuilder` instead of going through pandas type inference.
+
+    When `cache` is given, results are served from and stored in that `QueryCache`. Streamed
+    queries are never cached.
+
+    When `profiler` is given, the wall time, row count and size of the result are recorded in that
+    `QueryProfiler`, together with the query plan of slow statements.
     
     Args:
         query (str): The SQL query to execute.
-        connection (sqlalchemy.engine.Connection): The database connection.
+        connection (sqlalchemy.engine.Connection): The database connection, or a `QuerySession` to reuse one connection.
         params (dict, optional): Parameters to bind to the SQL query (e.g., for parameterized queries).
+        chunksize (int, optional): Number of rows per yielded DataFrame. Defaults to None (no streaming).
+        schema (dict, optional): Column name to dtype mapping used to build typed columns. Defaults to None.
+        cache (QueryCache, optional): The result cache to use. Defaults to None.
+        profiler (QueryProfiler, optional): The profiler to record the statement in. Defaults to None.
     
     Returns:
-        pd.DataFrame: The result of the query as a DataFrame.
+        Union[pd.DataFrame, Iterator[pd.DataFrame]]: The result of the query as a DataFrame, or an iterator of DataFrame chunks.
     """
+    if profiler is not None:
+        if chunksize is not None:
+            chunks = run_query(query=query, connection=connection, params=params, chunksize=chunksize, schema=schema)
+            return profiler.profile_stream(query=query, connection=connection, params=params, chunks=chunks)
+        return profiler.profile(query=query, connection=connection, params=params,
+                                run=lambda: run_query(query=query, connection=connection, params=params, schema=schema, cache=cache))
+
+    if chunksize is not None:
+        if chunksize <= 0:
+            raise DataBaseQueryException(f"Logic error: chunksize must be positive, got {chunksize}")
+        return stream_query(query=query, connection=connection, params=params, chunksize=chunksize, schema=schema)
+
+    if cache is not None:
+        key = cache.make_key(query=query, params=params, schema=schema)
+        version = cache.data_version()
+        df = cache.get(key)
+        if df is None:
+            df = run_query(query=query, connection=connection, params=params, schema=schema)
+            cache.put(key, df, version=version)
+        return df
+
     try:
+        if schema is not None:
+            # Read the DBAPI cursor directly so no SQLAlchemy Row objects are created
+            with connection.connect() as conn:
+                cursor = conn.connection.cursor()
+                try:
+                    cursor.execute(query, params or {})
+                    builder = ColumnarResultBuilder(columns=[column[0] for column in cursor.description or []], schema=schema)
+                    while rows := cursor.fetchmany(DEFAULT_CHUNKSIZE):
+                        builder.append(rows)
+                finally:
+                    cursor.close()
+            return builder.build()
+
         # Execute the query with optional parameters
         with connection.connect() as conn:
             result = conn.execute(text(query), params)
-        
-        # Convert the result to a Pandas DataFrame
-        df = pd.DataFrame(result.fetchall(), columns=result.keys())
-        
-        # Close the result proxy
-        result.close()
+
+            # Convert the result to a Pandas DataFrame while the connection is still open
+            df = pd.DataFrame(result.fetchall(), columns=result.keys())
+
+            # Close the result proxy
+            result.close()
         
         return df
-    except SQLAlchemyError as e:
+    except (SQLAlchemyError, sqlite3.Error) as e:
         raise DataBaseQueryException(f"Error running database query: {e}")
     except Exception as e:
         raise DataBaseQueryException(f"Logic error: {e}")
 
-def run_updated_query(coin_names: List[str], start_date: str, end_date: str, connection: SQLiteConnection) -> pd.DataFrame:
+
+def stream_query(query: str, connection: SQLiteConnection, params: Optional[Dict[str, str]] = None,
+                 chunksize: int = DEFAULT_CHUNKSIZE, schema: Optional[Dict[str, str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Executes the given SQL query and yields the result as DataFrame chunks.
+    The connection stays open until the iterator is exhausted or closed.
+
+    Args:
+        query (str): The SQL query to execute.
+        connection (sqlalchemy.engine.Connection): The database connection.
+        params (dict, optional): Parameters to bind to the SQL query.
+        chunksize (int, optional): Number of rows per yielded DataFrame. Defaults to DEFAULT_CHUNKSIZE.
+        schema (dict, optional): Column name to dtype mapping used to build typed chunks. Defaults to None.
+
+    Yields:
+        pd.DataFrame: The next chunk of at most `chunksize` rows.
+    """
+    try:
+        with connection.connect() as conn:
+            result = conn.execute(text(query), params, execution_options={"stream_results": True})
+            columns = list(result.keys())
+            for rows in result.partitions(chunksize):
+                if schema is None:
+                    yield pd.DataFrame(rows, columns=columns)
+                else:
+                    builder = ColumnarResultBuilder(columns=columns, schema=schema, capacity=len(rows))
+                    builder.append(rows)
+                    yield builder.build()
+    except SQLAlchemyError as e:
+        raise DataBaseQueryException(f"Error running database query: {e}")
+
+
+def build_in_clause(values: List[str], prefix: str = "coin") -> Tuple[str, Dict[str, str]]:
+    """
+    Builds the placeholder list and bound parameters for a SQL `IN (...)` clause.
+
+    Args:
+        values (List[str]): The values to bind.
+        prefix (str, optional): The prefix used for the generated parameter names. Defaults to "coin".
+
+    Returns:
+        Tuple[str, Dict[str, str]]: The comma separated placeholders and the matching parameters dictionary.
+    """
+    params = {f"{prefix}_{i}": value for i, value in enumerate(values)}
+    placeholders = ", ".join(f":{key}" for key in params)
+    return placeholders, params
+
+
+def build_updated_query(coin_names: List[str], start_date: str, end_date: str,
+                        clustered_columns: Optional[List[str]] = None) -> Tuple[str, Dict[str, str]]:
+    """
+    Builds the single query used by `run_updated_query` together with its bound parameters.
+
+    The date window is expressed as a plain range on the Date column so SQLite can answer it
+    from the (Name, Date) index created by `database.schema`. For a table in the clustered layout
+    the window is applied to the integer dates of the clustered table, so it is answered from a
+    primary key range instead of converting every date of the requested coins.
+
+    Args:
+        coin_names (List[str]): A list of coin names to retrieve data for.
+        start_date (str): The start date of the date range (inclusive).
+        end_date (str): The end date of the date range (inclusive).
+        clustered_columns (List[str], optional): The clustered table's columns when CoinsTable uses the clustered layout.
+
+    Returns:
+        Tuple[str, Dict[str, str]]: The SQL query and its parameters.
+    """
+    placeholders, params = build_in_clause(coin_names)
+    params.update({"start_date": start_date, "end_date": end_date})
+
+    if clustered_columns:
+        in_range = f"""{clustered_view_select(table_name=COINS_TABLE, columns=clustered_columns)}
+        WHERE c.Name IN ({placeholders})
+        AND c.Date >= CAST(strftime('%s', :start_date) AS INTEGER)
+        AND c.Date < CAST(strftime('%s', date(:end_date, '+1 day')) AS INTEGER)"""
+    else:
+        in_range = f"""SELECT * FROM CoinsTable
+        WHERE Name IN ({placeholders})
+        AND Date >= :start_date AND Date < date(:end_date, '+1 day')"""
+
+    # Coins without rows in the window are served from `requested` instead
+    query = f"""
+    WITH requested AS (
+        SELECT * FROM CoinsTable WHERE Name IN ({placeholders})
+    ),
+    in_range AS (
+        {in_range}
+    )
+    SELECT * FROM in_range
+    UNION ALL
+    SELECT * FROM requested WHERE Name NOT IN (SELECT Name FROM in_range)
+    """
+    return query, params
+
+
+def run_updated_query(coin_names: List[str], start_date: str, end_date: str, connection: SQLiteConnection,
+                      cache: Optional[QueryCache] = None, profiler: Optional[QueryProfiler] = None) -> pd.DataFrame:
     """
     Retrieves data from the database for the specified coins within the given date range.
 
+    All coins are fetched in a single round trip. A coin with no rows inside the date range
+    falls back to its full history, matching the previous per-coin behaviour.
+
     Args:
         coin_names (List[str]): A list of coin names to retrieve data for.
         start_date (str): The start date of the date range (inclusive).
         end_date (str): The end date of the date range (inclusive).
         connection (sqlalchemy.engine.Connection): The database connection to use.
+        cache (QueryCache, optional): The result cache to use. Defaults to None.
+        profiler (QueryProfiler, optional): The profiler to record the query in. Defaults to None.
+
+    Returns:
+        pd.DataFrame: A Pandas DataFrame containing the retrieved data, ordered by the requested coins.
+    """
+    coin_names = list(dict.fromkeys(coin_names))
+    if not coin_names:
+        return pd.DataFrame()
+
+    try:
+        # Read on the caller's pooled connection or session, no extra connection is opened
+        with connection.connect() as conn:
+            layout, clustered_columns = detect_layout(conn=conn.connection.dbapi_connection)
+    except (SQLAlchemyError, sqlite3.Error) as e:
+        raise DataBaseQueryException(f"Error running database query: {e}")
+    query, params = build_updated_query(coin_names=coin_names, start_date=start_date, end_date=end_date,
+                                        clustered_columns=clustered_columns if layout == CLUSTERED_LAYOUT else None)
+    df = run_query(query=query, connection=connection, params=params, schema=COINS_TABLE_SCHEMA, cache=cache, profiler=profiler)
+
+    # Restore the caller's coin order, keeping each coin's rows in table order
+    coin_order = pd.Categorical(df["Name"], categories=coin_names).codes
+    df = df.iloc[np.argsort(coin_order, kind="stable")].reset_index(drop=True)
+
+    return df
+
+
+def run_analytics_query(query: str, connection: SQLiteConnection, params: Optional[Dict[str, str]] = None,
+                        backend: str = "sqlite", cache: Optional[QueryCache] = None,
+                        profiler: Optional[QueryProfiler] = None, duckdb_mode: Optional[str] = None) -> pd.DataFrame:
+    """
+    Executes an aggregation query on the chosen backend. With "sqlite" this is `run_query`. With
+    "duckdb" the query runs on the embedded DuckDB database over the same SQLite file, which is
+    much faster for full-table GROUP BY queries. Both backends accept the same SQL and parameters.
+    The DuckDB mode must be chosen explicitly, see `DuckDBConnection`.
+
+    Args:
+        query (str): The SQL query to execute.
+        connection (sqlalchemy.engine.Connection): The SQLite connection, or a `QuerySession`.
+        params (dict, optional): Parameters to bind to the SQL query.
+        backend (str, optional): "sqlite" or "duckdb". Defaults to "sqlite".
+        cache (QueryCache, optional): The result cache to use. Defaults to None.
+        profiler (QueryProfiler, optional): The profiler to record the query in. Defaults to None.
+        duckdb_mode (str, optional): "attach", "copy" or "auto". Required with the "duckdb" backend.
 
     Returns:
-        pd.DataFrame: A Pandas DataFrame containing the retrieved data.
-    """
-    df = pd.DataFrame()
-    for coin in coin_names:
-        # Create the params dictionary for the current coin
-        params = {"coin_name": coin, "start_date": start_date, "end_date": end_date}
-
-        # Query with date filtering
-        query = """
-        SELECT * FROM CoinsTable 
-        WHERE Name = :coin_name 
-        AND strftime('%Y-%m-%d', Date) BETWEEN :start_date AND :end_date
-        """
-        df_temp = run_query(query=query, connection=connection, params=params)
-
-        if df_temp.empty:
-            # If no data is found within the date range, fetch all data for that coin
-            query = "SELECT * FROM CoinsTable WHERE Name = :coin_name"
-            df_temp = run_query(query=query, connection=connection, params={"coin_name": coin})
-
-        # Concatenate the results
-        df = pd.concat([df, df_temp], ignore_index=True)
-
-    return df
\ No newline at end of file
+        pd.DataFrame: The result of the query as a DataFrame.
+    """
+    if backend not in ANALYTICS_BACKENDS:
+        raise DataBaseQueryException(f"Logic error: unknown backend `{backend}`, expected one of {ANALYTICS_BACKENDS}")
+    if backend == "duckdb" and duckdb_mode is None:
+        raise DataBaseQueryException("Logic error: the duckdb backend needs an explicit duckdb_mode")
+    if backend == "sqlite":
+        return run_query(query=query, connection=connection, params=params, cache=cache, profiler=profiler)
+
+    if profiler is not None:
+        # SQLite's query plan says nothing about how DuckDB ran the query, so none is captured
+        return profiler.profile(query=query, connection=None, params=params,
+                                run=lambda: run_analytics_query(query=query, connection=connection, params=params, backend=backend,
+                                                                                cache=cache, duckdb_mode=duckdb_mode))
+
+    if cache is not None:
+        key = cache.make_key(query=query, params=params)
+        version = cache.data_version()
+        df = cache.get(key)
+        if df is None:
+            df = run_analytics_query(query=query, connection=connection, params=params, backend=backend, duckdb_mode=duckdb_mode)
+            cache.put(key, df, version=version)
+        return df
+
+    return run_duckdb_query(query=query, connection=get_duckdb_connection(connection.database, mode=duckdb_mode), params=params)
+
+
+def build_coin_aggregates_query() -> str:
+    """
+    Builds the per-coin aggregation behind the proportion and summary reports.
+
+    Returns:
+        str: The SQL query.
+    """
+    return """
+    SELECT
+        Name,
+        COUNT(*) AS Records,
+        MIN(Date) AS StartDate,
+        MAX(Date) AS EndDate,
+        COUNT(Date) AS DateCount,
+        SUM(Volume) AS TotalVolume,
+        SUM(Marketcap) AS MarketcapSum,
+        COUNT(Marketcap) AS MarketcapCount
+    FROM CoinsTable
+    GROUP BY Name
+    ORDER BY Name
+    """
+
+
+def run_coin_aggregates(connection: SQLiteConnection, backend: str = "sqlite", cache: Optional[QueryCache] = None,
+                        profiler: Optional[QueryProfiler] = None, duckdb_mode: Optional[str] = None) -> pd.DataFrame:
+    """
+    Computes the per-coin aggregates of `aggregate_coin_chunks` inside the database, so only one
+    row per coin is transferred to pandas.
+
+    Args:
+        connection (sqlalchemy.engine.Connection): The SQLite connection, or a `QuerySession`.
+        backend (str, optional): "sqlite" or "duckdb". Defaults to "sqlite".
+        cache (QueryCache, optional): The result cache to use. Defaults to None.
+        profiler (QueryProfiler, optional): The profiler to record the query in. Defaults to None.
+        duckdb_mode (str, optional): "attach", "copy" or "auto". Required with the "duckdb" backend.
+
+    Returns:
+        pd.DataFrame: The aggregates indexed by coin name, in the layout of `aggregate_coin_chunks`.
+    """
+    df = run_analytics_query(query=build_coin_aggregates_query(), connection=connection, backend=backend,
+                             cache=cache, profiler=profiler, duckdb_mode=duckdb_mode)
+    df = df.set_index("Name")
+    for column in ["StartDate", "EndDate"]:
+        df[column] = pd.to_datetime(df[column], errors="coerce")
+    for column in ["Records", "DateCount", "MarketcapCount"]:
+        df[column] = df[column].astype("int64")
+    return df
@@ -10,6 +10,7 @@ from .utility import (calculate_sma,
                       calculate_atr,
                       calculate_lag_features)
 from sklearn.impute import SimpleImputer
+from src.cleaning.read import read_coins_dataset
 
 
 def add_date_features(df: pd.DataFrame) -> pd.DataFrame:
@@ -58,7 +59,7 @@ def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 if __name__ == "__main__":
-    df = pd.read_csv("./.data/coins.csv")
+    df = read_coins_dataset()
     df = preprocess_data(df=df)
     
 
@@ -1,5 +1,6 @@
 import pandas as pd
-from .utility import filter_by_coin
+from src.cleaning.read import read_coins_dataset
+from src.analytics.alignment import align_coins
 from statsmodels.tsa.arima.model import ARIMA
 
 def data_preprocessing(df: pd.DataFrame) -> pd.DataFrame:
@@ -43,12 +44,12 @@ def forecast_features_for_coin(coin_df: pd.DataFrame, coin_name: str, forecast_y
     return final_df
 
 def run_forecasts(df: pd.DataFrame) -> pd.DataFrame:
-    unique_coins = df["Name"].unique()
+    # Align every coin on the daily calendar once, instead of re-indexing each coin separately
+    panel = align_coins(df)
     all_forecasted_data = {}
 
-    for coin in unique_coins:
-        coin_df = filter_by_coin(coin_name=coin, df=df)
-        coin_df = data_preprocessing(coin_df)  # Ensure datetime conversion and sorting
+    for coin in panel.coins:
+        coin_df = panel.coin_frame(coin)  # Daily frequency over the coin's own date range
         coin_forecasts = forecast_features_for_coin(coin_df, coin, 2)
         all_forecasted_data[coin] = coin_forecasts
 
@@ -70,6 +71,6 @@ def run_forecasts(df: pd.DataFrame) -> pd.DataFrame:
     return final_df
 
 if __name__ == "__main__":
-    df = pd.read_csv("./.data/coins.csv")
+    df = read_coins_dataset()
     # df = data_preprocessing(df=df)
     run_forecasts(df=df)
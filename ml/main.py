@@ -4,6 +4,7 @@ from .utility import get_top_n_features
 from .model import RidgeRegressionModel, XGBoostModel, LoadRidgeRegressionModel
 from .forecasts import (data_preprocessing,
                          forecast_features_for_coin)
+from src.cleaning.read import read_coins_dataset
 from src.visualizations.plot_predictions import plot_base_outcome,plot_predicted_outcome,initialize_plot
 import pickle
 from typing import List
@@ -79,7 +80,7 @@ def load_regression_model(file_path: str, df: pd.DataFrame, coin_names: List[str
 
 
 if __name__ == "__main__":
-    df = pd.read_csv('./.data/coins.csv')
+    df = read_coins_dataset()
     new_df = preprocess_data(df=df)
     target = new_df["Close"]
     features = new_df.drop(columns=["Close", "Open"])
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+GAP_POLICIES = ("nan", "ffill", "interpolate")
+PANEL_COLUMNS = ["High", "Low", "Open", "Close", "Volume", "Marketcap"]
+
+
+class CoinPanel:
+    """
+    This class holds coins aligned on one daily calendar: for every column a (coin x date) NumPy
+    array, with the coins and dates as row and column labels. Cross-sectional work (correlation,
+    screening, forecasting) can run on the arrays directly, without aligning the data again.
+
+    Args:
+        coins (np.ndarray): The coin names, one per row, sorted.
+        dates (pd.DatetimeIndex): The calendar, one date per array column.
+        values (Dict[str, np.ndarray]): One (coin x date) array per column.
+        observed (np.ndarray): Which (coin, date) cells had a row before gaps were filled.
+    """
+
+    def __init__(self, coins: np.ndarray, dates: pd.DatetimeIndex, values: Dict[str, np.ndarray], observed: np.ndarray) -> None:
+        """
+        The constructor for the CoinPanel.
+        """
+        self.coins = coins
+        self.dates = dates
+        self.values = values
+        self.observed = observed
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.values[column]
+
+    @property
+    def shape(self):
+        """
+        The (coins, dates) shape of every array.
+        """
+        return self.observed.shape
+
+    def to_frame(self, column: str) -> pd.DataFrame:
+        """
+        Returns one column as a wide frame, dates as index and coins as columns.
+        """
+        return pd.DataFrame(self.values[column].T, index=self.dates, columns=pd.Index(self.coins, name="Name"))
+
+    def coin_frame(self, coin_name: str, trim: bool = True) -> pd.DataFrame:
+        """
+        Returns one coin's row of every column as a frame indexed by date with a daily frequency.
+        With `trim`, the calendar is cut to the coin's first and last observed date.
+        """
+        row = int(np.searchsorted(self.coins, coin_name))
+        if row == len(self.coins) or self.coins[row] != coin_name:
+            raise KeyError(f"Coin '{coin_name}' is not in the panel")
+        start, stop = 0, len(self.dates)
+        if trim and self.observed[row].any():
+            observed = np.flatnonzero(self.observed[row])
+            start, stop = observed[0], observed[-1] + 1
+        df = pd.DataFrame({column: values[row, start:stop] for column, values in self.values.items()},
+                          index=self.dates[start:stop])
+        df.index.name = "Date"
+        return df.asfreq("D")
+
+
+def fill_gaps(values: np.ndarray, gap_policy: str = "nan") -> np.ndarray:
+    """
+    Fills the NaN cells of a (coin x date) array along the date axis, for every coin at once.
+    "ffill" carries the last value forward, "interpolate" interpolates linearly between the values
+    around a gap. Cells before a coin's first value stay NaN, and with "interpolate" so do cells
+    after its last one, so nothing is extrapolated.
+    """
+    if gap_policy not in GAP_POLICIES:
+        raise ValueError(f"Unknown gap policy '{gap_policy}', expected one of {GAP_POLICIES}")
+    if gap_policy == "nan" or values.size == 0:
+        return values
+
+    known = ~np.isnan(values)
+    positions = np.arange(values.shape[1])
+    rows = np.arange(values.shape[0])[:, None]
+    # Position of the last known value at or before each cell, -1 if there is none yet
+    previous = np.maximum.accumulate(np.where(known, positions, -1), axis=1)
+    previous_values = np.where(previous >= 0, values[rows, np.maximum(previous, 0)], np.nan)
+    if gap_policy == "ffill":
+        return previous_values
+
+    # Position of the next known value at or after each cell, past the end if there is none
+    following = np.minimum.accumulate(np.where(known, positions, values.shape[1])[:, ::-1], axis=1)[:, ::-1]
+    inside = (previous >= 0) & (following < values.shape[1])
+    following_values = np.where(inside, values[rows, np.minimum(following, values.shape[1] - 1)], np.nan)
+    span = np.where(following > previous, following - previous, 1)
+    weight = (positions - previous) / span
+    filled = previous_values + (following_values - previous_values) * weight
+    return np.where(known, values, np.where(inside, filled, np.nan)).astype(values.dtype, copy=False)
+
+
+def align_coins(df: pd.DataFrame, columns: Optional[List[str]] = None, start: Optional[str] = None,
+                end: Optional[str] = None, gap_policy: str = "nan", dtype: np.dtype = np.float64) -> CoinPanel:
+    """
+    Builds a dense (coin x date) panel of the rows in one vectorised scatter: coins are factorised,
+    dates are floored to days and converted to calendar positions, and every column is written
+    into its preallocated array at (coin, position), with no per-coin reindexing. If a coin has
+    several rows on one day the last one is kept, and rows without a Name are dropped. Gaps are
+    then filled with `fill_gaps`.
+
+    Args:
+        df (pd.DataFrame): Rows with Name and Date columns.
+        columns (List[str], optional): Numeric columns to align. Defaults to the price, volume and
+            market cap columns present.
+        start (str, optional): First calendar date. Defaults to the earliest date.
+        end (str, optional): Last calendar date. Defaults to the latest date.
+        gap_policy (str, optional): "nan", "ffill" or "interpolate". Defaults to "nan".
+        dtype (np.dtype, optional): The array dtype, e.g. np.float32 for a smaller panel. Defaults to np.float64.
+
+    Returns:
+        CoinPanel: The aligned panel.
+    """
+    if gap_policy not in GAP_POLICIES:
+        raise ValueError(f"Unknown gap policy '{gap_policy}', expected one of {GAP_POLICIES}")
+    columns = columns or [column for column in PANEL_COLUMNS if column in df.columns]
+    days = pd.to_datetime(df["Date"], format="ISO8601", errors="coerce").dt.floor("D")
+    start = pd.Timestamp(start).floor("D") if start is not None else days.min()
+    end = pd.Timestamp(end).floor("D") if end is not None else days.max()
+    dates = pd.date_range(start, end, freq="D") if pd.notna(start) and pd.notna(end) else pd.DatetimeIndex([])
+
+    # Rows without a coin name cannot be placed in the panel, so they are dropped
+    codes, coins = pd.factorize(df["Name"], sort=True)
+    if (codes < 0).any():
+        print(f"Dropped {int((codes < 0).sum())} row(s) without a coin name")
+    positions = ((days - start) // pd.Timedelta(days=1)).to_numpy(dtype=np.float64, na_value=np.nan)
+    in_range = (codes >= 0) & ~np.isnan(positions) & (positions >= 0) & (positions < len(dates))
+    codes, positions = codes[in_range], positions[in_range].astype(np.int64)
+
+    observed = np.zeros((len(coins), len(dates)), dtype=bool)
+    observed[codes, positions] = True
+    values = {}
+    for column in columns:
+        panel = np.full((len(coins), len(dates)), np.nan, dtype=dtype)
+        panel[codes, positions] = df[column].to_numpy(dtype=dtype, na_value=np.nan)[in_range]
+        values[column] = fill_gaps(panel, gap_policy=gap_policy)
+    return CoinPanel(coins=np.asarray(coins, dtype=object), dates=dates, values=values, observed=observed)
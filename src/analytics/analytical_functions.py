@@ -1,43 +1,106 @@
 import pandas as pd
 import numpy as np
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import plotly.graph_objs as go
+from .alignment import align_coins
+
+DAILY_METRICS = {
+    "change": "DailyPriceChangeClosing",
+    "range": "DailyPriceRange",
+    "range_volatility": "DailyPriceRangeVolatility",
+    "volatility": "DailyPriceVolatility",
+}
+
+def _coin_codes(df: pd.DataFrame) -> np.ndarray:
+    # Integer coin keys in the order sort_values("Name") uses, missing names last
+    if isinstance(df["Name"].dtype, pd.CategoricalDtype):
+        codes = df["Name"].cat.codes.to_numpy(dtype=np.int64)
+    else:
+        codes, _ = pd.factorize(df["Name"], sort=True)
+    return np.where(codes < 0, np.iinfo(np.int64).max, codes)
+
+def _date_keys(df: pd.DataFrame) -> np.ndarray:
+    # Integer date keys, missing dates last
+    dates = pd.to_datetime(df["Date"], format="ISO8601", errors="coerce").to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return np.where(dates == np.iinfo(np.int64).min, np.iinfo(np.int64).max, dates)
+
+def _sort_by_coin_and_date(df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    # Data already in order, e.g. read back from the database or the coin files, is detected with
+    # one linear pass and not sorted again. The coin keys are returned in the row order.
+    coins, dates = _coin_codes(df), _date_keys(df)
+    coin_steps, date_steps = np.diff(coins), np.diff(dates)
+    if ((coin_steps > 0) | ((coin_steps == 0) & (date_steps >= 0))).all():
+        return df, coins
+    df = df.sort_values(["Name", "Date"])
+    return df, _coin_codes(df)
+
+def daily_metrics(df: pd.DataFrame, metrics: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Computes the daily metrics in one pass over the rows ordered by coin and date, sorting at most
+    once, and returns them on a new frame; the input is left unchanged. Rows are kept with their
+    original index, like sort_values. The closing price change
+    is a difference over the whole column with the first row of every coin's block masked out, so
+    no per-coin groupby is needed.
+
+    Args:
+        df (pd.DataFrame): Rows with Name, Date, High, Low, Open and Close columns.
+        metrics (List[str], optional): Keys of DAILY_METRICS to compute. Defaults to all of them.
+
+    Returns:
+        pd.DataFrame: The rows ordered by coin and date, with one column per metric.
+    """
+    metrics = list(DAILY_METRICS) if metrics is None else metrics
+    unknown = [metric for metric in metrics if metric not in DAILY_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown daily metrics {unknown}, expected some of {list(DAILY_METRICS)}")
+
+    df, coins = _sort_by_coin_and_date(df)
+    columns = {}
+    if "change" in metrics:
+        close = df["Close"].to_numpy(dtype=None if df["Close"].dtype.kind == "f" else np.float64, na_value=np.nan)
+        change = np.empty_like(close)
+        change[1:] = close[1:] - close[:-1]
+        # The first row of every coin's block has no previous close, nor do rows without a coin
+        change[np.r_[True, coins[1:] != coins[:-1]] | (coins == np.iinfo(np.int64).max)] = np.nan
+        columns[DAILY_METRICS["change"]] = change
+    if "range" in metrics or "range_volatility" in metrics:
+        price_range = df["High"] - df["Low"]
+        if "range" in metrics:
+            columns[DAILY_METRICS["range"]] = price_range
+        if "range_volatility" in metrics:
+            columns[DAILY_METRICS["range_volatility"]] = price_range / df["Open"]
+    if "volatility" in metrics:
+        columns[DAILY_METRICS["volatility"]] = df["Close"] - df["Open"]
+    return df.assign(**columns)
 
 def daily_price_change(df: pd.DataFrame) -> pd.DataFrame:
-    df.sort_values(["Name", "Date"], inplace=True)
-    df['DailyPriceChangeClosing'] = df.groupby("Name")['Close'].diff() 
-    return df
+    return daily_metrics(df, metrics=["change"])
 
 def daily_price_range(df: pd.DataFrame) -> pd.DataFrame:
-    df.sort_values(["Name", "Date"], inplace=True)
-    df['DailyPriceRange'] = df['High'] - df['Low']
-    return df
+    return daily_metrics(df, metrics=["range"])
 
 def daily_price_range_volatility(df: pd.DataFrame) -> pd.DataFrame:
-    df.sort_values(["Name", "Date"], inplace=True)
-    df['DailyPriceRangeVolatility'] = (df['High'] - df['Low']) / df['Open']
-    return df
+    return daily_metrics(df, metrics=["range_volatility"])
 
 def daily_price_volatility(df: pd.DataFrame) -> pd.DataFrame:
-    df.sort_values(["Name", "Date"], inplace=True)
-    df['DailyPriceVolatility'] = df['Close'] - df['Open']
-    return df
+    return daily_metrics(df, metrics=["volatility"])
 
 def moving_average(df: pd.DataFrame, window: int = 5) -> pd.DataFrame:
-    df[f'MovingAverage_{window}'] = df.groupby("Name")['Close'].transform(lambda x: x.rolling(window, min_periods=1).mean())
+    df[f'MovingAverage_{window}'] = df.groupby("Name", observed=True)['Close'].transform(lambda x: x.rolling(window, min_periods=1).mean())
     return df
 
 def find_peaks_and_valleys(df: pd.DataFrame, window: int = 3) -> pd.DataFrame:
-    df['Peak'] = df.groupby("Name")['Close'].transform(lambda x: x[(x.shift(1) < x) & (x.shift(-1) < x)])
-    df['Valley'] = df.groupby("Name")['Close'].transform(lambda x: x[(x.shift(1) > x) & (x.shift(-1) > x)])
+    df['Peak'] = df.groupby("Name", observed=True)['Close'].transform(lambda x: x[(x.shift(1) < x) & (x.shift(-1) < x)])
+    df['Valley'] = df.groupby("Name", observed=True)['Close'].transform(lambda x: x[(x.shift(1) > x) & (x.shift(-1) > x)])
     return df
 
 def correlation_analysis(df: pd.DataFrame) -> pd.DataFrame:
     #TODO Fix the correlation function
     # This function does a correlation analysis between all the columns in the data and not within any specific coin
     # The correlation analysis should be between a selected coin and other coins
-    df_pivot = df.pivot(index='Date', columns='Name', values='Close')
-    correlation_matrix = df_pivot.corr()
+    # Coins aligned on one daily calendar; days a coin has no close are left out pairwise
+    df_aligned = align_coins(df, columns=['Close']).to_frame('Close')
+    correlation_matrix = df_aligned.corr()
     # numeric_cols = df.select_dtypes(include=[np.number]).columns
     # correlation_matrix = df[numeric_cols].corr()
     return correlation_matrix
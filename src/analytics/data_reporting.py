@@ -1,21 +1,23 @@
 import pandas as pd
+from typing import Iterable
 
 
 def coin_proportion(df: pd.DataFrame) -> pd.DataFrame:
     coin_proportion = df['Name'].value_counts(normalize=True) * 100
-    return coin_proportion
+    # Categorical names also list categories without rows
+    return coin_proportion[coin_proportion > 0]
 
 def date_range_coins(df: pd.DataFrame) -> pd.DataFrame:
-    date_ranges = df.groupby('Name')['Date'].agg(['min', 'max'])
+    date_ranges = df.groupby('Name', observed=True)['Date'].agg(['min', 'max'])
     return date_ranges
 
 def records_per_coin(df: pd.DataFrame):
     coin_counts = df['Name'].value_counts()
-    return coin_counts
+    return coin_counts[coin_counts > 0]
 
 def coin_summary_info(df: pd.DataFrame):
     df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    summary_info = df.groupby('Name').agg({
+    summary_info = df.groupby('Name', observed=True).agg({
         'Date': ['min', 'max', 'count'],
         'Volume': 'sum',
         'Marketcap': 'mean'
@@ -25,6 +27,9 @@ def coin_summary_info(df: pd.DataFrame):
     summary_info.columns = ['Start Date', 'End Date', 'Number of Records', 'Total Volume', 'Average Market Cap']
     summary_info = summary_info.reset_index()
 
+    return format_summary_info(summary_info=summary_info)
+
+def format_summary_info(summary_info: pd.DataFrame) -> pd.DataFrame:
     # Format dates to 'YYYY-MM-DD'
     summary_info['Start Date'] = summary_info['Start Date'].dt.strftime('%Y-%m-%d')
     summary_info['End Date'] = summary_info['End Date'].dt.strftime('%Y-%m-%d')
@@ -35,6 +40,58 @@ def coin_summary_info(df: pd.DataFrame):
 
     return summary_info
 
+def aggregate_coin_chunks(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Builds per-coin partial aggregates from DataFrame chunks (e.g. `run_query(..., chunksize=...)`),
+    so the proportion and summary reports never need the full table in memory.
+
+    Each chunk needs the Name, Date, Volume and Marketcap columns.
+    """
+    partials = []
+    for chunk in chunks:
+        chunk = chunk.assign(Date=pd.to_datetime(chunk['Date'], errors='coerce'))
+        partials.append(chunk.groupby('Name', observed=True).agg(
+            Records=('Name', 'size'),
+            StartDate=('Date', 'min'),
+            EndDate=('Date', 'max'),
+            DateCount=('Date', 'count'),
+            TotalVolume=('Volume', 'sum'),
+            MarketcapSum=('Marketcap', 'sum'),
+            MarketcapCount=('Marketcap', 'count'),
+        ))
+
+    if not partials:
+        return pd.DataFrame(columns=['Records', 'StartDate', 'EndDate', 'DateCount', 'TotalVolume', 'MarketcapSum', 'MarketcapCount'])
+
+    return pd.concat(partials).groupby(level=0, observed=True).agg({
+        'Records': 'sum',
+        'StartDate': 'min',
+        'EndDate': 'max',
+        'DateCount': 'sum',
+        'TotalVolume': 'sum',
+        'MarketcapSum': 'sum',
+        'MarketcapCount': 'sum',
+    })
+
+def coin_proportion_from_aggregates(aggregates: pd.DataFrame) -> pd.Series:
+    """Same output as `coin_proportion`, computed from `aggregate_coin_chunks` results."""
+    coin_proportion = aggregates['Records'] / aggregates['Records'].sum() * 100
+    return coin_proportion.sort_values(ascending=False).rename('proportion')
+
+def coin_summary_from_aggregates(aggregates: pd.DataFrame) -> pd.DataFrame:
+    """Same output as `coin_summary_info`, computed from `aggregate_coin_chunks` results."""
+    summary_info = pd.DataFrame({
+        'Start Date': aggregates['StartDate'],
+        'End Date': aggregates['EndDate'],
+        'Number of Records': aggregates['DateCount'],
+        'Total Volume': aggregates['TotalVolume'],
+        'Average Market Cap': aggregates['MarketcapSum'] / aggregates['MarketcapCount'],
+    })
+    summary_info.index.name = 'Name'
+    summary_info = summary_info.reset_index()
+
+    return format_summary_info(summary_info=summary_info)
+
 def human_readable_format(num):
     """Convert a large number to a human-readable format (e.g., 1.3B, 2.4M)."""
     if abs(num) >= 1_000_000_000:
@@ -1,5 +1,6 @@
 import pandas as pd
-from .utility import count_outliers
+from typing import Optional
+from .utility import count_outliers, detect_outliers
 
 
 def fill_na_with_median_and_mode(df: pd.DataFrame) -> pd.DataFrame:
@@ -17,35 +18,30 @@ def fill_na_with_median_and_mode(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def convert_datetime_column(df: pd.DataFrame) -> pd.DataFrame:
-    df = pd.to_datetime(df["Date"])
+    df["Date"] = pd.to_datetime(df["Date"])
     return df
 
 
-def drop_duplicates(df: pd.DataFrame) -> pd.DataFrame:
-    df.drop_duplicates(inplace=True)
+def drop_duplicates(df: pd.DataFrame, key_columns: list = ["Name", "Date"]) -> pd.DataFrame:
+    # One row per key, the first wins. `dedup.deduplicate` also checks keys against earlier loads
+    # and reports conflicting values instead of dropping them.
+    df.drop_duplicates(subset=key_columns, keep="first", inplace=True)
     return df
 
 
 def remove_outliers(
     df: pd.DataFrame,
     columns: list = ["High", "Low", "Open", "Close", "Volume", "Marketcap"],
+    mask: Optional[pd.Series] = None,
+    keep_index: bool = False,
 ) -> pd.DataFrame:
-    cleaned_dfs = []
-
-    for coin_name, temp_df in df.groupby("Name"):
-        for col in columns:
-            Q1 = temp_df[col].quantile(0.25)
-            Q3 = temp_df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            temp_df = temp_df[
-                (temp_df[col] >= lower_bound) & (temp_df[col] <= upper_bound)
-            ]
-
-        cleaned_dfs.append(temp_df)
-
-    return pd.concat(cleaned_dfs, ignore_index=True)
+    # Keeps the rows whose values are inside their coin's fences in every column, grouped by coin.
+    # A mask already returned by `detect_outliers` can be passed to skip recomputing it.
+    # With `keep_index` the rows keep their original labels, so they can be matched to the input.
+    if mask is None:
+        _, mask = detect_outliers(df=df, columns=columns)
+    cleaned_df = df[mask.to_numpy()].sort_values("Name", kind="stable")
+    return cleaned_df if keep_index else cleaned_df.reset_index(drop=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from .reporting import define_report_structure
+from .utility import OUTLIER_COLUMNS
+
+# Same representation as `database.result_builder.COINS_TABLE_SCHEMA` gives query results
+CATEGORY_COLUMNS = ["Name", "Symbol"]
+# Prices, volumes and market caps
+FLOAT32_COLUMNS = OUTLIER_COLUMNS
+# float32 keeps about 7 significant digits, i.e. a relative rounding error below 6e-8
+FLOAT32_RTOL = 1e-6
+
+
+def memory_per_column(df: pd.DataFrame) -> pd.Series:
+    """Returns the bytes held by each column, including the strings behind object columns."""
+    return df.memory_usage(deep=True, index=False)
+
+
+def fits_float32(values: pd.Series, rtol: float = FLOAT32_RTOL) -> bool:
+    """Whether every value survives a float32 round trip within `rtol` relative error."""
+    values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(over="ignore"):
+        rounded = values.astype(np.float32).astype(np.float64)
+    # Overflow to inf and underflow to 0 both fail the relative check
+    close = np.abs(rounded - values) <= rtol * np.abs(values)
+    return bool(np.all(close | (rounded == values) | (np.isnan(values) & np.isnan(rounded))))
+
+
+def compact_frame(df: pd.DataFrame, downcast_floats: bool = False, rtol: float = FLOAT32_RTOL,
+                  float_columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Returns the coins frame in its compact form: Name and Symbol as categoricals and Date as
+    datetime64. With `downcast_floats`, price and volume columns become float32 when every value
+    round-trips within `rtol` relative error; columns that do not fit stay float64. Columns already
+    in compact form are left as they are, so compacting twice is a no-op.
+    """
+    df = df.copy(deep=False)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+
+    if "Date" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+        df["Date"] = pd.to_datetime(df["Date"], format="ISO8601", errors="coerce")
+
+    if downcast_floats:
+        for col in float_columns or FLOAT32_COLUMNS:
+            if col not in df.columns or df[col].dtype != np.float64:
+                continue
+            if fits_float32(df[col], rtol=rtol):
+                df[col] = df[col].astype(np.float32)
+            else:
+                print(f"Column '{col}' does not fit float32 within a relative error of {rtol}, keeping float64.")
+    return df
+
+
+def memory_report(before: pd.Series, after: pd.Series) -> Dict:
+    """Returns the per-column memory of `memory_per_column` before and after compaction as a data report."""
+    report = define_report_structure()
+    for category, memory in [("Memory before compaction (bytes)", before), ("Memory after compaction (bytes)", after)]:
+        for column, size in memory.items():
+            report["Category"].append(category)
+            report["Field Description"].append(column)
+            report["Count"].append(int(size))
+        report["Category"].append(category)
+        report["Field Description"].append("Total")
+        report["Count"].append(int(memory.sum()))
+    return report
@@ -0,0 +1,185 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from .reporting import define_report_structure
+
+KEY_COLUMNS = ["Name", "Date"]
+# SNo only numbers the rows of one file, so it is not part of a row's values
+IGNORED_COLUMNS = ["SNo"]
+DEDUP_INDEX_FILE = ".data/.dedup_index.npz"
+
+
+def key_hashes(df: pd.DataFrame, key_columns: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Returns a 64-bit hash of every row's key. Names are hashed as text and dates as whole seconds,
+    so a key hashes the same whether it was read as a string, a datetime64 or a categorical.
+    """
+    keys = {}
+    for column in key_columns or KEY_COLUMNS:
+        values = df[column]
+        if column == "Date":
+            dates = pd.to_datetime(values, format="ISO8601", errors="coerce").to_numpy(dtype="datetime64[s]")
+            keys[column] = dates.view(np.int64)
+        else:
+            keys[column] = values.astype(str).to_numpy(dtype=object)
+    return pd.util.hash_pandas_object(pd.DataFrame(keys), index=False).to_numpy()
+
+
+def value_hashes(df: pd.DataFrame, value_columns: List[str]) -> np.ndarray:
+    """
+    Returns a 64-bit hash of every row's values. Numbers are compared as float64, so a float32 copy
+    of the same row only conflicts if it was rounded.
+    """
+    values = {}
+    for column in value_columns:
+        if pd.api.types.is_numeric_dtype(df[column]):
+            values[column] = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            values[column] = df[column].astype(str).to_numpy(dtype=object)
+    return pd.util.hash_pandas_object(pd.DataFrame(values), index=False).to_numpy()
+
+
+class KeyIndex:
+    """
+    This class is a persistent index of the keys already loaded, kept as a sorted array of 64-bit key
+    hashes with the hash of each key's values alongside: 16 bytes per key, whatever the row width. A
+    batch is checked against it with one vectorised binary search, so the loaded history never has
+    to be read back. Hash collisions are possible in principle but negligible at 64 bits.
+
+    Args:
+        path (str, optional): The .npz file the index is stored in. Without a path the index lives
+            in memory only, e.g. to deduplicate across the chunks of one run.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """
+        The constructor for the KeyIndex. It loads the stored index, if any.
+        """
+        self.path = path
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.values = np.empty(0, dtype=np.uint64)
+        if path is not None and os.path.exists(path):
+            with np.load(path) as stored:
+                self.keys, self.values = stored["keys"], stored["values"]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns which keys are already indexed and, for those, the hash of their stored values.
+        """
+        if len(self.keys) == 0:
+            return np.zeros(len(keys), dtype=bool), np.zeros(len(keys), dtype=np.uint64)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[positions] == keys
+        return found, self.values[positions]
+
+    def add(self, keys: np.ndarray, values: np.ndarray) -> None:
+        """
+        Adds keys that are not indexed yet, keeping the arrays sorted.
+        """
+        order = np.argsort(keys, kind="stable")
+        keys, values = keys[order], values[order]
+        positions = np.searchsorted(self.keys, keys)
+        self.keys = np.insert(self.keys, positions, keys)
+        self.values = np.insert(self.values, positions, values)
+
+    def save(self) -> None:
+        """
+        Writes the index to its path, replacing the previous one atomically.
+        """
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.tmp", "wb") as f:
+            np.savez(f, keys=self.keys, values=self.values)
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+def _value_columns(df: pd.DataFrame, key_columns: List[str], value_columns: Optional[List[str]]) -> List[str]:
+    return value_columns or [col for col in df.columns if col not in key_columns and col not in IGNORED_COLUMNS]
+
+
+def index_rows(df: pd.DataFrame, index: KeyIndex, key_columns: Optional[List[str]] = None,
+               value_columns: Optional[List[str]] = None) -> None:
+    """
+    Adds the keys of rows returned by `deduplicate(..., update_index=False)` to the index, once
+    they are stored. Keys already indexed are skipped.
+    """
+    key_columns = key_columns or KEY_COLUMNS
+    keys = key_hashes(df, key_columns=key_columns)
+    values = value_hashes(df, value_columns=_value_columns(df, key_columns, value_columns))
+    indexed, _ = index.lookup(keys)
+    index.add(keys[~indexed], values[~indexed])
+
+
+def deduplicate(df: pd.DataFrame, index: KeyIndex, key_columns: Optional[List[str]] = None,
+                value_columns: Optional[List[str]] = None,
+                update_index: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, int]]:
+    """
+    Splits a batch into rows with keys not loaded before and duplicates, and adds the new keys to the
+    index. A duplicate with the same values as the row already loaded (or as an earlier row of the
+    batch) is dropped; one with different values is a conflict and is returned separately, so it is
+    never silently dropped or overwritten.
+
+    Args:
+        df (pd.DataFrame): The batch.
+        index (KeyIndex): The keys loaded so far. Call `index.save()` once the rows are stored.
+        key_columns (List[str], optional): The key. Defaults to ["Name", "Date"].
+        value_columns (List[str], optional): The columns compared for conflicts. Defaults to every
+            column except the key and SNo.
+        update_index (bool, optional): Add the new keys to the index now. When the rows may still
+            fail to be stored, pass False and call `index_rows` on the new rows once they are, so a
+            failed write never marks its keys as loaded. Defaults to True.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame, Dict[str, int]]: The rows with new keys, the conflicting
+            rows with a "Conflict" column ("already loaded" or "within batch"), and the counts of
+            new, exact duplicate and conflicting rows.
+    """
+    key_columns = key_columns or KEY_COLUMNS
+    value_columns = _value_columns(df, key_columns, value_columns)
+    keys = key_hashes(df, key_columns=key_columns)
+    values = value_hashes(df, value_columns=value_columns)
+
+    # Against the index
+    loaded, loaded_values = index.lookup(keys)
+    loaded_conflict = loaded & (loaded_values != values)
+
+    # Within the batch, every copy after the first of a key is a duplicate of that first row
+    repeated = pd.Series(keys).duplicated(keep="first").to_numpy() & ~loaded
+    first_values = pd.Series(values).groupby(keys, sort=False).transform("first").to_numpy()
+    batch_conflict = repeated & (first_values != values)
+
+    new = ~loaded & ~repeated
+    if update_index:
+        index.add(keys[new], values[new])
+
+    conflicting = loaded_conflict | batch_conflict
+    conflicts = df[conflicting].assign(Conflict=np.where(loaded_conflict, "already loaded", "within batch")[conflicting])
+    counts = {
+        "New keys": int(new.sum()),
+        "Exact duplicates": int((loaded | repeated).sum() - conflicting.sum()),
+        "Conflicting duplicates": int(conflicting.sum()),
+    }
+    return df[new], conflicts, counts
+
+
+def dedup_report(counts: Dict[str, int]) -> Dict:
+    """Returns the counts of `deduplicate` as a data report."""
+    report = define_report_structure()
+    for field, count in counts.items():
+        report["Category"].append("Deduplication")
+        report["Field Description"].append(field)
+        report["Count"].append(count)
+    return report
+
+
+def export_conflicts(conflicts: pd.DataFrame, file_name: str = "./.data/Conflicting Duplicates.csv") -> None:
+    """Appends conflicting duplicates to their own report, next to the data report."""
+    if conflicts.empty:
+        return
+    os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+    conflicts.to_csv(file_name, mode="a", index=False, header=not os.path.exists(file_name))
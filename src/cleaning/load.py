@@ -1,18 +1,391 @@
+import importlib.util
+import os
+import shutil
 import pandas as pd
 import sqlite3
+from typing import Dict, List, Optional
+from database.schema import (migrate_coins_table, migrate_to_clustered, table_layout, clustered_table_name,
+                             DATE_FORMAT, LAYOUTS, CLUSTERED_LAYOUT)
+from database.bulk_loader import BulkLoader
+from database.sharding import ShardedSQLiteConnection
 
-def push_to_sqlite(df: pd.DataFrame, table_name: str, db_name: str = "./test_db.db") -> None:
+# Columnar copy of the cleaned data, one hive-style partition per coin (Name=<coin>/part-0.parquet)
+COINS_DATASET_DIR = ".data/coins"
+DATASET_FORMATS = ("parquet", "feather")
+
+def push_to_sqlite(df: pd.DataFrame, table_name: str, db_name: str = "./test_db.db", mode: str = "replace",
+                   key_columns: Optional[List[str]] = None, batch_size: int = 50_000,
+                   layout: Optional[str] = None) -> Optional[Dict[str, int]]:
+    """
+    Writes the DataFrame to a SQLite table.
+
+    Args:
+        df (pd.DataFrame): The rows to write.
+        table_name (str): The target table.
+        db_name (str, optional): Path of the SQLite database file. Defaults to "./test_db.db".
+        mode (str, optional): "replace" rewrites the whole table. "upsert" inserts new keys, updates
+            changed rows and leaves everything else (including indexes) untouched. Defaults to "replace".
+        key_columns (List[str], optional): The upsert key. Defaults to ["Name", "Date"].
+        batch_size (int, optional): Rows per upsert transaction. Defaults to 50000.
+        layout (str, optional): "heap" or "clustered" (see `database.schema.migrate_to_clustered`).
+            Defaults to the layout of the existing table, or "heap" for a new one.
+
+    Returns:
+        Optional[Dict[str, int]]: For upserts, the inserted, updated and unchanged row counts.
+    """
+    if mode not in ("replace", "upsert"):
+        raise ValueError(f"Invalid mode `{mode}`, expected 'replace' or 'upsert'")
+    if layout is not None and layout not in LAYOUTS:
+        raise ValueError(f"Invalid layout `{layout}`, expected one of {LAYOUTS}")
+    key_columns = key_columns or ["Name", "Date"]
+    missing = [key for key in key_columns if key not in df.columns]
+    if mode == "upsert" and missing:
+        raise ValueError(f"Missing key columns in DataFrame: `{missing}`")
+
+    conn = None
     try:
         conn = sqlite3.connect(db_name)
-        df.to_sql(table_name, conn, if_exists='replace', index=False)
+        current_layout = table_layout(conn=conn, table_name=table_name)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        if conn is not None:
+            conn.close()
+        return None
+    layout = layout or current_layout
+    if mode == "upsert" and layout != current_layout:
+        conn.close()
+        raise ValueError(f"Table '{table_name}' uses the {current_layout} layout, migrate it with `python -m database.schema` first")
+
+    try:
+        if mode == "upsert":
+            counts = upsert_to_sqlite(conn=conn, df=df, table_name=table_name, key_columns=key_columns,
+                                      batch_size=batch_size, layout=layout)
+            print(f"DataFrame successfully upserted to table '{table_name}' in database '{db_name}': "
+                  f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged.")
+            return counts
+
+        replace_table(conn=conn, df=df, table_name=table_name, layout=current_layout)
+        if layout == CLUSTERED_LAYOUT:
+            migrate_to_clustered(conn=conn, table_name=table_name)
+        elif {"Name", "Date"}.issubset(df.columns):
+            # Replacing the table drops its indexes, so the schema is re-applied after every load
+            migrate_coins_table(conn=conn, table_name=table_name)
         print(f"DataFrame successfully pushed to table '{table_name}' in database '{db_name}'.")
     except Exception as e:
         print(f"An error occurred: {e}")
     finally:
         conn.close()
+    return None
+
+def replace_table(conn: sqlite3.Connection, df: pd.DataFrame, table_name: str, layout: str = "heap") -> None:
+    """
+    Replaces a SQLite table with the DataFrame. The rows are written to a staging table first, and
+    the old table (or the clustered view and table) is dropped and the staging table renamed in one
+    transaction, so a failed write leaves the old table in place.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the SQLite database.
+        df (pd.DataFrame): The rows to write.
+        table_name (str): The table to replace. It is created if missing.
+        layout (str, optional): The current layout of the table, "heap" or "clustered". Defaults to "heap".
+    """
+    staging = f"{table_name}_replace_staging"
+    try:
+        df.to_sql(staging, conn, if_exists="replace", index=False)
+        conn.execute("BEGIN")
+        if layout == CLUSTERED_LAYOUT:
+            conn.execute(f'DROP VIEW "{table_name}"')
+            conn.execute(f'DROP TABLE "{clustered_table_name(table_name)}"')
+        else:
+            conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        conn.execute(f'ALTER TABLE "{staging}" RENAME TO "{table_name}"')
+        conn.commit()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+        raise
 
-def push_to_azure(df: pd.DataFrame) -> None:
-    pass
+def _sqlite_values(df: pd.DataFrame) -> pd.DataFrame:
+    # sqlite3 cannot bind Timestamps or categoricals, and dates must match the ISO text in the table
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime(DATE_FORMAT)
+        elif isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+        if column == "Date" and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            # Like `database.schema.normalise_dates`, text dates are rewritten and unparseable ones kept
+            dates = pd.to_datetime(df[column], format="ISO8601", errors="coerce")
+            df[column] = dates.dt.strftime(DATE_FORMAT).astype(object).where(dates.notna(), df[column])
+    return df.astype(object).where(df.notna(), None)
+
+def _clustered_values(df: pd.DataFrame) -> pd.DataFrame:
+    # The clustered layout stores dates as seconds since the Unix epoch
+    dates = pd.to_datetime(df['Date'], format="mixed", errors="coerce")
+    seconds = (dates - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+    return df.assign(Date=seconds.astype(object).where(dates.notna(), None))
+
+def upsert_to_sqlite(conn: sqlite3.Connection, df: pd.DataFrame, table_name: str, key_columns: List[str],
+                     batch_size: int = 50_000, layout: str = "heap") -> Dict[str, int]:
+    """
+    Upserts the DataFrame into a SQLite table on `key_columns`, one transaction per batch.
+    Only new or changed rows are written, so the cost follows the size of the delta. Text dates
+    are normalised to `DATE_FORMAT` first, and a key repeated in the DataFrame is written once,
+    with its last row.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the SQLite database.
+        df (pd.DataFrame): The rows to upsert.
+        table_name (str): The target table. It is created (with its indexes) if missing.
+        key_columns (List[str]): The columns that identify a row.
+        batch_size (int, optional): Rows per transaction. Defaults to 50000.
+        layout (str, optional): The layout of the table, "heap" or "clustered". Defaults to "heap".
+
+    Returns:
+        Dict[str, int]: The inserted, updated and unchanged row counts.
+    """
+    missing = [key for key in key_columns if key not in df.columns]
+    if missing:
+        raise ValueError(f"Missing key columns in DataFrame: `{missing}`")
+
+    # Tables are created from the original dtypes so the columns keep their declared types
+    empty = df.head(0)
+    # Keys are compared once dates are normalised; the last row of a repeated key wins
+    df = _sqlite_values(df).drop_duplicates(subset=key_columns, keep="last")
+    columns = list(df.columns)
+
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?", (table_name,)).fetchone():
+        empty.to_sql(table_name, conn, index=False)
+    staging_name = f"{table_name}_upsert_staging"
+    if layout == CLUSTERED_LAYOUT:
+        # Rows go straight into the WITHOUT ROWID table, the view only converts dates for readers
+        migrate_to_clustered(conn=conn, table_name=table_name)
+        df = _clustered_values(df)
+        table_name = clustered_table_name(table_name)
+    elif {"Name", "Date"}.issubset(columns):
+        migrate_coins_table(conn=conn, table_name=table_name)
+
+    target = f'"{table_name}"'
+    staging = f'"{staging_name}"'
+    quoted = [f'"{column}"' for column in columns]
+    values = [f'"{column}"' for column in columns if column not in key_columns]
+    on = " AND ".join(f't."{key}" = s."{key}"' for key in key_columns)
+    same = " AND ".join(f't.{column} IS s.{column}' for column in values) or "1"
+
+    # Staging copies the target's declared column types, so values compare the same way on both sides
+    conn.execute(f"DROP TABLE IF EXISTS {staging}")
+    conn.execute(f"CREATE TABLE {staging} AS SELECT {', '.join(quoted)} FROM {target} WHERE 0")
+    conn.execute(f"CREATE INDEX \"idx_{staging_name}_keys\" ON {staging} ({', '.join(quoted[columns.index(key)] for key in key_columns)})")
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    insert_staging = f"INSERT INTO {staging} ({', '.join(quoted)}) VALUES ({', '.join('?' for _ in columns)})"
+    try:
+        for start in range(0, len(df), batch_size):
+            batch = df.iloc[start:start + batch_size]
+            with conn:
+                conn.execute(f"DELETE FROM {staging}")
+                conn.executemany(insert_staging, batch.itertuples(index=False, name=None))
+
+                inserted, updated = conn.execute(f"""
+                    SELECT
+                        SUM(NOT EXISTS (SELECT 1 FROM {target} AS t WHERE {on})),
+                        SUM(EXISTS (SELECT 1 FROM {target} AS t WHERE {on} AND NOT ({same})))
+                    FROM {staging} AS s
+                """).fetchone()
+                counts["inserted"] += inserted or 0
+                counts["updated"] += updated or 0
+                counts["unchanged"] += len(batch) - (inserted or 0) - (updated or 0)
+
+                if values and updated:
+                    conn.execute(f"""
+                        UPDATE {target} AS t SET ({', '.join(values)}) = ({', '.join(f's.{column}' for column in values)})
+                        FROM {staging} AS s WHERE {on} AND NOT ({same})
+                    """)
+                if inserted:
+                    conn.execute(f"""
+                        INSERT INTO {target} ({', '.join(quoted)})
+                        SELECT {', '.join(f's.{column}' for column in quoted)} FROM {staging} AS s
+                        WHERE NOT EXISTS (SELECT 1 FROM {target} AS t WHERE {on})
+                    """)
+    finally:
+        conn.execute(f"DROP TABLE IF EXISTS {staging}")
+        conn.commit()
+
+    return counts
+
+class SQLiteChunkWriter:
+    """
+    This class writes a stream of DataFrame chunks to one SQLite table, so a cleaned dataset never
+    has to be held in memory at once. In replace mode the first chunk replaces the table and later
+    chunks are appended; in upsert mode every chunk is upserted on (Name, Date), so rows loaded
+    before are kept. `close()` applies the coins table schema (see `database.schema`), keeping an
+    existing clustered layout.
+
+    Args:
+        table_name (str): The target table.
+        db_name (str, optional): Path of the SQLite database file. Defaults to "./test_db.db".
+        mode (str, optional): "replace" or "upsert". Defaults to "replace".
+    """
+
+    def __init__(self, table_name: str, db_name: str = "./test_db.db", mode: str = "replace") -> None:
+        """
+        The constructor for the SQLiteChunkWriter. It opens the connection.
+        """
+        if mode not in ("replace", "upsert"):
+            raise ValueError(f"Invalid mode `{mode}`, expected 'replace' or 'upsert'")
+        self.table_name = table_name
+        self.db_name = db_name
+        self.mode = mode
+        self.rows = 0
+        self._conn = sqlite3.connect(db_name)
+        self._started = False
+        self._layout = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        Writes one chunk in its own transaction.
+
+        Args:
+            df (pd.DataFrame): The rows to write.
+        """
+        if not self._started:
+            self._layout = table_layout(conn=self._conn, table_name=self.table_name)
+        if self.mode == "upsert":
+            upsert_to_sqlite(conn=self._conn, df=df, table_name=self.table_name, key_columns=["Name", "Date"],
+                             layout=self._layout)
+        elif self._started:
+            df.to_sql(self.table_name, self._conn, if_exists="append", index=False)
+        else:
+            replace_table(conn=self._conn, df=df, table_name=self.table_name, layout=self._layout)
+        self._started = True
+        self.rows += len(df)
+
+    def close(self) -> None:
+        """
+        Applies the schema migration, keeping the layout the table had, and closes the connection.
+        """
+        try:
+            if self._started and self._layout == CLUSTERED_LAYOUT:
+                migrate_to_clustered(conn=self._conn, table_name=self.table_name)
+            elif self._started:
+                migrate_coins_table(conn=self._conn, table_name=self.table_name)
+            print(f"{self.rows} rows successfully written to table '{self.table_name}' in database '{self.db_name}'.")
+        finally:
+            self._conn.close()
+
+def push_to_sharded_sqlite(df: pd.DataFrame, table_name: str = "CoinsTable", shard_dir: str = "./shards",
+                           n_shards: Optional[int] = None, mode: str = "replace", max_workers: Optional[int] = None,
+                           **kwargs) -> Optional[Dict[str, int]]:
+    """
+    Writes the DataFrame to a sharded SQLite database (see `database.sharding`). Rows are routed to
+    the shard of their coin and all shards are written concurrently, each through `push_to_sqlite`.
+    In replace mode every shard is rewritten, so coins missing from `df` are removed everywhere.
+
+    Args:
+        df (pd.DataFrame): The rows to write. Must contain a Name column.
+        table_name (str, optional): The target table in every shard. Defaults to "CoinsTable".
+        shard_dir (str, optional): The directory holding the shard files. Defaults to "./shards".
+        n_shards (int, optional): The number of shards of a new directory. Defaults to the existing count, or 4.
+        mode (str, optional): "replace" or "upsert", as in `push_to_sqlite`. Defaults to "replace".
+        max_workers (int, optional): Shards written in parallel. Defaults to the number of shards.
+        **kwargs: Further arguments for `push_to_sqlite`, e.g. `layout` or `batch_size`.
+
+    Returns:
+        Optional[Dict[str, int]]: For upserts, the inserted, updated and unchanged row counts summed over shards.
+    """
+    connection = ShardedSQLiteConnection(directory=shard_dir, n_shards=n_shards, max_workers=max_workers)
+    parts = connection.partition(df)
+    # Upserts leave shards without new rows untouched, except that a shard without a file yet
+    # gets an empty table, so fan-out queries find CoinsTable in every shard
+    shards = [shard for shard, part in parts.items()
+              if mode == "replace" or len(part) or not os.path.exists(connection.shard_path(shard))]
+    reports = connection.map(
+        lambda shard: push_to_sqlite(df=parts[shard], table_name=table_name, db_name=connection.shard_path(shard), mode=mode, **kwargs),
+        shards,
+    )
+    print(f"DataFrame pushed to {len(shards)} shard(s) of '{shard_dir}'.")
+    if mode != "upsert":
+        return None
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    for report in reports:
+        for key, value in (report or {}).items():
+            counts[key] += value
+    return counts
+
+def push_to_azure(df: pd.DataFrame, table_name: str = "CoinsTable", batch_size: int = 50_000, n_partitions: int = 4,
+                  max_workers: int = 4, load_id: Optional[str] = None) -> Optional[Dict]:
+    # Imported here so the SQLite path does not need the SQL Server driver settings
+    from database.sql_connection import sql_connection
+
+    try:
+        loader = BulkLoader(engine=sql_connection().get_engine(), table_name=table_name, batch_size=batch_size,
+                            n_partitions=n_partitions, max_workers=max_workers)
+        report = loader.load(df=df, load_id=load_id)
+        print(f"DataFrame successfully pushed to table '{table_name}' on SQL Server: {report['rows']} rows "
+              f"at {report['rows_per_second']:.0f} rows/s (load id '{report['load_id']}').")
+        return report
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
 
 def write_to_csv(df: pd.DataFrame, file_name: str = ".data/coins.csv") -> None:
     df.to_csv(file_name, index=False)
+
+def write_to_dataset(df: pd.DataFrame, dataset_dir: str = COINS_DATASET_DIR, file_format: str = "parquet",
+                     compression: Optional[str] = None, replace: bool = True) -> Optional[str]:
+    """
+    Writes the cleaned data as a columnar dataset partitioned by coin, so readers can skip whole
+    coins and read only the columns they need (see `src.cleaning.read.read_coins_dataset`). Rows are
+    sorted by Date within each coin, which keeps the Parquet row group statistics tight for Date filters.
+
+    Args:
+        df (pd.DataFrame): The cleaned rows, with a Name column.
+        dataset_dir (str, optional): The dataset directory. Defaults to ".data/coins".
+        file_format (str, optional): "parquet" or "feather". Defaults to "parquet".
+        compression (str, optional): The codec. Defaults to zstd for Parquet and none for Feather,
+            whose uncompressed files can be memory-mapped without copying.
+        replace (bool, optional): Replace the whole previous dataset, once the new one is written.
+            Otherwise only the partitions of the coins in `df` are replaced. Defaults to True.
+
+    Returns:
+        Optional[str]: The dataset directory, or None if pyarrow is not installed or the write failed.
+    """
+    if file_format not in DATASET_FORMATS:
+        raise ValueError(f"Unknown dataset format '{file_format}', expected one of {DATASET_FORMATS}")
+    if importlib.util.find_spec("pyarrow") is None:
+        print("pyarrow is not installed, the columnar dataset was not written.")
+        return None
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    # A full replace is written next to the dataset and renamed into place, so a failed write
+    # leaves the previous dataset as it was
+    sibling = os.path.normpath(dataset_dir)
+    target_dir = f"{sibling}.tmp" if replace else dataset_dir
+    try:
+        if replace and os.path.isdir(target_dir):
+            shutil.rmtree(target_dir)
+        sort_columns = ["Name", "Date"] if "Date" in df.columns else ["Name"]
+        table = pa.Table.from_pandas(df.sort_values(sort_columns, kind="stable"), preserve_index=False)
+        if file_format == "parquet":
+            file_options = ds.ParquetFileFormat().make_write_options(compression=compression or "zstd")
+        else:
+            file_options = ds.IpcFileFormat().make_write_options(compression=compression)
+        ds.write_dataset(table, target_dir, format="parquet" if file_format == "parquet" else "ipc",
+                         partitioning=["Name"], partitioning_flavor="hive", basename_template=f"part-{{i}}.{file_format}",
+                         existing_data_behavior="delete_matching", file_options=file_options)
+        if replace:
+            shutil.rmtree(f"{sibling}.old", ignore_errors=True)
+            if os.path.isdir(sibling):
+                os.replace(sibling, f"{sibling}.old")
+            os.replace(target_dir, sibling)
+            shutil.rmtree(f"{sibling}.old", ignore_errors=True)
+        print(f"{len(df)} rows successfully written to the {file_format} dataset '{dataset_dir}'.")
+        return dataset_dir
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        if replace:
+            shutil.rmtree(target_dir, ignore_errors=True)
+        return None
@@ -1,19 +1,24 @@
 # Main cleaning file
+import os
 import pandas as pd
+from typing import Dict, Optional, Tuple
 from .clean import fill_na_with_median_and_mode, remove_outliers, convert_datetime_column
 from .read import get_data_files, concatenate_csv_files
-from .reporting import define_report_structure, export_report
-from .utility import count_nans_per_column, count_outliers
+from .reporting import define_report_structure, export_report, merge_reports
+from .utility import count_nans_per_column, count_outliers, detect_outliers
+from .validation import evaluate_rules
+from .compact import compact_frame, memory_per_column, memory_report
+from .streaming import stream_clean_csv_files
+from .load import SQLiteChunkWriter, write_to_dataset
+from .manifest import load_manifest, save_manifest, diff_manifest, write_cleaned, read_cleaned
 
 
-def run_data_cleaning(directory_path: str) -> pd.DataFrame:
-    # Load data into dataframe
-    file_paths = get_data_files(dir_path=directory_path)
-    df = concatenate_csv_files(files=file_paths)
-
+def clean_data(df: pd.DataFrame, keep_index: bool = False) -> Tuple[pd.DataFrame, Dict]:
+    # With `keep_index` the cleaned rows keep the labels they had in `df`
     # Pre-Cleaning reporting
     report = define_report_structure()
-    outliers = count_outliers(df=df)
+    # One pass gives both the outlier counts and the rows to keep
+    outliers, inside_fences = detect_outliers(df=df)
     for outlier, value in outliers.items():
         report["Category"].append("Pre-cleaned outliers")
         report["Field Description"].append(outlier)
@@ -25,9 +30,15 @@ def run_data_cleaning(directory_path: str) -> pd.DataFrame:
         report["Field Description"].append(column)
         report["Count"].append(count)
 
+    violations, _ = evaluate_rules(df=df)
+    for violation, count in violations.items():
+        report["Category"].append("Pre-cleaned rule violations")
+        report["Field Description"].append(violation)
+        report["Count"].append(count)
+
     # cleaning
     df = fill_na_with_median_and_mode(df=df)
-    df = remove_outliers(df=df)
+    df = remove_outliers(df=df, mask=inside_fences, keep_index=keep_index)
     df = convert_datetime_column(df=df)
 
     # Post cleaning reporting
@@ -43,12 +54,103 @@ def run_data_cleaning(directory_path: str) -> pd.DataFrame:
         report["Field Description"].append(column)
         report["Count"].append(count)
 
+    violations, _ = evaluate_rules(df=df)
+    for violation, count in violations.items():
+        report["Category"].append("Post-cleaned rule violations")
+        report["Field Description"].append(violation)
+        report["Count"].append(count)
+
+    return df, report
+
+
+def compact_cleaned(df: pd.DataFrame, downcast_floats: bool = False) -> Tuple[pd.DataFrame, Dict]:
+    # Categorical names, datetime64 dates and optionally float32 prices, with the memory saved per column
+    before = memory_per_column(df=df)
+    df = compact_frame(df=df, downcast_floats=downcast_floats)
+    after = memory_per_column(df=df)
+    print(f"Compacted the cleaned data from {before.sum() / 1024 ** 2:.1f} MB to {after.sum() / 1024 ** 2:.1f} MB")
+    return df, memory_report(before=before, after=after)
+
+
+def run_data_cleaning(directory_path: str, incremental: bool = False, chunksize: Optional[int] = None,
+                      db_name: str = "./test_db.db", table_name: str = "CoinsTable",
+                      compact: bool = False, downcast_floats: bool = False) -> Optional[pd.DataFrame]:
+    # Load data into dataframe
+    file_paths = get_data_files(dir_path=directory_path)
+    if chunksize is not None:
+        # Out-of-core mode: the cleaned rows go straight to the database instead of being returned
+        run_streaming_cleaning(file_paths=file_paths, chunksize=chunksize, db_name=db_name, table_name=table_name)
+        return None
+    if incremental:
+        return run_incremental_cleaning(directory_path=directory_path, file_paths=file_paths,
+                                        compact=compact, downcast_floats=downcast_floats)
+
+    df = concatenate_csv_files(files=file_paths)
+    df, report = clean_data(df=df)
+    if compact:
+        df, memory = compact_cleaned(df=df, downcast_floats=downcast_floats)
+        report = merge_reports(reports=[report, memory])
+
     export_report(report=report)
     print(
         "Cleaning Report has been exported"
     )  # Might be useful to have a reporting screen on our data in the UI
+    return df
+
+
+def run_incremental_cleaning(directory_path: str, file_paths: list, compact: bool = False,
+                             downcast_floats: bool = False) -> pd.DataFrame:
+    # Every file holds one coin and cleaning works per coin, so each file can be cleaned on its own
+    manifest = load_manifest(dir_path=directory_path)
+    changed, unchanged, removed, fingerprints = diff_manifest(files=file_paths, manifest=manifest)
+
+    reports = []
+    cleaned = {}
+    for file_path in changed:
+        df, report = clean_data(df=concatenate_csv_files(files=[file_path]))
+        fingerprints[os.path.basename(file_path)]["cleaned"] = write_cleaned(dir_path=directory_path, file_path=file_path, df=df)
+        cleaned[file_path] = df
+        reports.append(report)
+
+    for key in removed:
+        if os.path.exists(manifest[key].get("cleaned", "")):
+            os.remove(manifest[key]["cleaned"])
+    save_manifest(dir_path=directory_path, manifest=fingerprints)
+    print(
+        f"Cleaned {len(changed)} new or modified file(s), reused {len(unchanged)} unchanged and dropped {len(removed)} removed file(s)"
+    )
+
+    # Merge in file order so the result matches a full run
+    frames = [cleaned[file_path] if file_path in cleaned else read_cleaned(fingerprints[os.path.basename(file_path)]["cleaned"])
+              for file_path in file_paths]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    # Compacted after the merge, since categoricals with different categories concatenate to object
+    if compact and not df.empty:
+        df, memory = compact_cleaned(df=df, downcast_floats=downcast_floats)
+        # A run that reused every file keeps the previous report
+        if reports:
+            reports.append(memory)
+
+    if reports:
+        export_report(report=merge_reports(reports=reports))
+    return df
+
+
+def run_streaming_cleaning(file_paths: list, chunksize: int, db_name: str, table_name: str) -> None:
+    writer = SQLiteChunkWriter(table_name=table_name, db_name=db_name)
+    try:
+        report = stream_clean_csv_files(files=file_paths, write=writer.write, chunksize=chunksize)
+    finally:
+        writer.close()
+
+    export_report(report=report)
+    print(
+        "Cleaning Report has been exported"
+    )
 
 
 if __name__ == "__main__":
     directory_path = "./.data"
-    run_data_cleaning(directory_path=directory_path)
+    df = run_data_cleaning(directory_path=directory_path, incremental=True)
+    # Partitioned by coin for the forecasting and training jobs, see `read_coins_dataset`
+    write_to_dataset(df=df)
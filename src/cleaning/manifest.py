@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+MANIFEST_FILE = ".cleaning_manifest.json"
+CACHE_DIR = ".cleaning_cache"
+# Bump whenever clean_data changes what it returns, so cached cleaned files are cleaned again
+CLEANING_VERSION = 2
+
+
+def file_hash(file_path: str, block_size: int = 1 << 20) -> str:
+    """Returns the SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(file_path: str, previous: Optional[Dict] = None) -> Dict:
+    """
+    Returns the size, mtime and content hash of a file. When size and mtime match `previous`
+    the stored hash is reused, so unchanged files are not read at all.
+    """
+    stat = os.stat(file_path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+        fingerprint["sha256"] = previous["sha256"]
+    else:
+        fingerprint["sha256"] = file_hash(file_path)
+    return fingerprint
+
+
+def load_manifest(dir_path: str) -> Dict[str, Dict]:
+    """Returns the manifest stored in the data directory, or an empty one."""
+    manifest_path = os.path.join(dir_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)["files"]
+
+
+def save_manifest(dir_path: str, manifest: Dict[str, Dict]) -> None:
+    """Writes the manifest next to the data, replacing the previous one atomically."""
+    manifest_path = os.path.join(dir_path, MANIFEST_FILE)
+    with open(f"{manifest_path}.tmp", "w") as f:
+        json.dump({"version": 1, "files": manifest}, f, indent=2, sort_keys=True)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+
+
+def diff_manifest(files: List[str], manifest: Dict[str, Dict]) -> Tuple[List[str], List[str], List[str], Dict[str, Dict]]:
+    """
+    Compares the files on disk with the manifest. A file counts as changed if its content hash
+    differs, so a file that was merely touched is not cleaned again, or if its cached output was
+    cleaned by another version of the cleaning logic.
+
+    Returns:
+        Tuple: The new or modified files, the unchanged files, the files removed since the last
+            run, and the fingerprints of every current file.
+    """
+    changed, unchanged, fingerprints = [], [], {}
+    for file_path in files:
+        key = os.path.basename(file_path)
+        previous = manifest.get(key)
+        fingerprint = file_fingerprint(file_path, previous=previous)
+        # Every current file is cleaned with this version by the end of the run
+        fingerprint["cleaning_version"] = CLEANING_VERSION
+        fingerprints[key] = fingerprint
+        cached = previous is not None and os.path.exists(previous.get("cleaned", ""))
+        if cached and previous["sha256"] == fingerprint["sha256"] and previous.get("cleaning_version") == CLEANING_VERSION:
+            fingerprint["cleaned"] = previous["cleaned"]
+            unchanged.append(file_path)
+        else:
+            changed.append(file_path)
+
+    current = {os.path.basename(file_path) for file_path in files}
+    removed = [key for key in manifest if key not in current]
+    return changed, unchanged, removed, fingerprints
+
+
+def cache_path(dir_path: str, file_path: str) -> str:
+    """Returns where the cleaned rows of one data file are cached."""
+    return os.path.join(dir_path, CACHE_DIR, f"{os.path.splitext(os.path.basename(file_path))[0]}.pkl")
+
+
+def write_cleaned(dir_path: str, file_path: str, df: pd.DataFrame) -> str:
+    """Caches the cleaned rows of one data file and returns the cache path."""
+    path = cache_path(dir_path, file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_pickle(path)
+    return path
+
+
+def read_cleaned(path: str) -> pd.DataFrame:
+    """Reads the cached cleaned rows of one data file."""
+    return pd.read_pickle(path)
@@ -1,8 +1,14 @@
+import csv
+import importlib.util
 import os
+import zipfile
+import numpy as np
 import pandas as pd
-from typing import List
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import IO, Iterator, List, Optional, Tuple, Union
 from .validation import validate_directory
-from .load import push_to_sqlite, write_to_csv
+from .load import push_to_sqlite, write_to_csv, COINS_DATASET_DIR
 
 
 def get_data_files(dir_path: str) -> List[str]:
@@ -24,18 +30,201 @@ def get_data_files(dir_path: str) -> List[str]:
         return []
 
 
-def concatenate_csv_files(files: List[str]) -> pd.DataFrame:
-    data_frames = []
-    sum_lengths = 0
-    for file_path in files:
-        df = pd.read_csv(file_path)
-        sum_lengths += len(df)
-        data_frames.append(df)
+# Known columns of the Kaggle crypto dataset; other columns keep pandas' type inference
+CSV_DTYPES = {
+    "SNo": np.dtype("int64"),
+    "High": np.dtype("float64"),
+    "Low": np.dtype("float64"),
+    "Open": np.dtype("float64"),
+    "Close": np.dtype("float64"),
+    "Volume": np.dtype("float64"),
+    "Marketcap": np.dtype("float64"),
+}
+
+
+def read_csv_file(file_path: Union[str, IO[bytes]], engine: str = "c") -> pd.DataFrame:
+    """
+    Reads one coin CSV with explicit dtypes for the known columns, so pandas does not have to infer
+    them. A file whose values do not fit those dtypes (e.g. a missing SNo) is read with inference instead.
+
+    Args:
+        file_path (Union[str, IO[bytes]]): The CSV file, or an open seekable binary stream such as a
+            zip archive member.
+        engine (str, optional): The pandas parser, "c" or "pyarrow". Defaults to "c".
+
+    Returns:
+        pd.DataFrame: The file's rows.
+    """
+    if isinstance(file_path, str):
+        with open(file_path, newline="") as f:
+            header = next(csv.reader([f.readline()]), [])
+        dtype = {column: kind for column, kind in CSV_DTYPES.items() if column in header}
+    else:
+        # Streams are not read twice for the header, the C parser ignores dtypes of missing columns
+        dtype = dict(CSV_DTYPES)
+    try:
+        return pd.read_csv(file_path, dtype=dtype, engine=engine)
+    except (ValueError, TypeError) as e:
+        print(f"Could not apply the column types to '{getattr(file_path, 'name', file_path)}', inferring them instead: {e}")
+        if not isinstance(file_path, str):
+            file_path.seek(0)
+        return pd.read_csv(file_path, engine=engine)
+
+
+def parse_csv_dates(dates: pd.Series) -> pd.Series:
+    """
+    Parses a Date column in any ISO 8601 layout. A date that cannot be parsed raises a ValueError
+    naming it, rather than silently becoming NaT.
+    """
+    parsed = pd.to_datetime(dates, format="ISO8601", errors="coerce")
+    failed = dates[parsed.isna() & dates.notna()]
+    if len(failed):
+        raise ValueError(f"{len(failed)} Date value(s) could not be parsed, e.g. {failed.iloc[0]!r}")
+    return parsed
+
+
+def read_csv_archive(zip_path: str, members: Optional[List[str]] = None,
+                     parse_dates: bool = False) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    Yields the CSV members of a zip archive as (member name, frame) pairs, decompressed straight
+    into the parser without extracting files to disk.
+
+    Args:
+        zip_path (str): The zip archive.
+        members (List[str], optional): Member names to read. Defaults to every CSV member.
+        parse_dates (bool, optional): Parse the Date column to datetime64 with `parse_csv_dates`. Defaults to False.
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        for info in archive.infolist():
+            if not info.filename.endswith(".csv") or (members is not None and info.filename not in members):
+                continue
+            with archive.open(info) as f:
+                df = read_csv_file(f)
+            if parse_dates and "Date" in df.columns:
+                df["Date"] = parse_csv_dates(df["Date"])
+            yield info.filename, df
+
+
+def concatenate_csv_files(files: List[str], max_workers: int = 1, use_processes: bool = False,
+                          engine: str = "c", parse_dates: bool = False) -> pd.DataFrame:
+    """
+    Reads the CSV files and concatenates them once, in `files` order. Known columns get explicit
+    dtypes and, with `parse_dates`, the Date column is parsed to datetime64 by `parse_csv_dates`.
+
+    With `max_workers` > 1 the files are read in parallel: threads by default, since the C and
+    pyarrow parsers release the GIL while parsing, or processes with `use_processes=True`.
+    The "pyarrow" engine is used only if pyarrow is installed.
+    """
+    if engine == "pyarrow" and importlib.util.find_spec("pyarrow") is None:
+        print("pyarrow is not installed, reading the CSV files with the C engine instead.")
+        engine = "c"
+
+    read = partial(read_csv_file, engine=engine)
+    if max_workers > 1 and len(files) > 1:
+        pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with pool_class(max_workers=max_workers) as pool:
+            data_frames = list(pool.map(read, files))
+    else:
+        data_frames = [read(file_path) for file_path in files]
 
     concatenated_df = pd.concat(data_frames, ignore_index=True)
+    # One vectorised pass over all files is cheaper than parsing dates per file
+    if parse_dates and "Date" in concatenated_df.columns:
+        concatenated_df["Date"] = parse_csv_dates(concatenated_df["Date"])
     return concatenated_df
 
 
+def dataset_format(dataset_dir: str) -> Optional[str]:
+    """Returns the format of a dataset written by `write_to_dataset`, or None if there is none."""
+    if not os.path.isdir(dataset_dir):
+        return None
+    for _, _, file_names in os.walk(dataset_dir):
+        for file_name in file_names:
+            if file_name.endswith((".parquet", ".feather")):
+                return os.path.splitext(file_name)[1][1:]
+    return None
+
+
+def end_of_day(end_date: str) -> pd.Timestamp:
+    """Returns the start of the day after `end_date`, so a filter below it keeps the whole end day."""
+    return pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+
+
+def read_coins_dataset(dataset_dir: str = COINS_DATASET_DIR, coin_names: Optional[List[str]] = None,
+                       columns: Optional[List[str]] = None, start_date: Optional[str] = None,
+                       end_date: Optional[str] = None, csv_path: str = ".data/coins.csv") -> pd.DataFrame:
+    """
+    Reads the cleaned data written by `write_to_dataset`. The coin filter prunes whole partitions,
+    the date filter is pushed down to the Parquet row group statistics and only the requested
+    columns are decoded; files are memory-mapped. Name comes back as a categorical.
+
+    Without pyarrow or a dataset, the same selection is read from the CSV at `csv_path` instead.
+
+    Args:
+        dataset_dir (str, optional): The dataset directory. Defaults to ".data/coins".
+        coin_names (List[str], optional): Coins to read. Defaults to every coin.
+        columns (List[str], optional): Columns to read. Defaults to every column.
+        start_date (str, optional): First date to include.
+        end_date (str, optional): Last day to include, with all of its rows whatever their time.
+        csv_path (str, optional): The CSV fallback. Defaults to ".data/coins.csv".
+
+    Returns:
+        pd.DataFrame: The selected rows, in coin then date order for the dataset.
+    """
+    file_format = dataset_format(dataset_dir)
+    if file_format is None or importlib.util.find_spec("pyarrow") is None:
+        print(f"No columnar dataset could be read from '{dataset_dir}', reading '{csv_path}' instead.")
+        return read_coins_csv(csv_path=csv_path, coin_names=coin_names, columns=columns,
+                              start_date=start_date, end_date=end_date)
+
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    dataset = ds.dataset(dataset_dir, format="parquet" if file_format == "parquet" else "ipc",
+                         partitioning=ds.HivePartitioning.discover(infer_dictionary=True),
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+    condition = None
+    for expression in [
+        ds.field("Name").isin(coin_names) if coin_names is not None else None,
+        ds.field("Date") >= pd.Timestamp(start_date) if start_date is not None else None,
+        ds.field("Date") < end_of_day(end_date) if end_date is not None else None,
+    ]:
+        if expression is not None:
+            condition = expression if condition is None else condition & expression
+
+    df = dataset.to_table(columns=columns, filter=condition).to_pandas()
+    # The partition column is appended last, restore the column order the data was written in
+    written = [column["name"] for column in (dataset.schema.pandas_metadata or {}).get("columns", [])]
+    order = columns or [column for column in written if column in df.columns]
+    return df[order + [column for column in df.columns if column not in order]]
+
+
+def read_coins_csv(csv_path: str = ".data/coins.csv", coin_names: Optional[List[str]] = None,
+                   columns: Optional[List[str]] = None, start_date: Optional[str] = None,
+                   end_date: Optional[str] = None) -> pd.DataFrame:
+    """Reads the cleaned data from the CSV written by `write_to_csv`, with the same selection as `read_coins_dataset`."""
+    needed = None
+    if columns is not None:
+        # Filter columns are read even when they are not returned
+        needed = list(columns)
+        if coin_names is not None and "Name" not in needed:
+            needed.append("Name")
+        if (start_date is not None or end_date is not None) and "Date" not in needed:
+            needed.append("Date")
+    df = pd.read_csv(csv_path, usecols=needed)
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"], format="ISO8601", errors="coerce")
+    mask = pd.Series(True, index=df.index)
+    if coin_names is not None:
+        mask &= df["Name"].isin(coin_names)
+    if start_date is not None:
+        mask &= df["Date"] >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= df["Date"] < end_of_day(end_date)
+    df = df[mask].reset_index(drop=True)
+    return df[columns] if columns is not None else df
+
+
 if __name__ == "__main__":
     file_path = get_data_files(".data")
     df = concatenate_csv_files(files=file_path)
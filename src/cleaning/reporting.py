@@ -1,5 +1,5 @@
 import pandas as pd
-from typing import Dict
+from typing import Dict, List
 
 
 def define_report_structure():
@@ -10,3 +10,10 @@ def define_report_structure():
 def export_report(report: Dict) -> None:
     df = pd.DataFrame(report)
     df.to_csv("./.data/Data Report.csv")
+
+
+def merge_reports(reports: List[Dict]) -> Dict:
+    # Counts for the same category and field are summed, in order of first appearance
+    df = pd.concat([pd.DataFrame(report) for report in reports], ignore_index=True)
+    merged = df.groupby(["Category", "Field Description"], sort=False, as_index=False)["Count"].sum()
+    return merged.to_dict(orient="list")
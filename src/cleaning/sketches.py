@@ -0,0 +1,119 @@
+import numpy as np
+from typing import List, Optional, Sequence, Union
+
+
+class QuantileSketch:
+    """
+    This class is a mergeable quantile sketch in the style of KLL. Values are buffered in levels of
+    at most `k` items; when a level overflows it is sorted and every other item (from a random
+    offset) moves to the next level, where each item stands for twice as many values. Memory stays
+    at O(k log(n / k)) values whatever the stream length, and two sketches of disjoint data merge
+    into the sketch of their union, so sketches built per chunk or per file can be combined.
+
+    While no level has been compacted, quantiles are exact and use the same linear interpolation
+    as `pd.Series.quantile`. After that the rank error is roughly 1 / k.
+
+    Args:
+        k (int): Items kept per level, trading memory for accuracy. Defaults to 256.
+        seed (int, optional): Seed for the compaction offsets.
+    """
+
+    def __init__(self, k: int = 256, seed: Optional[int] = None) -> None:
+        """
+        The constructor for the QuantileSketch.
+        """
+        if k < 2:
+            raise ValueError(f"k must be at least 2, got {k}")
+        self.k = k
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: Union[Sequence[float], np.ndarray]) -> None:
+        """
+        Adds a batch of values. NaN values are ignored.
+
+        Args:
+            values (Union[Sequence[float], np.ndarray]): The values.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """
+        Adds every value summarised by another sketch.
+
+        Args:
+            other (QuantileSketch): The sketch to merge in.
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.k:
+                items = np.sort(items)
+                # An odd item out stays behind so the total weight is preserved exactly
+                keep = items[-1:].copy() if len(items) % 2 else items[:0].copy()
+                even = items[:len(items) - len(keep)]
+                # Copies, so the sorted level is not kept alive by views into it
+                promoted = even[self._rng.integers(2)::2].copy()
+                self.levels[level] = keep
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    @property
+    def exact(self) -> bool:
+        """
+        Whether every value is still held, i.e. quantiles are exact.
+        """
+        return len(self.levels) == 1
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """
+        Returns the estimated quantiles of the values seen so far.
+
+        Args:
+            qs (Sequence[float]): Quantiles in [0, 1].
+
+        Returns:
+            np.ndarray: One estimate per quantile, NaN if the sketch is empty.
+        """
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.count == 0:
+            return np.full(len(qs), np.nan)
+        if self.exact:
+            return np.quantile(self.levels[0], qs)
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** i) for i, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, weights = items[order], weights[order]
+        # Rank of each item's midpoint, mapped to [0, 1] like the linear method's positions
+        positions = (np.cumsum(weights) - weights / 2) / weights.sum()
+        return np.interp(qs, positions, items)
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns the estimated `q` quantile.
+
+        Args:
+            q (float): The quantile in [0, 1].
+
+        Returns:
+            float: The estimate.
+        """
+        return float(self.quantiles([q])[0])
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional
+from .read import CSV_DTYPES, parse_csv_dates
+from .reporting import define_report_structure
+from .dedup import KeyIndex, deduplicate, export_conflicts, index_rows
+from .load import SQLiteChunkWriter
+from .sketches import QuantileSketch
+from .utility import OUTLIER_COLUMNS
+from .validation import evaluate_rules
+
+# SNo is left to inference because a chunk cannot fall back to it the way a whole file can
+STREAM_DTYPES = {column: kind for column, kind in CSV_DTYPES.items() if column != "SNo"}
+
+
+def iter_csv_chunks(files: List[str], chunksize: int) -> Iterator[pd.DataFrame]:
+    """Yields the rows of the CSV files as frames of at most `chunksize` rows, file by file."""
+    for file_path in files:
+        with pd.read_csv(file_path, dtype=STREAM_DTYPES, chunksize=chunksize) as reader:
+            yield from reader
+
+
+class CleaningProfile:
+    """
+    This class holds what the cleaning steps need to know about the whole dataset, built from
+    one pass over chunks without keeping the rows: the NaN count per column and a quantile sketch
+    per coin and outlier column for the IQR fences. Profiles of different chunks or files can be merged.
+
+    Args:
+        k (int): Items per sketch level, see `QuantileSketch`. Defaults to 256.
+        columns (List[str]): Columns checked for outliers. Defaults to `OUTLIER_COLUMNS`.
+    """
+
+    def __init__(self, k: int = 256, columns: Optional[List[str]] = None) -> None:
+        """
+        The constructor for the CleaningProfile.
+        """
+        self.k = k
+        self.columns = columns or OUTLIER_COLUMNS
+        self.rows = 0
+        self.nan_counts: Counter = Counter()
+        self.coins: Dict[str, Dict[str, QuantileSketch]] = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Adds a chunk of raw rows to the profile."""
+        self.rows += len(chunk)
+        self.nan_counts.update(chunk.isnull().sum().to_dict())
+
+        columns = [col for col in self.columns if col in chunk.columns]
+        for coin_name, coin_df in chunk.groupby("Name", sort=False):
+            sketches = self.coins.setdefault(coin_name, {})
+            for col in columns:
+                sketches.setdefault(col, QuantileSketch(k=self.k)).update(coin_df[col].to_numpy())
+
+    def merge(self, other: "CleaningProfile") -> None:
+        """Adds another profile, e.g. one built from a different file."""
+        self.rows += other.rows
+        self.nan_counts.update(other.nan_counts)
+        for coin_name, sketches in other.coins.items():
+            for col, sketch in sketches.items():
+                self.coins.setdefault(coin_name, {}).setdefault(col, QuantileSketch(k=self.k)).merge(sketch)
+
+    def fences(self) -> pd.DataFrame:
+        """Returns the lower and upper 1.5 * IQR fence of every coin and column, indexed by coin."""
+        rows = {}
+        for coin_name, sketches in self.coins.items():
+            row = {}
+            for col, sketch in sketches.items():
+                Q1, Q3 = sketch.quantiles([0.25, 0.75])
+                IQR = Q3 - Q1
+                row[f"{col}_lower"] = Q1 - 1.5 * IQR
+                row[f"{col}_upper"] = Q3 + 1.5 * IQR
+            rows[coin_name] = row
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def profile_csv_files(files: List[str], chunksize: int = 100_000, k: int = 256) -> CleaningProfile:
+    """First pass: builds the cleaning profile of the CSV files, one chunk in memory at a time."""
+    profile = CleaningProfile(k=k)
+    for chunk in iter_csv_chunks(files=files, chunksize=chunksize):
+        profile.update(chunk=chunk)
+    return profile
+
+
+def clean_chunk(chunk: pd.DataFrame, fences: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Removes outliers from and types one chunk using dataset-wide fences. Nothing is imputed: as in
+    `clean_data`, rows without a coin name or with a missing value in an outlier column are dropped.
+    """
+    columns = [col for col in columns if col in chunk.columns]
+
+    # Broadcast each row's coin fences, rows of coins never profiled get NaN fences and are dropped
+    bounds = fences.reindex(chunk["Name"].to_numpy())
+    inside = chunk["Name"].notna().to_numpy(copy=True)
+    for col in columns:
+        values = chunk[col].to_numpy()
+        inside &= (values >= bounds[f"{col}_lower"].to_numpy()) & (values <= bounds[f"{col}_upper"].to_numpy())
+    chunk = chunk[inside]
+
+    if "Date" in chunk.columns:
+        # Like the in-memory path, a date that cannot be parsed raises instead of being stored as NaT
+        chunk = chunk.assign(Date=parse_csv_dates(chunk["Date"]))
+    return chunk
+
+
+def stream_clean_csv_files(files: List[str], write: Callable[[pd.DataFrame], None], chunksize: int = 100_000,
+                           k: int = 256, profile: Optional[CleaningProfile] = None, index: Optional[KeyIndex] = None,
+                           conflicts_file: str = "./.data/Conflicting Duplicates.csv") -> Dict:
+    """
+    Cleans the CSV files without ever holding more than one chunk of rows. The first pass builds
+    a `CleaningProfile`; the second re-reads the files, drops rows without a coin name or outside
+    their coin's IQR fences and hands each cleaned chunk to `write`, e.g. `SQLiteChunkWriter.write`.
+    The cleaned rows match those of `clean_data`, except that the fences come from quantile sketches,
+    so on coins with more than a few hundred rows they are approximate.
+
+    With a `KeyIndex`, rows whose (Name, Date) key was already seen, in an earlier chunk or an earlier
+    load, are not written; those with different values are appended to `conflicts_file`. Keys are
+    indexed only once `write` has stored their rows, so rows dropped as outliers or lost to a failed
+    write are not marked as loaded. As a later run may find no new rows at all, the writer must not
+    replace the table: use `SQLiteChunkWriter(mode="upsert")`.
+
+    Returns:
+        Dict: The data report. Post-cleaning outlier counts would need a third pass and are not included,
+            and the "Duplicate Name and Date" rule only counts duplicates within a chunk (a `KeyIndex`
+            catches them across chunks).
+    """
+    writer = getattr(write, "__self__", None)
+    if index is not None and isinstance(writer, SQLiteChunkWriter) and writer.mode == "replace":
+        raise ValueError("A KeyIndex skips rows loaded before, so the SQLiteChunkWriter must use mode='upsert'")
+    profile = profile or profile_csv_files(files=files, chunksize=chunksize, k=k)
+    fences = profile.fences()
+    columns = [col for col in profile.columns if f"{col}_lower" in fences.columns]
+
+    outliers: Counter = Counter()
+    post_nan_counts: Counter = Counter()
+    pre_violations: Counter = Counter()
+    post_violations: Counter = Counter()
+    dedup_counts: Counter = Counter()
+    for chunk in iter_csv_chunks(files=files, chunksize=chunksize):
+        pre_violations.update(evaluate_rules(df=chunk)[0])
+        if index is not None:
+            # Keys are only indexed once their rows are written, see below
+            chunk, conflicts, counts = deduplicate(df=chunk, index=index, update_index=False)
+            dedup_counts.update(counts)
+        bounds = fences.reindex(chunk["Name"].to_numpy())
+        for col in columns:
+            values = chunk[col].to_numpy()
+            outside = (values < bounds[f"{col}_lower"].to_numpy()) | (values > bounds[f"{col}_upper"].to_numpy())
+            outliers.update(pd.Series(outside).groupby(chunk["Name"].to_numpy()).sum().add_suffix(f"_{col}").to_dict())
+
+        cleaned = clean_chunk(chunk=chunk, fences=fences, columns=columns)
+        post_nan_counts.update(cleaned.isnull().sum().to_dict())
+        post_violations.update(evaluate_rules(df=cleaned)[0])
+        write(cleaned)
+        if index is not None:
+            export_conflicts(conflicts=conflicts, file_name=conflicts_file)
+            index_rows(df=cleaned, index=index)
+    if index is not None:
+        index.save()
+
+    report = define_report_structure()
+    sections = [
+        ("Pre-cleaned outliers", {f"{coin}_{col}": outliers[f"{coin}_{col}"] for coin in sorted(profile.coins) for col in columns}),
+        ("Pre-cleaned NaN Counts", dict(profile.nan_counts)),
+        ("Pre-cleaned rule violations", dict(pre_violations)),
+        ("Post-cleaned NaN Counts", dict(post_nan_counts)),
+        ("Post-cleaned rule violations", dict(post_violations)),
+        ("Deduplication", dict(dedup_counts)),
+    ]
+    for category, counts in sections:
+        for field, count in counts.items():
+            report["Category"].append(category)
+            report["Field Description"].append(field)
+            report["Count"].append(count)
+    return report
@@ -1,6 +1,82 @@
 import os
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from .exceptions import DirectoryNotFound
 
 def validate_directory(dir_path:str):
     if not os.path.isdir(dir_path):
         raise DirectoryNotFound(f"The following directory `{dir_path}` does not exist")
+
+
+class Rule:
+    """
+    This class declares one data-quality rule. The condition describes the violating rows, either as
+    a `pd.DataFrame.eval` expression such as "High < Low" or as a function returning a boolean mask
+    over the whole frame. Either way it is evaluated column-wise, never row by row. Rows where a
+    compared value is NaN do not violate comparison rules; missing values are reported separately.
+
+    Args:
+        name (str): The rule name used in the report.
+        condition (Union[str, Callable[[pd.DataFrame], pd.Series]]): What a violating row looks like.
+        columns (List[str]): Columns the condition needs. The rule is skipped if any is missing.
+    """
+
+    def __init__(self, name: str, condition: Union[str, Callable[[pd.DataFrame], pd.Series]], columns: List[str]) -> None:
+        """
+        The constructor for the Rule.
+        """
+        self.name = name
+        self.condition = condition
+        self.columns = columns
+
+    def applies_to(self, df: pd.DataFrame) -> bool:
+        """
+        Whether the frame has every column the rule needs.
+        """
+        return all(column in df.columns for column in self.columns)
+
+    def violations(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Returns the boolean mask of the rows that break the rule.
+        """
+        if isinstance(self.condition, str):
+            mask = df.eval(self.condition)
+        else:
+            mask = self.condition(df)
+        return np.asarray(mask, dtype=bool)
+
+
+DATA_QUALITY_RULES = [
+    Rule("High below Low", "High < Low", ["High", "Low"]),
+    Rule("Open outside Low-High", "(Open < Low) | (Open > High)", ["Open", "Low", "High"]),
+    Rule("Close outside Low-High", "(Close < Low) | (Close > High)", ["Close", "Low", "High"]),
+    Rule("Non-positive price", "(High <= 0) | (Low <= 0) | (Open <= 0) | (Close <= 0)", ["High", "Low", "Open", "Close"]),
+    Rule("Negative Volume", "Volume < 0", ["Volume"]),
+    Rule("Negative Marketcap", "Marketcap < 0", ["Marketcap"]),
+    # Every copy after the first of a (Name, Date) pair
+    Rule("Duplicate Name and Date", lambda df: df.duplicated(["Name", "Date"], keep="first"), ["Name", "Date"]),
+]
+
+
+def evaluate_rules(df: pd.DataFrame, rules: Optional[List[Rule]] = None) -> Tuple[Dict[str, int], pd.Series]:
+    """
+    Evaluates every rule over the whole frame and counts the violations per coin and rule. Each rule
+    is one vectorised mask; the masks are stacked into one boolean frame and aggregated per coin with a
+    single groupby, so the cost does not grow with the number of coins.
+
+    Args:
+        df (pd.DataFrame): The rows to check, with a Name column.
+        rules (List[Rule], optional): The rules. Defaults to `DATA_QUALITY_RULES`.
+
+    Returns:
+        Tuple[Dict[str, int], pd.Series]: The violation count per "<coin>_<rule>", in coin then rule
+            order, and a mask of the rows that break no rule.
+    """
+    rules = [rule for rule in (rules if rules is not None else DATA_QUALITY_RULES) if rule.applies_to(df)]
+    masks = pd.DataFrame({rule.name: rule.violations(df) for rule in rules}, index=df.index)
+    valid = ~masks.any(axis=1)
+
+    counts = masks.groupby(df["Name"], sort=True, observed=True).sum().stack()
+    violations = {f"{coin_name}_{rule_name}": int(count) for (coin_name, rule_name), count in counts.items()}
+    return violations, valid
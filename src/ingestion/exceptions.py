@@ -18,3 +18,25 @@ class InvalidDatasetName(Exception):
             message (str): Explanation of the error.
         """
         super().__init__(message)
+
+
+class StoreWriteError(Exception):
+    """
+    Exception raised when ingested rows could not be written to the store.
+
+    Attributes:
+        message (str): Explanation of the error.
+
+    Methods:
+        __init__(self, message: str) -> None:
+            Initializes the exception with a message.
+    """
+
+    def __init__(self, message: str) -> None:
+        """
+        Initialize the StoreWriteError exception.
+
+        Parameters:
+            message (str): Explanation of the error.
+        """
+        super().__init__(message)
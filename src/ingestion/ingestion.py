@@ -1,8 +1,277 @@
-import kaggle
 import argparse
+import json
+import os
+import threading
+import zipfile
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from .exceptions import StoreWriteError
 from .validation import validate_dataset_name
+from src.cleaning.dedup import DEDUP_INDEX_FILE, KeyIndex, deduplicate, export_conflicts, index_rows
+from src.cleaning.load import push_to_sqlite
+from src.cleaning.main import clean_data
+from src.cleaning.manifest import file_hash
+from src.cleaning.read import read_csv_archive
 
-def load_kaggle_data(dataset_name: str, unzip: bool = True, path: str = "./.data") -> None:
+MANIFEST_FILE = ".ingestion_manifest.json"
+
+
+class KaggleSource:
+    """
+    This class is the narrow view of the Kaggle API that ingestion needs: the remote version of a
+    dataset and a download of its zip archive. Tests pass a local stand-in with the same two methods.
+
+    Args:
+        api (Any, optional): An authenticated `kaggle.api`. Defaults to importing `kaggle`, which
+            authenticates on import, the first time it is needed.
+    """
+
+    def __init__(self, api: Any = None) -> None:
+        """
+        The constructor for the KaggleSource.
+        """
+        self._api = api
+
+    @property
+    def api(self) -> Any:
+        """
+        The Kaggle API client.
+        """
+        if self._api is None:
+            import kaggle
+            self._api = kaggle.api
+        return self._api
+
+    def remote_version(self, dataset_name: str) -> Optional[str]:
+        """
+        Returns when the dataset was last updated on Kaggle, or None if it is not listed.
+
+        Args:
+            dataset_name (str): The dataset, as '[owner]/[dataset]'.
+
+        Returns:
+            Optional[str]: The remote version.
+        """
+        owner, slug = dataset_name.split("/")
+        for dataset in self.api.dataset_list(user=owner, search=slug):
+            if str(dataset.ref) == dataset_name:
+                return str(dataset.lastUpdated)
+        return None
+
+    def download(self, dataset_name: str, path: str) -> str:
+        """
+        Downloads the dataset's zip archive without extracting it.
+
+        Args:
+            dataset_name (str): The dataset, as '[owner]/[dataset]'.
+            path (str): The directory to download to.
+
+        Returns:
+            str: The path of the archive.
+        """
+        self.api.dataset_download_files(dataset=dataset_name, path=path, unzip=False, force=True, quiet=True)
+        return os.path.join(path, f"{dataset_name.split('/')[1]}.zip")
+
+
+class IngestionManifest:
+    """
+    This class records, per dataset, the remote version and SHA-256 of the downloaded archive and the
+    CRC-32 and size of every member already written to the store. It is saved after every member,
+    so an interrupted run resumes with the members that are still pending. Updates are thread-safe.
+
+    Args:
+        path (str): The directory the manifest is stored in.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        The constructor for the IngestionManifest. It loads the stored manifest, if any.
+        """
+        self.manifest_path = os.path.join(path, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self.datasets: Dict[str, Dict] = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.datasets = json.load(f)["datasets"]
+
+    def get(self, dataset_name: str) -> Dict:
+        """
+        Returns a copy of the dataset's entry, empty for a dataset never ingested.
+        """
+        with self._lock:
+            entry = self.datasets.get(dataset_name, {})
+            return {**entry, "members": dict(entry.get("members", {}))}
+
+    def update(self, dataset_name: str, **fields: Any) -> None:
+        """
+        Sets fields of the dataset's entry and saves the manifest.
+        """
+        with self._lock:
+            self.datasets.setdefault(dataset_name, {"members": {}}).update(fields)
+            self._save()
+
+    def mark_member(self, dataset_name: str, member: str, fingerprint: Optional[Dict]) -> None:
+        """
+        Records a member as written to the store, or forgets it when `fingerprint` is None, and saves the manifest.
+        """
+        with self._lock:
+            members = self.datasets.setdefault(dataset_name, {"members": {}})["members"]
+            if fingerprint is None:
+                members.pop(member, None)
+            else:
+                members[member] = fingerprint
+            self._save()
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        with open(f"{self.manifest_path}.tmp", "w") as f:
+            json.dump({"version": 1, "datasets": self.datasets}, f, indent=2, sort_keys=True)
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
+
+
+def sqlite_sink(db_name: str = "./test_db.db", table_name: str = "CoinsTable", index: Optional[KeyIndex] = None,
+                conflicts_file: str = "./.data/Conflicting Duplicates.csv") -> Callable[[pd.DataFrame, str, str], None]:
+    """
+    Returns a sink that cleans each ingested coin file and upserts it into the SQLite store. Every
+    member of the Kaggle dataset holds one coin, so members are cleaned on their own, like
+    `run_incremental_cleaning` does. Writes are serialised because SQLite takes one writer at a time.
+
+    With a `KeyIndex`, raw rows are first checked against the (Name, Date) keys loaded before: only
+    rows with new keys are written, and rows that repeat a key with different values are appended to
+    `conflicts_file` instead of overwriting the stored row. Only the keys of rows actually written are
+    added to the index, and only once the write succeeded, so outliers and rows of a failed write are
+    checked again on the next run.
+    """
+    lock = threading.Lock()
+
+    def write(df: pd.DataFrame, dataset_name: str, member: str) -> None:
+        if index is not None:
+            with lock:
+                # Keys are only indexed once their rows are stored, see below
+                new_rows, conflicts, dedup_counts = deduplicate(df=df, index=index, update_index=False)
+            print(f"'{member}': {dedup_counts['New keys']} new, {dedup_counts['Exact duplicates']} already loaded, "
+                  f"{dedup_counts['Conflicting duplicates']} conflicting row(s)")
+        # The whole file is cleaned so the outlier fences see every row of the coin
+        cleaned, _ = clean_data(df=df, keep_index=True)
+        if index is not None:
+            # Matched by row label, so only the first copy of a key repeated in the file is kept
+            cleaned = cleaned[cleaned.index.isin(new_rows.index)]
+        with lock:
+            counts = push_to_sqlite(df=cleaned, table_name=table_name, db_name=db_name, mode="upsert") if len(cleaned) else {}
+            if counts is not None and index is not None:
+                export_conflicts(conflicts=conflicts, file_name=conflicts_file)
+                index_rows(df=new_rows.loc[cleaned.index], index=index)
+                index.save()
+        if counts is None:
+            raise StoreWriteError(f"Could not write '{member}' of '{dataset_name}' to table '{table_name}' in '{db_name}'.")
+
+    return write
+
+
+def ingest_kaggle_dataset(dataset_name: str, sink: Callable[[pd.DataFrame, str, str], None], path: str = "./.data",
+                          source: Optional[KaggleSource] = None, manifest: Optional[IngestionManifest] = None,
+                          force: bool = False) -> Dict:
+    """
+    Brings one Kaggle dataset's rows into the store, doing only the work its changes require:
+
+    - the archive is not downloaded when the remote version is unchanged and the archive on disk still
+      has the recorded SHA-256, or when every member was already ingested at that version;
+    - members are streamed from the zip archive into `sink` without extracting CSV files, and only
+      members whose CRC-32 or size changed, or that were not ingested yet, are read.
+
+    Args:
+        dataset_name (str): The dataset, as '[owner]/[dataset]'.
+        sink (Callable[[pd.DataFrame, str, str], None]): Receives each member's rows, the dataset name
+            and the member name, e.g. `sqlite_sink()`. A member is recorded once the sink returns.
+        path (str, optional): The directory archives and the manifest are kept in. Defaults to "./.data".
+        source (KaggleSource, optional): The Kaggle API. Defaults to `KaggleSource()`.
+        manifest (IngestionManifest, optional): The manifest. Defaults to the one stored in `path`.
+        force (bool, optional): Download and ingest every member regardless of the manifest. Defaults to False.
+
+    Returns:
+        Dict: The remote version, whether the archive was downloaded, and the ingested, unchanged and removed members.
+    """
+    validate_dataset_name(dataset_name=dataset_name)
+    source = source or KaggleSource()
+    manifest = manifest or IngestionManifest(path=path)
+    entry = manifest.get(dataset_name)
+    version = source.remote_version(dataset_name)
+    same_version = not force and version is not None and version == entry.get("version")
+    summary = {"dataset": dataset_name, "version": version, "downloaded": False, "ingested": [], "unchanged": 0, "removed": []}
+
+    archive = entry.get("archive")
+    if same_version and entry.get("complete"):
+        summary["unchanged"] = len(entry["members"])
+        return summary
+    if not (same_version and archive and os.path.exists(archive) and file_hash(archive) == entry.get("sha256")):
+        os.makedirs(path, exist_ok=True)
+        archive = source.download(dataset_name, path)
+        summary["downloaded"] = True
+        manifest.update(dataset_name, version=version, archive=archive, sha256=file_hash(archive), complete=False)
+
+    with zipfile.ZipFile(archive) as zf:
+        fingerprints = {info.filename: {"crc32": info.CRC, "size": info.file_size}
+                        for info in zf.infolist() if info.filename.endswith(".csv")}
+    pending = [member for member, fingerprint in fingerprints.items()
+               if force or entry["members"].get(member) != fingerprint]
+    summary["unchanged"] = len(fingerprints) - len(pending)
+
+    for member, df in read_csv_archive(zip_path=archive, members=pending):
+        sink(df, dataset_name, member)
+        manifest.mark_member(dataset_name, member, fingerprints[member])
+        summary["ingested"].append(member)
+
+    # Rows of members that disappeared stay in the store, they are only reported
+    for member in entry["members"]:
+        if member not in fingerprints:
+            manifest.mark_member(dataset_name, member, None)
+            summary["removed"].append(member)
+    manifest.update(dataset_name, complete=True)
+    return summary
+
+
+def ingest_kaggle_datasets(dataset_names: List[str], sink: Optional[Callable[[pd.DataFrame, str, str], None]] = None,
+                           path: str = "./.data", source: Optional[KaggleSource] = None, max_workers: int = 4,
+                           force: bool = False) -> List[Dict]:
+    """
+    Ingests several Kaggle datasets concurrently with `ingest_kaggle_dataset`, sharing one manifest.
+    A dataset that fails is reported and left resumable; the others carry on.
+
+    Args:
+        dataset_names (List[str]): The datasets, as '[owner]/[dataset]'.
+        sink (Callable[[pd.DataFrame, str, str], None], optional): Defaults to `sqlite_sink()`.
+        path (str, optional): The directory archives and the manifest are kept in. Defaults to "./.data".
+        source (KaggleSource, optional): The Kaggle API. Defaults to `KaggleSource()`.
+        max_workers (int, optional): Datasets ingested at the same time. Defaults to 4.
+        force (bool, optional): Ignore the manifest. Defaults to False.
+
+    Returns:
+        List[Dict]: One summary per dataset, in `dataset_names` order, with an "error" for failed datasets.
+    """
+    sink = sink or sqlite_sink()
+    source = source or KaggleSource()
+    manifest = IngestionManifest(path=path)
+
+    def ingest(dataset_name: str) -> Dict:
+        try:
+            summary = ingest_kaggle_dataset(dataset_name=dataset_name, sink=sink, path=path, source=source,
+                                            manifest=manifest, force=force)
+            print(f"'{dataset_name}': {'downloaded' if summary['downloaded'] else 'no download'}, "
+                  f"{len(summary['ingested'])} member(s) ingested, {summary['unchanged']} unchanged, {len(summary['removed'])} removed")
+            return summary
+        except Exception as e:
+            main_error = "IngestionError"
+            sub_error = type(e).__name__  # Get the name of the error
+            message = str(e)
+            print(f"Main Error: {main_error}\nSub Error: {sub_error}\nMessage: {message}")
+            return {"dataset": dataset_name, "error": message}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(dataset_names)))) as pool:
+        return list(pool.map(ingest, dataset_names))
+
+
+def load_kaggle_data(dataset_name: str, unzip: bool = True, path: str = "./.data", source: Optional[KaggleSource] = None) -> None:
     """
     Downloads a Kaggle dataset and optionally unzips it.
 
@@ -10,13 +279,15 @@ def load_kaggle_data(dataset_name: str, unzip: bool = True, path: str = "./.data
         dataset_name (str): The name of the Kaggle dataset to download.
         unzip (bool, optional): Whether to unzip the downloaded files. Defaults to True.
         path (str, optional): The path to download the dataset to. Defaults to "./.data".
+        source (KaggleSource, optional): The Kaggle API. Defaults to `KaggleSource()`.
 
     Raises:
         Exception: Prints the main error, sub error, and error message if an exception occurs during dataset download.
     """
     try:
         validate_dataset_name(dataset_name=dataset_name)
-        kaggle.api.dataset_download_files(dataset=dataset_name, path=path, unzip=unzip)
+        source = source or KaggleSource()
+        source.api.dataset_download_files(dataset=dataset_name, path=path, unzip=unzip)
     except Exception as e:
         main_error = "IngestionError"
         sub_error = type(e).__name__  # Get the name of the error
@@ -25,31 +296,48 @@ def load_kaggle_data(dataset_name: str, unzip: bool = True, path: str = "./.data
 
 def main():
     """
-    Parses command line arguments and downloads the specified Kaggle dataset.
+    Parses command line arguments and ingests the specified Kaggle datasets into the store, or
+    downloads them as files with --raw.
 
     Command Line Arguments:
-        dataset_name (str): The name of the dataset to download.
-        --unzip: Unzips the dataset files after download.
-        --no-unzip: Does not unzip the dataset files after download.
+        dataset_names (str): The names of the datasets to ingest.
+        --raw: Only download the dataset files, as before.
+        --unzip: Unzips the dataset files after a raw download.
+        --no-unzip: Does not unzip the dataset files after a raw download.
         --path (str): The path to download the dataset to. Default is "./.data".
+        --db (str): The SQLite database to ingest into. Default is "./test_db.db".
+        --workers (int): Datasets ingested at the same time. Default is 4.
+        --force: Download and ingest everything, even if unchanged.
+        --dedup-index (str): The index of the (Name, Date) keys already loaded. Default is "./.data/.dedup_index.npz".
 
     Usage:
         python -m src.ingestion.ingestion --help
         python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory
-        python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --unzip
-        python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --no-unzip
-        python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --no-unzip --path ./
-    """
-    parser = argparse.ArgumentParser(description='Download a Kaggle dataset.')
-    parser.add_argument('dataset_name', type=str, help='The name of the dataset to download.')
-    parser.add_argument('--unzip', dest='unzip', action='store_true', help='Unzip the dataset files after download.')
-    parser.add_argument('--no-unzip', dest='unzip', action='store_false', help='Do not unzip the dataset files after download.')
+        python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --force
+        python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --raw --unzip
+        python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --raw --no-unzip --path ./
+    """
+    parser = argparse.ArgumentParser(description='Ingest Kaggle datasets.')
+    parser.add_argument('dataset_names', type=str, nargs='+', help='The names of the datasets to ingest.')
+    parser.add_argument('--raw', action='store_true', help='Only download the dataset files.')
+    parser.add_argument('--unzip', dest='unzip', action='store_true', help='Unzip the dataset files after a raw download.')
+    parser.add_argument('--no-unzip', dest='unzip', action='store_false', help='Do not unzip the dataset files after a raw download.')
     parser.set_defaults(unzip=True)
     parser.add_argument('--path', type=str, default='./.data', help='The path to download the dataset to. Default is set to "./.data"')
-    
+    parser.add_argument('--db', type=str, default='./test_db.db', help='The SQLite database to ingest into. Default is "./test_db.db"')
+    parser.add_argument('--workers', type=int, default=4, help='Datasets ingested at the same time. Default is 4.')
+    parser.add_argument('--force', action='store_true', help='Download and ingest everything, even if unchanged.')
+    parser.add_argument('--dedup-index', type=str, default=DEDUP_INDEX_FILE, help=f'The index of the keys already loaded. Default is "{DEDUP_INDEX_FILE}"')
+
     args = parser.parse_args()
-    
-    load_kaggle_data(dataset_name=args.dataset_name, unzip=args.unzip, path=args.path)
+
+    if args.raw:
+        for dataset_name in args.dataset_names:
+            load_kaggle_data(dataset_name=dataset_name, unzip=args.unzip, path=args.path)
+    else:
+        sink = sqlite_sink(db_name=args.db, index=KeyIndex(path=args.dedup_index))
+        ingest_kaggle_datasets(dataset_names=args.dataset_names, sink=sink, path=args.path,
+                               max_workers=args.workers, force=args.force)
 
 if __name__ == "__main__":
     main()
@@ -57,6 +345,6 @@ if __name__ == "__main__":
     # Usage
     # python -m src.ingestion.ingestion --help
     # python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory
-    # python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --unzip
-    # python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --no-unzip
-    # python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --no-unzip --path ./
+    # python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --force
+    # python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --raw --unzip
+    # python -m src.ingestion.ingestion sudalairajkumar/cryptocurrencypricehistory --raw --no-unzip --path ./
@@ -1,8 +1,10 @@
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from typing import List, Any
 from datetime import datetime
 from .utility import update_fig_layout
+from src.analytics.alignment import align_coins
 
 def xy_plot(df: pd.DataFrame, x_column_name: str, y_column_name: str, graph_type: str) -> go.Figure:
     """
@@ -155,7 +157,7 @@ def plot_rsi(df: pd.DataFrame, x_column_name: str, y_column_name: str):
     Returns:
         go.Figure: A Plotly Figure object.
     """
-    df['RSI'] = df.groupby('Name')["Close"].transform(lambda x: computeRSI(x, RSI_TIME_WINDOW)) #changed [y_column_name] to  Close
+    df['RSI'] = df.groupby('Name', observed=True)["Close"].transform(lambda x: computeRSI(x, RSI_TIME_WINDOW)) #changed [y_column_name] to  Close
     fig = go.Figure()
     for coin in df["Name"].unique():
         coin_df = df[df["Name"] == coin]
@@ -181,14 +183,15 @@ def compute_and_plot_correlation_matrix(df: pd.DataFrame, price_column='Close'):
     Returns:
         go.Figure: A Plotly Figure object representing the correlation matrix heatmap.
     """
-    df['Date'] = pd.to_datetime(df['Date'])  # Ensure 'Date' column is datetime
-    df.sort_values(['Name', 'Date'], inplace=True)  # Sort by 'Name' and 'Date' for correct calculations
+    # Align every coin on one daily calendar, carrying the last price over missing days
+    panel = align_coins(df, columns=[price_column], gap_policy='ffill')
+    prices = panel[price_column]
 
-    # Compute percentage change
-    df['PriceChangePct'] = df.groupby('Name')[price_column].pct_change() * 100
-
-    # Pivot to get percentage change as columns for each coin
-    correlation_data = df.pivot(index='Date', columns='Name', values='PriceChangePct')
+    # Compute percentage change since each coin's previous observation, kept on observed days only
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = (prices[:, 1:] / prices[:, :-1] - 1) * 100
+    changes = np.where(panel.observed[:, 1:], changes, np.nan)
+    correlation_data = pd.DataFrame(changes.T, index=panel.dates[1:], columns=pd.Index(panel.coins, name='Name'))
 
     # Compute correlation matrix
     correlation_matrix = correlation_data.corr()
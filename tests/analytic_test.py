@@ -11,8 +11,12 @@ from src.analytics.analytical_functions import (
     daily_price_volatility,
     moving_average,
     find_peaks_and_valleys,
-    correlation_analysis
+    correlation_analysis,
+    daily_metrics
 )
+from src.analytics.data_reporting import coin_proportion, records_per_coin, date_range_coins
+from src.analytics.alignment import align_coins
+from src.cleaning.compact import compact_frame
 
 @pytest.fixture
 def sample_data():
@@ -73,6 +77,92 @@ def test_correlation_analysis(sample_data):
     assert isinstance(correlation_matrix, pd.DataFrame)
     assert correlation_matrix.shape == (5, 5)  # Since we have 5 numeric columns
 
+
+
+def test_analytics_accept_compact_frame(sample_data):
+    compact = compact_frame(df=sample_data.astype({'Close': 'float64'}), downcast_floats=True)
+    # A filtered frame keeps its unused categories
+    compact = compact[compact['Name'] == 'Aave']
+    assert compact['Name'].cat.categories.tolist() == ['Aave', 'Binance Coin']
+
+    assert daily_price_change(compact.copy())['DailyPriceChangeClosing'].tolist()[1:] == [5.0, 5.0]
+    assert moving_average(compact.copy(), window=2)['MovingAverage_2'].tolist() == [105.0, 107.5, 112.5]
+    assert coin_proportion(compact).to_dict() == {'Aave': 100.0}
+    assert records_per_coin(compact).to_dict() == {'Aave': 3}
+    assert date_range_coins(compact).index.tolist() == ['Aave']
+
+
+@pytest.fixture
+def gappy_data():
+    # Aave misses 2023-01-03, Binance Coin starts a day later and its last row is a mid-day duplicate
+    return pd.DataFrame({
+        'Name': ['Aave', 'Aave', 'Aave', 'Binance Coin', 'Binance Coin', 'Binance Coin'],
+        'Date': ['2023-01-01', '2023-01-02', '2023-01-04', '2023-01-02', '2023-01-03', '2023-01-03 12:00'],
+        'Close': [10.0, 20.0, 40.0, 1.0, 2.0, 3.0],
+    })
+
+def test_align_coins_gap_policies(gappy_data):
+    panel = align_coins(gappy_data, columns=['Close'])
+    assert panel.coins.tolist() == ['Aave', 'Binance Coin']
+    assert panel.dates.equals(pd.date_range('2023-01-01', '2023-01-04', freq='D'))
+    assert panel.observed.tolist() == [[True, True, False, True], [False, True, True, False]]
+    # The later row of a duplicated day wins
+    assert np.array_equal(panel['Close'], [[10, 20, np.nan, 40], [np.nan, 1, 3, np.nan]], equal_nan=True)
+
+    ffilled = align_coins(gappy_data, columns=['Close'], gap_policy='ffill')['Close']
+    assert np.array_equal(ffilled, [[10, 20, 20, 40], [np.nan, 1, 3, 3]], equal_nan=True)
+    # Interpolation only fills between observations, it never extrapolates
+    interpolated = align_coins(gappy_data, columns=['Close'], gap_policy='interpolate')['Close']
+    assert np.array_equal(interpolated, [[10, 20, 30, 40], [np.nan, 1, 3, np.nan]], equal_nan=True)
+
+    with pytest.raises(ValueError):
+        align_coins(gappy_data, gap_policy='bfill')
+
+def test_align_coins_matches_asfreq(gappy_data):
+    panel = align_coins(gappy_data, columns=['Close'], start='2022-12-31', dtype=np.float32)
+    assert panel.shape == (2, 5)
+    assert panel['Close'].dtype == np.float32
+
+    expected = gappy_data[gappy_data['Name'] == 'Aave'].assign(Date=lambda df: pd.to_datetime(df['Date']))
+    expected = expected.set_index('Date')[['Close']].asfreq('D').astype(np.float32)
+    pd.testing.assert_frame_equal(panel.coin_frame('Aave'), expected)
+    with pytest.raises(KeyError):
+        panel.coin_frame('Bitcoin')
+
+def test_align_coins_drops_rows_without_name(gappy_data, capsys):
+    gappy_data.loc[[2, 5], 'Name'] = None
+    for df in (gappy_data, gappy_data.astype({'Name': 'category'})):
+        panel = align_coins(df, columns=['Close'])
+        assert panel.coins.tolist() == ['Aave', 'Binance Coin']
+        assert np.array_equal(panel['Close'], [[10, 20, np.nan, np.nan], [np.nan, 1, 2, np.nan]], equal_nan=True)
+        assert "Dropped 2 row(s) without a coin name" in capsys.readouterr().out
+
+def test_correlation_analysis_aligns_calendar(sample_data):
+    # Rows out of order and a missing day line up on the calendar, as with a pivot
+    shuffled = sample_data.drop(index=4).sample(frac=1, random_state=0)
+    expected = sample_data.drop(index=4).pivot(index='Date', columns='Name', values='Close').corr()
+    pd.testing.assert_frame_equal(correlation_analysis(shuffled), expected, check_names=False)
+
+def test_daily_metrics_single_pass(sample_data):
+    shuffled = sample_data.sample(frac=1, random_state=0)
+    before = shuffled.copy()
+    df = daily_metrics(shuffled)
+    # The input is neither sorted nor given new columns
+    pd.testing.assert_frame_equal(shuffled, before)
+
+    assert df.index.tolist() == [0, 1, 2, 3, 4, 5]
+    assert df['DailyPriceChangeClosing'].tolist()[1:3] == [5.0, 5.0]
+    assert np.isnan(df['DailyPriceChangeClosing'].iloc[3])
+    assert df['DailyPriceRange'].tolist() == [20, 20, 20, 40, 35, 30]
+    assert df['DailyPriceVolatility'].tolist() == [5, 5, 5, 10, 5, 5]
+    for function, column in [(daily_price_change, 'DailyPriceChangeClosing'), (daily_price_range_volatility, 'DailyPriceRangeVolatility')]:
+        pd.testing.assert_series_equal(function(shuffled)[column], df[column])
+
+    subset = daily_metrics(sample_data, metrics=['range'])
+    assert subset.columns.tolist() == sample_data.columns.tolist() + ['DailyPriceRange']
+    with pytest.raises(ValueError):
+        daily_metrics(sample_data, metrics=['returns'])
+
+
 if __name__ == "__main__":
     pytest.main()
-
@@ -0,0 +1,442 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cleaning.read import concatenate_csv_files, get_data_files, read_coins_dataset
+from src.cleaning import manifest
+from src.cleaning.main import clean_data, run_data_cleaning
+from src.cleaning.clean import drop_duplicates, remove_outliers
+from src.cleaning.dedup import KeyIndex, deduplicate
+from src.cleaning.utility import count_outliers, detect_outliers
+from src.cleaning.validation import DATA_QUALITY_RULES, Rule, evaluate_rules
+from src.cleaning.sketches import QuantileSketch
+from src.cleaning.streaming import profile_csv_files, stream_clean_csv_files
+from src.cleaning.compact import FLOAT32_RTOL, compact_frame, fits_float32, memory_per_column
+from src.cleaning.load import SQLiteChunkWriter, push_to_sqlite, write_to_csv, write_to_dataset
+
+
+@pytest.fixture
+def coin_files(tmp_path):
+    coins = {
+        'Aave': ['2021-01-01 23:59:59', '2021-01-02 23:59:59', '2021-01-03 23:59:59'],
+        'Bitcoin': ['2021-01-01 23:59:59', '2021-01-02 23:59:59'],
+        'Cardano': ['2019-05-01 23:59:59', '2019-05-02 23:59:59', '2019-05-03 23:59:59', '2019-05-04 23:59:59'],
+    }
+    for i, (name, dates) in enumerate(coins.items()):
+        n = len(dates)
+        pd.DataFrame({
+            'SNo': range(1, n + 1),
+            'Name': [name] * n,
+            'Symbol': [name[:3].upper()] * n,
+            'Date': dates,
+            'High': [110.0 + i] * n,
+            'Low': [90.0 + i] * n,
+            'Open': [100.0 + i] * n,
+            'Close': [105.0 + i] * n,
+            'Volume': [1000.0 * (i + 1)] * n,
+            'Marketcap': [1e6 * (i + 1)] * n,
+        }).to_csv(tmp_path / f"coin_{name}.csv", index=False)
+    return sorted(get_data_files(dir_path=str(tmp_path)))
+
+
+def test_concatenate_csv_files_types_columns(coin_files):
+    assert concatenate_csv_files(files=coin_files)['Date'].iloc[0] == '2021-01-01 23:59:59'
+    df = concatenate_csv_files(files=coin_files, parse_dates=True)
+    assert len(df) == 9
+    assert df['Name'].tolist()[:4] == ['Aave', 'Aave', 'Aave', 'Bitcoin']
+    assert pd.api.types.is_datetime64_any_dtype(df['Date'])
+    assert df['Date'].iloc[0] == pd.Timestamp('2021-01-01 23:59:59')
+    assert df['Close'].dtype == 'float64'
+
+
+def test_concatenate_csv_files_rejects_unparseable_dates(coin_files, tmp_path):
+    path = tmp_path / "coin_Other.csv"
+    pd.read_csv(coin_files[0]).assign(Date=['2021-01-01', '2021-01-02T12:00:00', 'not a date']).to_csv(path, index=False)
+    with pytest.raises(ValueError, match="not a date"):
+        concatenate_csv_files(files=[str(path)], parse_dates=True)
+    path.write_text(path.read_text().replace('not a date', '2021-01-03 23:59:59'))
+    dates = concatenate_csv_files(files=[str(path)], parse_dates=True)['Date']
+    assert dates.tolist() == [pd.Timestamp('2021-01-01'), pd.Timestamp('2021-01-02 12:00'), pd.Timestamp('2021-01-03 23:59:59')]
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_concatenate_csv_files_parallel_matches_sequential(coin_files, use_processes):
+    expected = concatenate_csv_files(files=coin_files)
+    df = concatenate_csv_files(files=coin_files, max_workers=3, use_processes=use_processes)
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_concatenate_csv_files_pyarrow_engine(coin_files):
+    # Falls back to the C engine when pyarrow is not installed
+    df = concatenate_csv_files(files=coin_files, engine="pyarrow", parse_dates=True)
+    pd.testing.assert_frame_equal(df, concatenate_csv_files(files=coin_files, parse_dates=True), check_dtype=False)
+
+
+def test_incremental_cleaning_only_processes_changed_files(coin_files, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".data").mkdir()
+    data_dir = str(tmp_path)
+
+    full = run_data_cleaning(directory_path=data_dir)
+    first = run_data_cleaning(directory_path=data_dir, incremental=True)
+    pd.testing.assert_frame_equal(first, full)
+    assert "Cleaned 3 new or modified file(s)" in capsys.readouterr().out
+
+    # Touching a file without changing it does not count as a change
+    os.utime(coin_files[0])
+    pd.testing.assert_frame_equal(run_data_cleaning(directory_path=data_dir, incremental=True), full)
+    assert "Cleaned 0 new or modified file(s), reused 3" in capsys.readouterr().out
+
+    changed = pd.read_csv(coin_files[1])
+    changed.loc[0, 'Close'] = 1.0
+    changed.to_csv(coin_files[1], index=False)
+    os.remove(coin_files[2])
+    df = run_data_cleaning(directory_path=data_dir, incremental=True)
+    assert "Cleaned 1 new or modified file(s), reused 1 unchanged and dropped 1" in capsys.readouterr().out
+    assert df['Name'].unique().tolist() == ['Aave', 'Bitcoin']
+    assert df.loc[df['Name'] == 'Bitcoin', 'Close'].tolist() == [1.0, 106.0]
+    report = pd.read_csv(tmp_path / ".data" / "Data Report.csv")
+    assert not report['Field Description'].str.startswith('Aave').any()
+
+
+def test_incremental_cleaning_reprocesses_files_after_cleaning_version_change(coin_files, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".data").mkdir()
+    data_dir = str(tmp_path)
+
+    full = run_data_cleaning(directory_path=data_dir, incremental=True)
+    run_data_cleaning(directory_path=data_dir, incremental=True)
+    assert "Cleaned 0 new or modified file(s), reused 3" in capsys.readouterr().out
+
+    monkeypatch.setattr(manifest, "CLEANING_VERSION", manifest.CLEANING_VERSION + 1)
+    pd.testing.assert_frame_equal(run_data_cleaning(directory_path=data_dir, incremental=True), full)
+    assert "Cleaned 3 new or modified file(s), reused 0" in capsys.readouterr().out
+    pd.testing.assert_frame_equal(run_data_cleaning(directory_path=data_dir, incremental=True), full)
+    assert "Cleaned 0 new or modified file(s), reused 3" in capsys.readouterr().out
+
+
+@pytest.fixture
+def noisy_coins():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'Name': np.repeat(['Cardano', 'Aave', 'Bitcoin'], 50),
+        'High': rng.normal(100, 10, 150),
+        'Low': rng.normal(90, 10, 150),
+        'Open': rng.normal(95, 10, 150),
+        'Close': rng.normal(95, 10, 150),
+        'Volume': rng.lognormal(10, 1, 150),
+        'Marketcap': rng.lognormal(15, 1, 150),
+    })
+    df.loc[[3, 60, 120], 'Close'] = [1e6, -1e6, np.nan]
+    return df
+
+
+def test_count_outliers_matches_per_coin_loop(noisy_coins):
+    expected = {}
+    for coin_name, temp_df in noisy_coins.groupby("Name"):
+        for col in ["High", "Low", "Open", "Close", "Volume", "Marketcap"]:
+            Q1, Q3 = temp_df[col].quantile(0.25), temp_df[col].quantile(0.75)
+            IQR = Q3 - Q1
+            expected[f"{coin_name}_{col}"] = ((temp_df[col] < Q1 - 1.5 * IQR) | (temp_df[col] > Q3 + 1.5 * IQR)).sum()
+    outliers = count_outliers(df=noisy_coins)
+    assert outliers == expected
+    assert list(outliers)[:2] == ['Aave_High', 'Aave_Low']
+
+
+def test_remove_outliers_uses_one_mask(noisy_coins):
+    outliers, inside = detect_outliers(df=noisy_coins)
+    df = remove_outliers(df=noisy_coins)
+    assert len(df) == inside.sum()
+    assert df['Name'].unique().tolist() == ['Aave', 'Bitcoin', 'Cardano']
+    # The injected outliers and the missing value are gone
+    assert df['Close'].between(-1e5, 1e5).all()
+    pd.testing.assert_frame_equal(remove_outliers(df=noisy_coins, mask=inside), df)
+
+
+def test_quantile_sketch_exact_until_compacted():
+    values = np.random.default_rng(1).normal(size=200)
+    sketch = QuantileSketch(k=256)
+    sketch.update(values[:120])
+    sketch.update(np.append(values[120:], np.nan))
+    assert sketch.exact
+    assert sketch.count == 200
+    np.testing.assert_allclose(sketch.quantiles([0.25, 0.5, 0.75]), pd.Series(values).quantile([0.25, 0.5, 0.75]))
+
+
+def test_quantile_sketch_merge_approximates_ranks():
+    values = np.random.default_rng(2).lognormal(size=200_000)
+    sketch = QuantileSketch(k=256, seed=0)
+    for part in np.array_split(values[:100_000], 10):
+        sketch.update(part)
+    other = QuantileSketch(k=256, seed=1)
+    other.update(values[100_000:])
+    sketch.merge(other)
+
+    assert not sketch.exact
+    assert sketch.count == len(values)
+    assert sum(len(level) for level in sketch.levels) < 5_000
+    ranks = np.searchsorted(np.sort(values), sketch.quantiles([0.1, 0.25, 0.5, 0.75, 0.9])) / len(values)
+    np.testing.assert_allclose(ranks, [0.1, 0.25, 0.5, 0.75, 0.9], atol=0.02)
+
+
+def test_streaming_cleaning_matches_in_memory(coin_files, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".data").mkdir()
+    outlier_file = tmp_path / "coin_Aave.csv"
+    df = pd.read_csv(outlier_file)
+    df.loc[len(df)] = [4, 'Aave', 'AAV', '2021-01-04 23:59:59', 110.0, 90.0, 100.0, 1e6, 1000.0, None]
+    df.to_csv(outlier_file, index=False)
+
+    expected, _ = clean_data(df=concatenate_csv_files(files=coin_files))
+    run_data_cleaning(directory_path=str(tmp_path), chunksize=2, db_name=str(tmp_path / "coins.db"))
+
+    with sqlite3.connect(tmp_path / "coins.db") as conn:
+        stored = pd.read_sql('SELECT Name, Date, Close, Marketcap FROM CoinsTable ORDER BY Name, Date', conn)
+    assert len(stored) == len(expected) == 9
+    assert stored['Close'].tolist() == expected.sort_values(['Name', 'Date'])['Close'].tolist()
+    assert stored['Marketcap'].notna().all()
+    report = pd.read_csv(tmp_path / ".data" / "Data Report.csv")
+    assert report.set_index('Field Description').loc['Aave_Close', 'Count'] == 1
+
+
+def test_streaming_cleaning_parses_iso_dates_and_rejects_others(coin_files, tmp_path):
+    df = pd.read_csv(coin_files[0])
+    df.assign(Date=['2021-01-01', '2021-01-02T12:00:00', '2021-01-03 23:59:59']).to_csv(coin_files[0], index=False)
+    written = []
+    stream_clean_csv_files(files=coin_files[:1], write=written.append, chunksize=2)
+    assert pd.concat(written)['Date'].tolist() == [pd.Timestamp('2021-01-01'), pd.Timestamp('2021-01-02 12:00'),
+                                                  pd.Timestamp('2021-01-03 23:59:59')]
+
+    df.assign(Date=['2021-01-01', 'not a date', '2021-01-03']).to_csv(coin_files[0], index=False)
+    with pytest.raises(ValueError, match="not a date"):
+        stream_clean_csv_files(files=coin_files[:1], write=written.append, chunksize=2)
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 100])
+def test_streaming_cleaning_drops_rows_without_name_or_values_like_in_memory(coin_files, chunksize):
+    df = pd.read_csv(coin_files[2])
+    df.loc[1, 'Name'] = None
+    df.loc[2, 'Close'] = None
+    df.to_csv(coin_files[2], index=False)
+
+    expected, expected_report = clean_data(df=concatenate_csv_files(files=coin_files))
+    written = []
+    report = stream_clean_csv_files(files=coin_files, write=written.append, chunksize=chunksize)
+    streamed = pd.concat(written)
+    assert streamed['Name'].value_counts().to_dict() == expected['Name'].value_counts().to_dict() == {'Aave': 3, 'Bitcoin': 2, 'Cardano': 2}
+    assert streamed['Close'].notna().all()
+
+    categories = set(report['Category'])
+    assert {'Pre-cleaned rule violations', 'Post-cleaned rule violations'} <= categories
+    assert {'Pre-cleaned rule violations', 'Post-cleaned rule violations'} <= set(expected_report['Category'])
+
+
+def test_profile_merges_across_files(coin_files):
+    profile = profile_csv_files(files=coin_files[:1], chunksize=2)
+    profile.merge(profile_csv_files(files=coin_files[1:], chunksize=2))
+    full = profile_csv_files(files=coin_files, chunksize=100)
+    assert profile.rows == full.rows == 9
+    assert profile.nan_counts == full.nan_counts
+    pd.testing.assert_frame_equal(profile.fences().sort_index(), full.fences().sort_index())
+
+
+def test_compact_frame_types_columns_within_tolerance(coin_files):
+    df = concatenate_csv_files(files=coin_files, parse_dates=False)
+    compact = compact_frame(df=df, downcast_floats=True)
+
+    assert isinstance(compact['Name'].dtype, pd.CategoricalDtype)
+    assert isinstance(compact['Symbol'].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_datetime64_any_dtype(compact['Date'])
+    assert compact['Close'].dtype == np.float32
+    np.testing.assert_allclose(compact['Marketcap'], df['Marketcap'], rtol=FLOAT32_RTOL)
+    assert memory_per_column(compact).sum() < memory_per_column(df).sum()
+    pd.testing.assert_frame_equal(compact_frame(df=compact, downcast_floats=True), compact)
+
+
+def test_fits_float32_rejects_overflow_and_underflow():
+    assert fits_float32(pd.Series([1.1, np.nan, 1e30]))
+    assert not fits_float32(pd.Series([1.0, 1e39]))
+    assert not fits_float32(pd.Series([1e-50]))
+    compact = compact_frame(df=pd.DataFrame({'Volume': [1.0, 1e39], 'Close': [1.0, 2.0]}), downcast_floats=True)
+    assert compact['Volume'].dtype == np.float64
+    assert compact['Close'].dtype == np.float32
+
+
+def test_compact_cleaning_reports_memory_and_loads(coin_files, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".data").mkdir()
+    expected = run_data_cleaning(directory_path=str(tmp_path))
+    df = run_data_cleaning(directory_path=str(tmp_path), compact=True, downcast_floats=True)
+
+    pd.testing.assert_frame_equal(df, compact_frame(df=expected, downcast_floats=True))
+    report = pd.read_csv(tmp_path / ".data" / "Data Report.csv")
+    memory = report[report['Category'].str.startswith('Memory')].set_index(['Category', 'Field Description'])['Count']
+    assert memory[('Memory after compaction (bytes)', 'Total')] < memory[('Memory before compaction (bytes)', 'Total')]
+
+    push_to_sqlite(df=df, table_name="CoinsTable", db_name=str(tmp_path / "coins.db"))
+    with sqlite3.connect(tmp_path / "coins.db") as conn:
+        stored = pd.read_sql('SELECT Name, Date, Close FROM CoinsTable ORDER BY Name, Date', conn)
+    assert stored['Name'].tolist() == sorted(expected['Name'].tolist())
+    np.testing.assert_allclose(stored['Close'], expected.sort_values(['Name', 'Date'])['Close'], rtol=FLOAT32_RTOL)
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "feather"])
+def test_coins_dataset_round_trip_and_pushdown(coin_files, tmp_path, file_format):
+    pytest.importorskip("pyarrow")
+    df = concatenate_csv_files(files=coin_files, parse_dates=True)
+    dataset_dir = str(tmp_path / "coins")
+    assert write_to_dataset(df=df, dataset_dir=dataset_dir, file_format=file_format) == dataset_dir
+    assert sorted(os.listdir(dataset_dir)) == ['Name=Aave', 'Name=Bitcoin', 'Name=Cardano']
+
+    full = read_coins_dataset(dataset_dir=dataset_dir)
+    assert isinstance(full['Name'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(full.astype({'Name': object}), df, check_dtype=False)
+
+    selected = read_coins_dataset(dataset_dir=dataset_dir, coin_names=['Aave', 'Cardano'], columns=['Date', 'Close'],
+                                  start_date='2021-01-02', end_date='2021-12-31')
+    assert selected.columns.tolist() == ['Date', 'Close']
+    assert selected['Date'].tolist() == [pd.Timestamp('2021-01-02 23:59:59'), pd.Timestamp('2021-01-03 23:59:59')]
+    # The end day is included whatever the time of its rows
+    end_day = read_coins_dataset(dataset_dir=dataset_dir, coin_names=['Aave'], columns=['Date'], end_date='2021-01-02')
+    assert end_day['Date'].tolist() == [pd.Timestamp('2021-01-01 23:59:59'), pd.Timestamp('2021-01-02 23:59:59')]
+
+    # Rewriting replaces the coins that are gone
+    write_to_dataset(df=df[df['Name'] != 'Bitcoin'], dataset_dir=dataset_dir, file_format=file_format)
+    assert read_coins_dataset(dataset_dir=dataset_dir)['Name'].unique().tolist() == ['Aave', 'Cardano']
+
+
+def test_failed_dataset_rewrite_keeps_the_previous_dataset(coin_files, tmp_path):
+    pytest.importorskip("pyarrow")
+    df = concatenate_csv_files(files=coin_files, parse_dates=True)
+    dataset_dir = str(tmp_path / "coins")
+    write_to_dataset(df=df, dataset_dir=dataset_dir)
+
+    # Mixed numbers and text cannot be converted to one Arrow column
+    assert write_to_dataset(df=df.assign(Close=[1.0, 'a'] * 4 + [1.0]), dataset_dir=dataset_dir) is None
+    assert sorted(os.listdir(tmp_path / "coins")) == ['Name=Aave', 'Name=Bitcoin', 'Name=Cardano']
+    assert not os.path.exists(f"{dataset_dir}.tmp")
+    pd.testing.assert_frame_equal(read_coins_dataset(dataset_dir=dataset_dir).astype({'Name': object}), df, check_dtype=False)
+
+
+def test_read_coins_dataset_falls_back_to_csv(coin_files, tmp_path):
+    df = concatenate_csv_files(files=coin_files, parse_dates=True)
+    write_to_csv(df=df, file_name=str(tmp_path / "coins.csv"))
+    selected = read_coins_dataset(dataset_dir=str(tmp_path / "missing"), csv_path=str(tmp_path / "coins.csv"),
+                                  coin_names=['Bitcoin'], columns=['Close'])
+    assert selected['Close'].tolist() == [106.0, 106.0]
+    end_day = read_coins_dataset(dataset_dir=str(tmp_path / "missing"), csv_path=str(tmp_path / "coins.csv"),
+                                 coin_names=['Aave'], columns=['Date'], start_date='2021-01-02', end_date='2021-01-02')
+    assert end_day['Date'].tolist() == [pd.Timestamp('2021-01-02 23:59:59')]
+
+
+def test_evaluate_rules_counts_per_coin_and_rule():
+    df = pd.DataFrame({
+        'Name': ['Aave', 'Aave', 'Aave', 'Bitcoin', 'Bitcoin'],
+        'Date': ['2021-01-01', '2021-01-02', '2021-01-02', '2021-01-01', '2021-01-02'],
+        'High': [110.0, 90.0, 110.0, 110.0, np.nan],
+        'Low': [90.0, 100.0, 90.0, 90.0, 90.0],
+        'Open': [100.0, 95.0, 100.0, 100.0, 100.0],
+        'Close': [105.0, 95.0, 120.0, 105.0, 105.0],
+        'Volume': [1.0, 1.0, 1.0, -5.0, 1.0],
+    })
+    violations, valid = evaluate_rules(df=df)
+
+    assert violations['Aave_High below Low'] == 1
+    assert violations['Aave_Close outside Low-High'] == 2
+    assert violations['Aave_Duplicate Name and Date'] == 1
+    assert violations['Bitcoin_Negative Volume'] == 1
+    # NaN comparisons are not violations and rules on missing columns are skipped
+    assert violations['Bitcoin_Close outside Low-High'] == 0
+    assert not any(key.endswith('Marketcap') for key in violations)
+    assert list(violations)[:2] == ['Aave_High below Low', 'Aave_Open outside Low-High']
+    assert valid.tolist() == [True, False, False, False, True]
+
+    custom = [Rule('Close above 100', lambda frame: frame['Close'] > 100, ['Close'])]
+    assert evaluate_rules(df=df, rules=custom)[0] == {'Aave_Close above 100': 2, 'Bitcoin_Close above 100': 2}
+
+
+def test_cleaning_report_lists_rule_violations(coin_files, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".data").mkdir()
+    run_data_cleaning(directory_path=str(tmp_path))
+    report = pd.read_csv(tmp_path / ".data" / "Data Report.csv")
+    rules = report[report['Category'] == 'Pre-cleaned rule violations']
+    assert len(rules) == 3 * len(DATA_QUALITY_RULES)
+    assert rules['Count'].sum() == 0
+
+
+def test_deduplicate_checks_batches_against_persistent_index(tmp_path):
+    index_path = str(tmp_path / "index.npz")
+    first = pd.DataFrame({
+        'SNo': [1, 2, 3],
+        'Name': ['Aave', 'Aave', 'Bitcoin'],
+        'Date': ['2021-01-01 23:59:59', '2021-01-02 23:59:59', '2021-01-01 23:59:59'],
+        'Close': [1.0, 2.0, 3.0],
+    })
+    index = KeyIndex(path=index_path)
+    new, conflicts, counts = deduplicate(df=first, index=index)
+    assert len(new) == 3 and conflicts.empty
+    index.save()
+
+    # A later load, with parsed dates and categorical names, checked against the stored index only
+    second = pd.DataFrame({
+        'SNo': [7, 8, 9, 10, 11],
+        'Name': pd.Categorical(['Aave', 'Bitcoin', 'Cardano', 'Cardano', 'Cardano']),
+        'Date': pd.to_datetime(['2021-01-02 23:59:59', '2021-01-01 23:59:59', '2021-01-01 23:59:59',
+                                '2021-01-01 23:59:59', '2021-01-01 23:59:59']),
+        'Close': [2.0, 30.0, 5.0, 5.0, 6.0],
+    })
+    index = KeyIndex(path=index_path)
+    assert len(index) == 3
+    new, conflicts, counts = deduplicate(df=second, index=index)
+    assert new['Name'].tolist() == ['Cardano']
+    assert counts == {'New keys': 1, 'Exact duplicates': 2, 'Conflicting duplicates': 2}
+    assert conflicts[['Name', 'Close', 'Conflict']].values.tolist() == [
+        ['Bitcoin', 30.0, 'already loaded'], ['Cardano', 6.0, 'within batch']]
+    assert len(index) == 4
+
+
+def test_streaming_cleaning_drops_duplicate_keys_across_chunks(coin_files, tmp_path):
+    df = pd.read_csv(coin_files[0])
+    pd.concat([df, df.iloc[[0]], df.iloc[[1]].assign(Close=1.0)]).to_csv(coin_files[0], index=False)
+    written = []
+    report = stream_clean_csv_files(files=coin_files, write=written.append, chunksize=2, index=KeyIndex(),
+                                    conflicts_file=str(tmp_path / "conflicts.csv"))
+
+    assert sum(len(chunk) for chunk in written) == 9
+    dedup = {field: count for category, field, count in zip(*report.values()) if category == 'Deduplication'}
+    assert dedup == {'New keys': 9, 'Exact duplicates': 1, 'Conflicting duplicates': 1}
+    assert pd.read_csv(tmp_path / "conflicts.csv")['Close'].tolist() == [1.0]
+
+
+def test_streaming_cleaning_with_index_keeps_rows_of_earlier_runs(coin_files, tmp_path):
+    df = pd.read_csv(coin_files[0])
+    df.loc[len(df)] = [4, 'Aave', 'AAV', '2021-01-04 23:59:59', 110.0, 90.0, 100.0, 1e6, 1000.0, 1e6]
+    df.to_csv(coin_files[0], index=False)
+    db_name, index_path = str(tmp_path / "coins.db"), str(tmp_path / "index.npz")
+
+    writer = SQLiteChunkWriter(table_name="CoinsTable", db_name=db_name)
+    with pytest.raises(ValueError, match="upsert"):
+        stream_clean_csv_files(files=coin_files, write=writer.write, index=KeyIndex())
+    writer.close()
+
+    for _ in range(2):
+        writer = SQLiteChunkWriter(table_name="CoinsTable", db_name=db_name, mode="upsert")
+        try:
+            report = stream_clean_csv_files(files=coin_files, write=writer.write, chunksize=2, index=KeyIndex(path=index_path),
+                                            conflicts_file=str(tmp_path / "conflicts.csv"))
+        finally:
+            writer.close()
+        with sqlite3.connect(db_name) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM CoinsTable").fetchone()[0] == 9
+    # The outlier row was never stored, so its key is not marked as loaded
+    assert len(KeyIndex(path=index_path)) == 9
+    dedup = {field: count for category, field, count in zip(*report.values()) if category == 'Deduplication'}
+    assert dedup == {'New keys': 1, 'Exact duplicates': 9, 'Conflicting duplicates': 0}
+
+
+def test_drop_duplicates_is_keyed_on_name_and_date():
+    df = pd.DataFrame({'Name': ['Aave', 'Aave'], 'Date': ['2021-01-01', '2021-01-01'], 'Close': [1.0, 2.0]})
+    assert drop_duplicates(df=df)['Close'].tolist() == [1.0]
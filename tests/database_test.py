@@ -0,0 +1,518 @@
+import asyncio
+import json
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+
+from database.sql_connection_test import SQLiteConnection
+from database.schema import index_name, migrate_coins_table, migrate_to_clustered, migrate_to_heap, table_layout
+from database.result_builder import ColumnarResultBuilder, COINS_TABLE_SCHEMA
+from database.utility import run_query, run_updated_query, build_updated_query, run_analytics_query, run_coin_aggregates
+from database.duckdb_backend import DuckDBConnection, run_duckdb_query
+from database.cache import QueryCache, normalise_sql
+from database.session import QuerySession
+from database.bulk_loader import BulkLoader
+from database.instrumentation import QueryProfiler
+from database.exceptions import DataBaseQueryException
+from sqlalchemy import create_engine, inspect
+from database.async_utility import run_query_async, run_updated_query_async
+from src.cleaning.load import SQLiteChunkWriter, push_to_sqlite, push_to_sharded_sqlite
+from database.sharding import ShardedSQLiteConnection, run_sharded_query, run_sharded_updated_query, shard_for
+from src.analytics.data_reporting import coin_summary_info, aggregate_coin_chunks, coin_summary_from_aggregates
+
+
+@pytest.fixture
+def sample_coins():
+    data = {
+        'Name': ['Aave'] * 3 + ['Bitcoin'] * 3 + ['Cardano'] * 2,
+        'Symbol': ['AAVE'] * 3 + ['BTC'] * 3 + ['ADA'] * 2,
+        'Date': ['2021-01-01 23:59:59', '2021-01-02 23:59:59', '2021-01-03 23:59:59',
+                 '2021-01-01 23:59:59', '2021-01-02 23:59:59', '2021-01-03 23:59:59',
+                 '2019-05-01 23:59:59', '2019-05-02 23:59:59'],
+        'High': [110.0, 115.0, 120.0, 220.0, 225.0, 230.0, 1.2, 1.3],
+        'Low': [90.0, 95.0, 100.0, 180.0, 190.0, 200.0, 0.8, 0.9],
+        'Open': [100.0, 105.0, 110.0, 200.0, 210.0, 220.0, 1.0, 1.1],
+        'Close': [105.0, 110.0, 115.0, 210.0, 215.0, 225.0, 1.1, 1.2],
+        'Volume': [1000.0, 1500.0, 2000.0, 3000.0, 3500.0, 4000.0, 10.0, 20.0],
+        'Marketcap': [1e6, 1.1e6, 1.2e6, 2e6, 2.1e6, 2.2e6, 1e3, 1.1e3],
+    }
+    return pd.DataFrame(data)
+
+
+@pytest.fixture
+def db_conn(tmp_path, sample_coins):
+    db_name = str(tmp_path / "coins.db")
+    push_to_sqlite(df=sample_coins, table_name="CoinsTable", db_name=db_name)
+    connection = SQLiteConnection(database=db_name)
+    yield connection
+    connection.get_engine().dispose()
+
+
+def test_run_query(db_conn):
+    df = run_query(query="SELECT DISTINCT Name FROM CoinsTable", connection=db_conn)
+    assert sorted(df['Name'].tolist()) == ['Aave', 'Bitcoin', 'Cardano']
+
+
+def test_run_updated_query_filters_dates(db_conn):
+    df = run_updated_query(coin_names=['Bitcoin', 'Aave'], start_date='2021-01-02', end_date='2021-01-03', connection=db_conn)
+    assert df['Name'].tolist() == ['Bitcoin', 'Bitcoin', 'Aave', 'Aave']
+    assert df['Close'].tolist() == [215.0, 225.0, 110.0, 115.0]
+
+
+def test_run_updated_query_falls_back_per_coin(db_conn):
+    # Cardano has no rows in 2021 so its full history is returned
+    df = run_updated_query(coin_names=['Cardano', 'Aave'], start_date='2021-01-03', end_date='2021-01-03', connection=db_conn)
+    assert df['Name'].tolist() == ['Cardano', 'Cardano', 'Aave']
+
+
+def test_run_updated_query_no_coins(db_conn):
+    df = run_updated_query(coin_names=[], start_date='2021-01-01', end_date='2021-01-03', connection=db_conn)
+    assert df.empty
+
+
+def test_migration_normalises_dates(tmp_path):
+    db_name = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db_name)
+    conn.execute("CREATE TABLE CoinsTable (Name TEXT, Date TEXT, Close REAL)")
+    conn.executemany("INSERT INTO CoinsTable VALUES (?, ?, ?)",
+                     [("Aave", "2021-01-01T23:59:59", 1.0), ("Aave", "2021-01-02 23:59:59.000000", 2.0)])
+    migrate_coins_table(conn=conn)
+    migrate_coins_table(conn=conn)  # Running twice must be harmless
+    dates = [row[0] for row in conn.execute("SELECT Date FROM CoinsTable ORDER BY Date")]
+    indexes = [row[1] for row in conn.execute("PRAGMA index_list('CoinsTable')")]
+    conn.close()
+    assert dates == ["2021-01-01 23:59:59", "2021-01-02 23:59:59"]
+    assert indexes == [index_name("CoinsTable")]
+
+
+def test_run_updated_query_uses_index(db_conn):
+    query, params = build_updated_query(coin_names=['Aave', 'Bitcoin'], start_date='2021-01-01', end_date='2021-01-02')
+    plan = run_query(query=f"EXPLAIN QUERY PLAN {query}", connection=db_conn, params=params)
+    details = plan['detail'].tolist()
+    assert any(f"USING INDEX {index_name('CoinsTable')}" in detail for detail in details)
+    assert not any(detail.startswith("SCAN CoinsTable") for detail in details)
+
+
+def test_run_query_chunks(db_conn):
+    chunks = list(run_query(query="SELECT * FROM CoinsTable", connection=db_conn, chunksize=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 2]
+    full = run_query(query="SELECT * FROM CoinsTable", connection=db_conn)
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), full)
+
+
+def test_streamed_summary_matches_full(db_conn):
+    full = coin_summary_info(df=run_query(query="SELECT * FROM CoinsTable", connection=db_conn))
+    chunks = run_query(query="SELECT Name, Date, Volume, Marketcap FROM CoinsTable", connection=db_conn, chunksize=3)
+    streamed = coin_summary_from_aggregates(aggregates=aggregate_coin_chunks(chunks=chunks))
+    pd.testing.assert_frame_equal(streamed, full, check_dtype=False)
+
+
+def test_run_query_with_schema(db_conn, sample_coins):
+    df = run_query(query="SELECT * FROM CoinsTable", connection=db_conn, schema=COINS_TABLE_SCHEMA)
+    assert isinstance(df['Name'].dtype, pd.CategoricalDtype)
+    assert df['Date'].dtype == 'datetime64[ns]'
+    assert df['Close'].dtype == 'float64'
+    assert df['Name'].astype(str).tolist() == sample_coins['Name'].tolist()
+    assert df['Close'].tolist() == sample_coins['Close'].tolist()
+
+
+def test_columnar_builder_across_batches():
+    builder = ColumnarResultBuilder(columns=['Name', 'Close', 'Extra'], schema=COINS_TABLE_SCHEMA, capacity=1)
+    builder.append([('Aave', 1.0, 'a'), (None, None, 'b')])
+    builder.append([('Bitcoin', 2.0, 'c'), ('Aave', 3.0, 'd')])
+    df = builder.build()
+    assert list(df['Name'].cat.categories) == ['Aave', 'Bitcoin']
+    assert df['Name'].isna().tolist() == [False, True, False, False]
+    assert np.isnan(df['Close'][1])
+    assert df['Extra'].tolist() == ['a', 'b', 'c', 'd']
+
+
+def test_columnar_builder_coerces_unparseable_dates():
+    builder = ColumnarResultBuilder(columns=['Date', 'Close'], schema=COINS_TABLE_SCHEMA)
+    builder.append([('2021-01-01 23:59:59', 1.0), ('bad', 2.0), (None, None)])
+    df = builder.build()
+    assert df['Date'].dtype == 'datetime64[ns]'
+    assert df['Date'].tolist()[0] == pd.Timestamp('2021-01-01 23:59:59')
+    assert df['Date'].isna().tolist() == [False, True, True]
+    assert df['Close'].tolist()[:2] == [1.0, 2.0]
+
+
+def test_connection_applies_pragmas(db_conn):
+    with db_conn.connect() as conn:
+        journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+        synchronous = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+        temp_store = conn.exec_driver_sql("PRAGMA temp_store").scalar()
+    assert journal_mode == "wal"
+    assert synchronous == 1  # NORMAL
+    assert temp_store == 2  # MEMORY
+
+
+def test_connection_rejects_invalid_pragma(tmp_path):
+    with pytest.raises(ValueError):
+        SQLiteConnection(database=str(tmp_path / "coins.db"), synchronous="sometimes")
+
+
+def test_async_query_does_not_block_event_loop(db_conn):
+    slow_query = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 3000000) SELECT COUNT(*) AS total FROM n"
+
+    async def main():
+        ticks = 0
+        task = asyncio.ensure_future(run_query_async(query=slow_query, connection=db_conn))
+        while not task.done():
+            ticks += 1
+            await asyncio.sleep(0.001)
+        return ticks, await task
+
+    ticks, df = asyncio.run(main())
+    assert df['total'][0] == 3000000
+    assert ticks > 1
+
+
+def test_run_updated_query_async(db_conn):
+    df = asyncio.run(run_updated_query_async(coin_names=['Aave'], start_date='2021-01-01', end_date='2021-01-01', connection=db_conn))
+    assert df['Close'].tolist() == [105.0]
+
+
+def test_query_cache_hits_and_invalidates(db_conn, sample_coins):
+    run_query(query="SELECT 1", connection=db_conn)  # The first connection switches the file to WAL, which bumps data_version
+    cache = QueryCache(database=db_conn.database)
+    query = "SELECT * FROM CoinsTable WHERE Name = :name"
+    first = run_query(query=query, connection=db_conn, params={"name": "Aave"}, cache=cache)
+    first['Close'] = 0.0  # Callers mutating their frame must not change the cached copy
+    second = run_query(query="SELECT *   FROM CoinsTable\n WHERE Name = :name;", connection=db_conn, params={"name": "Aave"}, cache=cache)
+    assert second['Close'].tolist() == [105.0, 110.0, 115.0]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    push_to_sqlite(df=sample_coins.assign(Close=1.0), table_name="CoinsTable", db_name=db_conn.database)
+    third = run_query(query=query, connection=db_conn, params={"name": "Aave"}, cache=cache)
+    assert third['Close'].tolist() == [1.0, 1.0, 1.0]
+    assert cache.stats()['invalidations'] == 1
+    cache.close()
+
+
+def test_normalise_sql_keeps_whitespace_in_literals():
+    assert normalise_sql("SELECT  *\n FROM CoinsTable ;") == "SELECT * FROM CoinsTable"
+    assert normalise_sql("SELECT * FROM t WHERE Name = 'Binance  Coin'") == "SELECT * FROM t WHERE Name = 'Binance  Coin'"
+    assert normalise_sql("SELECT 'it''s  a' AS \"my  col\"") == "SELECT 'it''s  a' AS \"my  col\""
+    assert QueryCache.make_key("SELECT 'a b'") != QueryCache.make_key("SELECT 'a  b'")
+
+
+def test_query_cache_evicts_by_size(db_conn):
+    run_query(query="SELECT 1", connection=db_conn)
+    query = "SELECT Close FROM CoinsTable WHERE Name = :name LIMIT 2"
+    entry_size = int(run_query(query=query, connection=db_conn, params={"name": "Aave"}).memory_usage(deep=True).sum())
+    cache = QueryCache(database=db_conn.database, max_bytes=2 * entry_size)
+    for name in ['Aave', 'Bitcoin', 'Cardano']:
+        run_query(query=query, connection=db_conn, params={"name": name}, cache=cache)
+    stats = cache.stats()
+    assert (stats['entries'], stats['evictions']) == (2, 1)
+    assert cache.get(cache.make_key(query, {"name": "Aave"})) is None  # Least recently used entry went first
+    cache.close()
+
+
+def test_query_session_reuses_one_connection(db_conn):
+    with QuerySession(connection=db_conn) as session:
+        run_query(query="SELECT * FROM CoinsTable", connection=session)
+        run_query(query="SELECT * FROM CoinsTable", connection=session, schema=COINS_TABLE_SCHEMA)
+        run_updated_query(coin_names=['Aave'], start_date='2021-01-01', end_date='2021-01-02', connection=session)
+        list(run_query(query="SELECT * FROM CoinsTable", connection=session, chunksize=2))
+        # run_updated_query reads the table layout on the session too
+        assert session.statements == 5
+        assert db_conn.get_engine().pool.checkedout() == 1
+    assert db_conn.get_engine().pool.checkedout() == 0
+
+
+def test_run_updated_query_reads_layout_on_the_session(db_conn, monkeypatch):
+    with QuerySession(connection=db_conn) as session:
+        run_query(query="SELECT 1", connection=session)
+        # Once the session holds its connection, no other connection may be opened
+        monkeypatch.setattr(sqlite3, "connect", lambda *args, **kwargs: pytest.fail("opened a new connection"))
+        df = run_updated_query(coin_names=['Aave'], start_date='2021-01-01', end_date='2021-01-02', connection=session)
+    assert len(df) == 2
+
+
+@pytest.mark.parametrize("snapshot, expected", [(True, 8), (False, 9)])
+def test_query_session_snapshot(db_conn, snapshot, expected):
+    count_query = "SELECT COUNT(*) AS total FROM CoinsTable"
+    with QuerySession(connection=db_conn, snapshot=snapshot) as session:
+        assert run_query(query=count_query, connection=session)['total'][0] == 8
+        writer = sqlite3.connect(db_conn.database)
+        writer.execute("INSERT INTO CoinsTable (Name, Date) VALUES ('Dogecoin', '2021-01-01 23:59:59')")
+        writer.commit()
+        writer.close()
+        assert run_query(query=count_query, connection=session)['total'][0] == expected
+
+
+def test_bulk_loader_loads_and_upserts(tmp_path, sample_coins):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bulk.db'}")
+    loader = BulkLoader(engine=engine, table_name="CoinsTable", batch_size=3, n_partitions=2, max_workers=2)
+    report = loader.load(df=sample_coins)
+    assert report['rows'] == report['staged_rows'] == 8
+    assert report['rows_per_second'] > 0
+
+    changed = sample_coins.iloc[:2].assign(Close=0.0)
+    loader.load(df=changed)
+    df = pd.read_sql("SELECT * FROM CoinsTable ORDER BY Name, Date", engine)
+    assert len(df) == 8
+    assert df['Close'].tolist()[:3] == [0.0, 0.0, 115.0]
+    assert inspect(engine).get_table_names() == ["CoinsTable", "CoinsTable_load_checkpoints"]
+    engine.dispose()
+
+
+def test_bulk_loader_loads_a_repeated_key_once(tmp_path, sample_coins):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bulk.db'}")
+    loader = BulkLoader(engine=engine, table_name="CoinsTable", batch_size=3, n_partitions=2, max_workers=2)
+    repeated = pd.concat([sample_coins, sample_coins.iloc[[0]].assign(Close=0.0)], ignore_index=True)
+    report = loader.load(df=repeated)
+    assert report['rows'] == report['staged_rows'] == 8
+
+    df = pd.read_sql("SELECT * FROM CoinsTable ORDER BY Name, Date", engine)
+    assert len(df) == 8
+    assert df['Close'].iloc[0] == 0.0
+    engine.dispose()
+
+
+def test_bulk_loader_resumes_from_checkpoint(tmp_path, sample_coins, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bulk.db'}")
+    loader = BulkLoader(engine=engine, table_name="CoinsTable", batch_size=2, n_partitions=1, max_workers=1)
+    original = pd.DataFrame.to_sql
+    calls = []
+
+    def failing_to_sql(self, *args, **kwargs):
+        calls.append(len(self))
+        if len(calls) == 4:  # Creating the target, then the third batch
+            raise RuntimeError("connection lost")
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(pd.DataFrame, "to_sql", failing_to_sql)
+    with pytest.raises(RuntimeError):
+        loader.load(df=sample_coins, load_id="nightly")
+    monkeypatch.setattr(pd.DataFrame, "to_sql", original)
+
+    report = loader.load(df=sample_coins, load_id="nightly")
+    assert report['staged_rows'] == 4  # The two committed batches are skipped
+    assert len(pd.read_sql("SELECT * FROM CoinsTable", engine)) == 8
+    engine.dispose()
+
+
+def test_push_to_sqlite_upsert(tmp_path, sample_coins):
+    db_name = str(tmp_path / "upsert.db")
+    first = push_to_sqlite(df=sample_coins.iloc[:6], table_name="CoinsTable", db_name=db_name, mode="upsert", batch_size=4)
+    assert first == {"inserted": 6, "updated": 0, "unchanged": 0}
+
+    # Two existing rows change, four are untouched and the Cardano rows are new
+    changed = sample_coins.copy()
+    changed.loc[:1, 'Close'] = 0.0
+    changed['Date'] = pd.to_datetime(changed['Date'])
+    report = push_to_sqlite(df=changed, table_name="CoinsTable", db_name=db_name, mode="upsert", batch_size=3)
+    assert report == {"inserted": 2, "updated": 2, "unchanged": 4}
+
+    with sqlite3.connect(db_name) as conn:
+        df = pd.read_sql("SELECT * FROM CoinsTable ORDER BY Name, Date", conn)
+        indexes = [row[1] for row in conn.execute("PRAGMA index_list(CoinsTable)")]
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    assert len(df) == 8
+    assert df['Close'].tolist()[:3] == [0.0, 0.0, 115.0]
+    assert df['Date'].iloc[0] == '2021-01-01 23:59:59'
+    assert index_name("CoinsTable") in indexes
+    assert tables == ["CoinsTable"]
+
+
+def test_push_to_sqlite_upsert_normalises_dates_and_repeated_keys(tmp_path, sample_coins):
+    db_name = str(tmp_path / "upsert.db")
+    # One batch holds 2021-01-01 twice, once in another text layout, and a date that cannot be parsed
+    batch = sample_coins.iloc[[0, 0, 1, 2]].reset_index(drop=True)
+    batch.loc[1, ['Date', 'Close']] = ['2021-01-01T23:59:59', 99.0]
+    batch.loc[3, 'Date'] = 'bad'
+    report = push_to_sqlite(df=batch, table_name="CoinsTable", db_name=db_name, mode="upsert")
+    assert report == {"inserted": 3, "updated": 0, "unchanged": 0}
+
+    with sqlite3.connect(db_name) as conn:
+        stored = conn.execute("SELECT Date, Close FROM CoinsTable ORDER BY Date").fetchall()
+    assert stored == [('2021-01-01 23:59:59', 99.0), ('2021-01-02 23:59:59', 110.0), ('bad', 115.0)]
+
+
+def test_push_to_sqlite_raises_on_invalid_arguments(tmp_path, sample_coins):
+    db_name = str(tmp_path / "clustered.db")
+    push_to_sqlite(df=sample_coins, table_name="CoinsTable", db_name=db_name, layout="clustered")
+    with pytest.raises(ValueError, match="clustered layout"):
+        push_to_sqlite(df=sample_coins, table_name="CoinsTable", db_name=db_name, mode="upsert", layout="heap")
+    with pytest.raises(ValueError, match="Missing key columns"):
+        push_to_sqlite(df=sample_coins.drop(columns=['Date']), table_name="CoinsTable", db_name=db_name, mode="upsert")
+
+
+def test_push_to_sqlite_rejects_invalid_mode(tmp_path, sample_coins):
+    with pytest.raises(ValueError):
+        push_to_sqlite(df=sample_coins, table_name="CoinsTable", db_name=str(tmp_path / "coins.db"), mode="append")
+
+
+def test_profiler_records_queries(db_conn):
+    profiler = QueryProfiler(slow_query_ms=1e9)
+    df = run_query(query="SELECT *   FROM CoinsTable WHERE Name = :name;", connection=db_conn, params={"name": "Aave"}, profiler=profiler)
+    run_updated_query(coin_names=['Bitcoin'], start_date='2021-01-01', end_date='2021-01-02', connection=db_conn, profiler=profiler)
+
+    first, second = profiler.records()
+    assert first['sql'] == "SELECT * FROM CoinsTable WHERE Name = :name"
+    assert first['rows'] == 3 and first['bytes'] == int(df.memory_usage(deep=True).sum())
+    assert second['rows'] == 2
+    assert not first['slow'] and first['plan'] == []
+    assert profiler.summary()['calls'].tolist() == [1, 1]
+
+
+def test_profiler_captures_slow_plans_and_logs(db_conn, tmp_path):
+    log_path = tmp_path / "queries.jsonl"
+    profiler = QueryProfiler(slow_query_ms=0, log_path=str(log_path))
+    chunks = run_query(query="SELECT * FROM CoinsTable WHERE Name = 'Aave'", connection=db_conn, chunksize=2, profiler=profiler)
+    assert sum(len(chunk) for chunk in chunks) == 3
+
+    [entry] = profiler.records(slow_only=True)
+    assert entry['rows'] == 3
+    assert any(index_name("CoinsTable") in step for step in entry['plan'])
+    assert [json.loads(line) for line in log_path.read_text().splitlines()] == [entry]
+
+
+def test_coin_aggregates_match_chunked_aggregates(db_conn):
+    expected = aggregate_coin_chunks(run_query(query="SELECT Name, Date, Volume, Marketcap FROM CoinsTable", connection=db_conn, chunksize=3))
+    pd.testing.assert_frame_equal(run_coin_aggregates(connection=db_conn), expected, check_dtype=False)
+
+
+def test_analytics_query_rejects_unknown_backend(db_conn):
+    with pytest.raises(DataBaseQueryException):
+        run_analytics_query(query="SELECT 1", connection=db_conn, backend="postgres")
+
+
+def test_duckdb_backend_matches_sqlite(db_conn):
+    pytest.importorskip("duckdb")
+    query = "SELECT Name, SUM(Volume) AS Volume FROM CoinsTable WHERE Date >= :start GROUP BY Name ORDER BY Name"
+    params = {"start": "2021-01-02 00:00:00"}
+    sqlite_df = run_analytics_query(query=query, connection=db_conn, params=params, backend="sqlite")
+    duckdb_df = run_analytics_query(query=query, connection=db_conn, params=params, backend="duckdb", duckdb_mode="auto")
+    pd.testing.assert_frame_equal(duckdb_df, sqlite_df)
+    pd.testing.assert_frame_equal(run_coin_aggregates(connection=db_conn, backend="duckdb", duckdb_mode="auto"), run_coin_aggregates(connection=db_conn))
+    # The mode is never picked implicitly
+    with pytest.raises(DataBaseQueryException):
+        run_analytics_query(query=query, connection=db_conn, params=params, backend="duckdb")
+
+
+def test_duckdb_copy_refreshes_after_writes(db_conn, sample_coins):
+    pytest.importorskip("duckdb")
+    connection = DuckDBConnection(database=db_conn.database, mode="copy")
+    connection.open()
+    with connection.connect() as cursor:
+        assert cursor.execute("SELECT current_setting('autoinstall_known_extensions')").fetchone() == (False,)
+    query = "SELECT COUNT(*) AS n FROM CoinsTable"
+    assert run_duckdb_query(query=query, connection=connection)['n'].item() == 8
+    assert connection.active_mode == "copy"
+
+    push_to_sqlite(df=sample_coins.iloc[:2], table_name="CoinsTable", db_name=db_conn.database)
+    assert run_duckdb_query(query=query, connection=connection)['n'].item() == 2
+    connection.close()
+
+
+def test_clustered_layout_migration(db_conn):
+    before = run_updated_query(coin_names=['Bitcoin', 'Cardano'], start_date='2021-01-02', end_date='2021-01-03', connection=db_conn)
+    with sqlite3.connect(db_conn.database) as conn:
+        assert migrate_to_clustered(conn=conn) == 8
+        assert migrate_to_clustered(conn=conn) == 8
+        assert table_layout(conn=conn) == "clustered"
+        stored = conn.execute("SELECT typeof(Date), typeof(Close) FROM CoinsTable_clustered LIMIT 1").fetchone()
+        plan = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN SELECT * FROM CoinsTable WHERE Name = 'Aave'"))
+    assert stored == ("integer", "real")
+    assert "PRIMARY KEY" in plan
+
+    after = run_updated_query(coin_names=['Bitcoin', 'Cardano'], start_date='2021-01-02', end_date='2021-01-03', connection=db_conn)
+    pd.testing.assert_frame_equal(after, before)
+
+    with sqlite3.connect(db_conn.database) as conn:
+        assert migrate_to_heap(conn=conn) == 8
+        assert table_layout(conn=conn) == "heap"
+    pd.testing.assert_frame_equal(run_updated_query(coin_names=['Bitcoin', 'Cardano'], start_date='2021-01-02', end_date='2021-01-03', connection=db_conn), before)
+
+
+def test_push_to_sqlite_clustered_layout(tmp_path, sample_coins):
+    db_name = str(tmp_path / "clustered.db")
+    push_to_sqlite(df=sample_coins.iloc[:6], table_name="CoinsTable", db_name=db_name, layout="clustered")
+
+    changed = sample_coins.copy()
+    changed.loc[:1, 'Close'] = 0.0
+    report = push_to_sqlite(df=changed, table_name="CoinsTable", db_name=db_name, mode="upsert")
+    assert report == {"inserted": 2, "updated": 2, "unchanged": 4}
+
+    with sqlite3.connect(db_name) as conn:
+        assert table_layout(conn=conn) == "clustered"
+        df = pd.read_sql("SELECT * FROM CoinsTable", conn)
+    assert df['Name'].tolist() == ['Aave'] * 3 + ['Bitcoin'] * 3 + ['Cardano'] * 2
+    assert df['Close'].tolist()[:3] == [0.0, 0.0, 115.0]
+    assert df['Date'].iloc[-1] == '2019-05-02 23:59:59'
+
+    # A replace keeps the layout of the existing table
+    push_to_sqlite(df=sample_coins, table_name="CoinsTable", db_name=db_name)
+    with sqlite3.connect(db_name) as conn:
+        assert table_layout(conn=conn) == "clustered"
+        assert conn.execute("SELECT COUNT(*) FROM CoinsTable").fetchone()[0] == 8
+
+
+@pytest.mark.parametrize("layout", ["heap", "clustered"])
+def test_failed_replace_keeps_the_table(tmp_path, sample_coins, layout):
+    db_name = str(tmp_path / "coins.db")
+    push_to_sqlite(df=sample_coins, table_name="CoinsTable", db_name=db_name, layout=layout)
+    # sqlite3 cannot bind a dict, so writing the new rows fails
+    unbindable = sample_coins.assign(Close=[{}] * len(sample_coins))
+
+    assert push_to_sqlite(df=unbindable, table_name="CoinsTable", db_name=db_name) is None
+    writer = SQLiteChunkWriter(table_name="CoinsTable", db_name=db_name)
+    with pytest.raises(Exception):
+        writer.write(unbindable)
+    writer.close()
+
+    with sqlite3.connect(db_name) as conn:
+        assert table_layout(conn=conn) == layout
+        assert conn.execute("SELECT COUNT(*) FROM CoinsTable").fetchone()[0] == 8
+        tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    assert not any(name.endswith("_staging") for name in tables)
+
+
+def test_sharded_storage_matches_single_file(db_conn, sample_coins, tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    push_to_sharded_sqlite(df=sample_coins, shard_dir=shard_dir, n_shards=3)
+    connection = ShardedSQLiteConnection(directory=shard_dir)
+    assert connection.n_shards == 3
+
+    args = dict(coin_names=['Cardano', 'Bitcoin', 'Aave'], start_date='2021-01-02', end_date='2021-01-03')
+    sharded = run_sharded_updated_query(connection=connection, **args)
+    pd.testing.assert_frame_equal(sharded, run_updated_query(connection=db_conn, **args), check_categorical=False)
+
+    counts = run_sharded_query(query="SELECT Name, COUNT(*) AS n FROM CoinsTable GROUP BY Name", connection=connection)
+    assert dict(zip(counts['Name'], counts['n'])) == {'Aave': 3, 'Bitcoin': 3, 'Cardano': 2}
+
+    report = push_to_sharded_sqlite(df=sample_coins.iloc[:2].assign(Close=0.0), shard_dir=shard_dir, mode="upsert")
+    assert report == {"inserted": 0, "updated": 2, "unchanged": 0}
+    connection.close()
+
+    with pytest.raises(ValueError):
+        ShardedSQLiteConnection(directory=shard_dir, n_shards=4)
+
+
+def test_sharded_upsert_into_new_directory_can_be_queried(sample_coins, tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    # Aave alone leaves most of the 8 shards without rows
+    push_to_sharded_sqlite(df=sample_coins.iloc[:3], shard_dir=shard_dir, n_shards=8, mode="upsert")
+    connection = ShardedSQLiteConnection(directory=shard_dir)
+    assert connection.existing_shards() == list(range(8))
+    counts = run_sharded_query(query="SELECT Name, COUNT(*) AS n FROM CoinsTable GROUP BY Name", connection=connection)
+    assert dict(zip(counts['Name'], counts['n'])) == {'Aave': 3}
+    connection.close()
+
+    # A shard file removed since, or never written by an older load, is skipped
+    os.remove(connection.shard_path(shard_for('Bitcoin', 8)))
+    connection = ShardedSQLiteConnection(directory=shard_dir)
+    assert len(run_sharded_query(query="SELECT * FROM CoinsTable", connection=connection)) == 3
+    df = run_sharded_updated_query(coin_names=['Bitcoin', 'Aave'], start_date='2021-01-01', end_date='2021-01-03', connection=connection)
+    assert df['Name'].astype(str).unique().tolist() == ['Aave']
+    connection.close()
+
+
+if __name__ == "__main__":
+    pytest.main()
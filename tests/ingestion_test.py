@@ -0,0 +1,179 @@
+import os
+import sqlite3
+import zipfile
+from io import StringIO
+import pandas as pd
+import pytest
+
+from src.cleaning.dedup import KeyIndex
+from src.ingestion.exceptions import StoreWriteError
+from src.ingestion.ingestion import IngestionManifest, ingest_kaggle_dataset, ingest_kaggle_datasets, sqlite_sink
+
+
+def coin_csv(name: str, closes: list) -> str:
+    n = len(closes)
+    return pd.DataFrame({
+        'SNo': range(1, n + 1),
+        'Name': [name] * n,
+        'Symbol': [name[:3].upper()] * n,
+        'Date': [f'2021-01-{day:02d} 23:59:59' for day in range(1, n + 1)],
+        'High': [c + 5.0 for c in closes],
+        'Low': [c - 5.0 for c in closes],
+        'Open': closes,
+        'Close': closes,
+        'Volume': [1000.0] * n,
+        'Marketcap': [1e6] * n,
+    }).to_csv(index=False)
+
+
+class LocalKaggleSource:
+    """Stands in for the Kaggle API: datasets are built in memory and 'downloaded' as zip archives."""
+
+    def __init__(self, datasets):
+        self.datasets = datasets
+        self.downloads = []
+
+    def remote_version(self, dataset_name):
+        return self.datasets[dataset_name]["version"]
+
+    def download(self, dataset_name, path):
+        self.downloads.append(dataset_name)
+        archive = os.path.join(path, f"{dataset_name.split('/')[1]}.zip")
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for member, content in self.datasets[dataset_name]["members"].items():
+                zf.writestr(member, content)
+        return archive
+
+
+@pytest.fixture
+def source():
+    return LocalKaggleSource({
+        "owner/coins": {"version": "1", "members": {
+            "coin_Aave.csv": coin_csv("Aave", [100.0, 101.0, 102.0]),
+            "coin_Bitcoin.csv": coin_csv("Bitcoin", [200.0, 201.0]),
+            "coin_Cardano.csv": coin_csv("Cardano", [1.0, 1.1, 1.2, 1.3]),
+        }},
+        "owner/more-coins": {"version": "7", "members": {
+            "coin_Dogecoin.csv": coin_csv("Dogecoin", [0.1, 0.2]),
+        }},
+    })
+
+
+def recording_sink(calls):
+    def sink(df, dataset_name, member):
+        calls.append((dataset_name, member, len(df)))
+    return sink
+
+
+def test_unchanged_dataset_is_not_downloaded_again(source, tmp_path):
+    calls = []
+    summary = ingest_kaggle_dataset("owner/coins", sink=recording_sink(calls), path=str(tmp_path), source=source)
+    assert summary["downloaded"] and len(summary["ingested"]) == 3
+    assert sorted(calls) == [("owner/coins", "coin_Aave.csv", 3), ("owner/coins", "coin_Bitcoin.csv", 2),
+                             ("owner/coins", "coin_Cardano.csv", 4)]
+    # No CSV is extracted next to the archive
+    assert sorted(os.listdir(tmp_path)) == [".ingestion_manifest.json", "coins.zip"]
+
+    summary = ingest_kaggle_dataset("owner/coins", sink=recording_sink(calls), path=str(tmp_path), source=source)
+    assert not summary["downloaded"] and summary["ingested"] == [] and summary["unchanged"] == 3
+    assert source.downloads == ["owner/coins"] and len(calls) == 3
+
+
+def test_new_version_only_ingests_changed_members(source, tmp_path):
+    ingest_kaggle_dataset("owner/coins", sink=recording_sink([]), path=str(tmp_path), source=source)
+    members = source.datasets["owner/coins"]["members"]
+    members["coin_Bitcoin.csv"] = coin_csv("Bitcoin", [200.0, 201.0, 202.0])
+    del members["coin_Cardano.csv"]
+    source.datasets["owner/coins"]["version"] = "2"
+
+    calls = []
+    summary = ingest_kaggle_dataset("owner/coins", sink=recording_sink(calls), path=str(tmp_path), source=source)
+    assert summary["downloaded"]
+    assert calls == [("owner/coins", "coin_Bitcoin.csv", 3)]
+    assert summary["unchanged"] == 1 and summary["removed"] == ["coin_Cardano.csv"]
+    assert "coin_Cardano.csv" not in IngestionManifest(str(tmp_path)).get("owner/coins")["members"]
+
+
+def test_interrupted_ingestion_resumes_without_downloading(source, tmp_path):
+    calls = []
+
+    def failing_sink(df, dataset_name, member):
+        if calls:
+            raise IOError("disk full")
+        calls.append(member)
+
+    with pytest.raises(IOError):
+        ingest_kaggle_dataset("owner/coins", sink=failing_sink, path=str(tmp_path), source=source)
+
+    resumed = []
+    summary = ingest_kaggle_dataset("owner/coins", sink=recording_sink(resumed), path=str(tmp_path), source=source)
+    assert source.downloads == ["owner/coins"]
+    assert summary["unchanged"] == 1
+    assert sorted(member for _, member, _ in resumed) == sorted(set(source.datasets["owner/coins"]["members"]) - set(calls))
+
+
+def test_datasets_are_ingested_concurrently_into_sqlite(source, tmp_path):
+    db_name = str(tmp_path / "coins.db")
+    summaries = ingest_kaggle_datasets(["owner/coins", "owner/more-coins", "not a dataset"], sink=sqlite_sink(db_name=db_name),
+                                       path=str(tmp_path), source=source, max_workers=3)
+    assert [len(summary.get("ingested", [])) for summary in summaries] == [3, 1, 0]
+    assert "error" in summaries[2]
+    with sqlite3.connect(db_name) as conn:
+        counts = dict(conn.execute("SELECT Name, COUNT(*) FROM CoinsTable GROUP BY Name").fetchall())
+    assert counts == {"Aave": 3, "Bitcoin": 2, "Cardano": 4, "Dogecoin": 2}
+
+
+def test_sqlite_sink_with_key_index_reports_conflicts(source, tmp_path):
+    db_name = str(tmp_path / "coins.db")
+    conflicts_file = str(tmp_path / "conflicts.csv")
+    sink = sqlite_sink(db_name=db_name, index=KeyIndex(path=str(tmp_path / "index.npz")), conflicts_file=conflicts_file)
+    ingest_kaggle_dataset("owner/coins", sink=sink, path=str(tmp_path), source=source)
+
+    # The new version revises a stored Bitcoin close and adds a day
+    source.datasets["owner/coins"]["members"]["coin_Bitcoin.csv"] = coin_csv("Bitcoin", [200.0, 250.0, 202.0])
+    source.datasets["owner/coins"]["version"] = "2"
+    sink = sqlite_sink(db_name=db_name, index=KeyIndex(path=str(tmp_path / "index.npz")), conflicts_file=conflicts_file)
+    ingest_kaggle_dataset("owner/coins", sink=sink, path=str(tmp_path), source=source)
+
+    with sqlite3.connect(db_name) as conn:
+        closes = [close for (close,) in conn.execute("SELECT Close FROM CoinsTable WHERE Name = 'Bitcoin' ORDER BY Date")]
+    assert closes == [200.0, 201.0, 202.0]
+    conflicts = pd.read_csv(conflicts_file)
+    assert conflicts[['Name', 'Close', 'Conflict']].values.tolist() == [['Bitcoin', 250.0, 'already loaded']]
+
+
+def test_sqlite_sink_does_not_index_keys_of_a_failed_write(tmp_path):
+    index_path = str(tmp_path / "index.npz")
+    index = KeyIndex(path=index_path)
+    bitcoin = pd.read_csv(StringIO(coin_csv("Bitcoin", [200.0, 201.0])))
+    aave = pd.read_csv(StringIO(coin_csv("Aave", [100.0, 101.0])))
+
+    # The store cannot be opened, so the write fails
+    failing = sqlite_sink(db_name=str(tmp_path / "missing" / "coins.db"), index=index, conflicts_file=str(tmp_path / "c.csv"))
+    with pytest.raises(StoreWriteError):
+        failing(bitcoin, "owner/coins", "coin_Bitcoin.csv")
+    assert len(index) == 0
+
+    # A later successful write saves the index without the failed member's keys
+    db_name = str(tmp_path / "coins.db")
+    sqlite_sink(db_name=db_name, index=index, conflicts_file=str(tmp_path / "c.csv"))(aave, "owner/coins", "coin_Aave.csv")
+    assert len(KeyIndex(path=index_path)) == 2
+
+    # So a retry of the failed member writes its rows
+    sqlite_sink(db_name=db_name, index=KeyIndex(path=index_path), conflicts_file=str(tmp_path / "c.csv"))(bitcoin, "owner/coins", "coin_Bitcoin.csv")
+    with sqlite3.connect(db_name) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM CoinsTable WHERE Name = 'Bitcoin'").fetchone() == (2,)
+
+
+def test_sqlite_sink_keeps_the_first_row_of_a_key_conflicting_within_the_file(tmp_path):
+    db_name, index_path = str(tmp_path / "coins.db"), str(tmp_path / "index.npz")
+    bitcoin = pd.read_csv(StringIO(coin_csv("Bitcoin", [100.0, 101.0, 102.0, 103.0, 1e6])))
+    bitcoin.loc[len(bitcoin)] = bitcoin.loc[1].to_dict() | {'Close': 108.0}
+    sqlite_sink(db_name=db_name, index=KeyIndex(path=index_path), conflicts_file=str(tmp_path / "c.csv"))(bitcoin, "owner/coins", "coin_Bitcoin.csv")
+
+    with sqlite3.connect(db_name) as conn:
+        closes = [close for (close,) in conn.execute("SELECT Close FROM CoinsTable ORDER BY Date")]
+    assert closes == [100.0, 101.0, 102.0, 103.0]
+    assert pd.read_csv(tmp_path / "c.csv")[['Close', 'Conflict']].values.tolist() == [[108.0, 'within batch']]
+    # The outlier row was not stored, so its key is not indexed
+    assert len(KeyIndex(path=index_path)) == 4